@@ -158,7 +158,7 @@ class ModifiedGapEncoderColumn(GapEncoderColumn):
             break
 
         # Update self.H_dict_ with the learned encoded vectors (activations)
-        self.H_dict_.update(zip(unq_X, unq_H))
+        self.H_dict_.put_many(unq_X, unq_H)
         return self
 
 
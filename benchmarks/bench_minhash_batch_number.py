@@ -24,7 +24,8 @@ from utils import default_parser, find_result, monitor
 
 from skrub._fast_hash import ngram_min_hash
 from skrub._string_distances import get_unique_ngrams
-from skrub._utils import LRUDict, check_input
+from skrub._hash_cache import HashCache
+from skrub._utils import check_input
 from skrub.tests.utils import generate_data
 
 NoneType = type(None)
@@ -74,7 +75,7 @@ class MinHashEncoder(BaseEstimator, TransformerMixin):
 
     Attributes
     ----------
-    hash_dict_ : LRUDict
+    hash_dict_ : HashCache
         Computed hashes.
 
     Examples
@@ -108,7 +109,7 @@ class MinHashEncoder(BaseEstimator, TransformerMixin):
 
     """
 
-    hash_dict_: LRUDict
+    hash_dict_: HashCache
 
     _capacity: int = 2**10
 
@@ -280,7 +281,7 @@ class MinHashEncoder(BaseEstimator, TransformerMixin):
                 f"Got handle_missing={self.handle_missing!r}, but expected "
                 "any of {'error', 'zero_impute'}. "
             )
-        self.hash_dict_ = LRUDict(capacity=self._capacity)
+        self.hash_dict_ = HashCache(self.n_components, capacity=self._capacity)
         return self
 
     def transform(self, X) -> np.array:
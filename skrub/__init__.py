@@ -3,6 +3,7 @@ skrub: Prepping tables for machine learning.
 """
 from pathlib import Path as _Path
 
+from ._bbit_minhash import bbit_jaccard_similarity
 from ._check_dependencies import check_dependencies
 from ._datetime_encoder import DatetimeEncoder
 from ._deduplicate import compute_ngram_distance, deduplicate
@@ -10,6 +11,7 @@ from ._fuzzy_join import fuzzy_join
 from ._gap_encoder import GapEncoder
 from ._joiner import Joiner
 from ._minhash_encoder import MinHashEncoder
+from ._minhash_lsh import MinHashLSHIndex
 from ._similarity_encoder import SimilarityEncoder
 from ._table_vectorizer import SuperVectorizer, TableVectorizer
 from ._target_encoder import TargetEncoder
@@ -21,11 +23,13 @@ with open(_Path(__file__).parent / "VERSION.txt") as _fh:
 
 
 __all__ = [
+    "bbit_jaccard_similarity",
     "DatetimeEncoder",
     "Joiner",
     "fuzzy_join",
     "GapEncoder",
     "MinHashEncoder",
+    "MinHashLSHIndex",
     "SimilarityEncoder",
     "SuperVectorizer",
     "TableVectorizer",
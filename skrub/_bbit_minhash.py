@@ -0,0 +1,156 @@
+"""
+b-bit minwise hashing: compact signatures built from min-hashes.
+
+Only the lowest `n_bits` bits of each min-hash are kept, and packed in
+arrays of unsigned integers. Two strings get the same b-bit value for a
+given hash function with probability ``J + (1 - J) / 2**n_bits``, where
+``J`` is the Jaccard similarity of their n-gram sets, so that ``J`` can
+be estimated by counting the matching b-bit values with XOR and popcount
+operations on the packed signatures.
+
+For a detailed description of the method, see
+`b-Bit Minwise Hashing <https://arxiv.org/abs/0910.3349>`_ by Li and
+König (2010).
+"""
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+_ALLOWED_N_BITS = (1, 2, 4, 8)
+
+# Number of set bits of every uint8 value
+_POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(
+    axis=1, dtype=np.uint8
+)
+
+# Pairs of rows compared at once by bbit_jaccard_similarity
+_MAX_PAIRS = 2**18
+
+
+def _check_n_bits(n_bits: int):
+    if n_bits not in _ALLOWED_N_BITS:
+        raise ValueError(
+            f"Got n_bits={n_bits!r}, but expected any of {set(_ALLOWED_N_BITS)}. "
+        )
+
+
+def pack_bbit_signatures(
+    hashes: ArrayLike, n_bits: int = 1, dtype: type = np.uint64
+) -> NDArray:
+    """
+    Pack the lowest `n_bits` bits of min-hashes in unsigned integers.
+
+    The b-bit value of component ``i`` is stored in bits
+    ``[i * n_bits, (i + 1) * n_bits)`` of the signature, in little-endian
+    order. The unused trailing bits are zero.
+
+    Parameters
+    ----------
+    hashes : array-like of int, shape (n_samples, n_components)
+        The min-hashes.
+    n_bits : {1, 2, 4, 8}, default=1
+        The number of bits kept per min-hash.
+    dtype : {np.uint8, np.uint64}, default=np.uint64
+        The dtype of the packed signatures.
+
+    Returns
+    -------
+    ndarray of shape (n_samples, n_words)
+        The packed signatures, with ``n_words`` the number of words of
+        `dtype` needed to store ``n_components * n_bits`` bits.
+    """
+    _check_n_bits(n_bits)
+    dtype = np.dtype(dtype)
+    if dtype not in [np.uint8, np.uint64]:
+        raise ValueError(
+            f"Got dtype={dtype!r}, but expected any of {{np.uint8, np.uint64}}. "
+        )
+    hashes = np.asarray(hashes, dtype=np.int64)
+    n_samples, n_components = hashes.shape
+    low_bits = (hashes & (2**n_bits - 1)).astype(np.uint8)
+    # Spread the bits of each b-bit value, lowest bit first
+    bits = (low_bits[:, :, None] >> np.arange(n_bits, dtype=np.uint8)) & 1
+    bits = bits.reshape(n_samples, n_components * n_bits)
+    n_words = -(-bits.shape[1] // (8 * dtype.itemsize))
+    padded = np.zeros((n_samples, n_words * 8 * dtype.itemsize), dtype=np.uint8)
+    padded[:, : bits.shape[1]] = bits
+    packed = np.packbits(padded, axis=1, bitorder="little")
+    return np.ascontiguousarray(packed).view(dtype.newbyteorder("<")).astype(dtype)
+
+
+def _count_mismatches(xor: NDArray, n_bits: int) -> NDArray:
+    """Count the b-bit values that differ, from the XOR of two signatures."""
+    if n_bits == 8:
+        return np.count_nonzero(xor, axis=-1)
+    # Fold the bits of each b-bit value onto its lowest bit
+    folded = xor.copy()
+    for shift in range(1, n_bits):
+        folded |= xor >> shift
+    mask = np.uint8(sum(1 << i for i in range(0, 8, n_bits)))
+    return _POPCOUNT_TABLE[folded & mask].sum(axis=-1, dtype=np.int64)
+
+
+def bbit_jaccard_similarity(
+    signatures_a: ArrayLike,
+    signatures_b: ArrayLike | None = None,
+    *,
+    n_components: int,
+    n_bits: int = 1,
+) -> NDArray:
+    """Estimate Jaccard similarities from packed b-bit min-hash signatures.
+
+    The fraction of matching b-bit values of two signatures is computed with
+    vectorized XOR and popcount operations, and corrected for the matches
+    expected by chance.
+
+    Parameters
+    ----------
+    signatures_a : array-like of shape (n_samples_a, n_words)
+        Packed signatures, as returned by
+        :meth:`MinHashEncoder.transform_signatures` for a single column.
+    signatures_b : array-like of shape (n_samples_b, n_words), optional
+        Packed signatures to compare with. If None, `signatures_a` is used.
+    n_components : int
+        The number of min-hashes used to build the signatures.
+    n_bits : {1, 2, 4, 8}, default=1
+        The number of bits kept per min-hash.
+
+    Returns
+    -------
+    ndarray of shape (n_samples_a, n_samples_b)
+        The estimated Jaccard similarities, between 0 and 1.
+
+    See Also
+    --------
+    MinHashEncoder
+        Encode string categorical features by applying the MinHash method.
+
+    Examples
+    --------
+    >>> from skrub import MinHashEncoder, bbit_jaccard_similarity
+    >>> X = [["Paris, FR"], ["Paris"], ["London, UK"]]
+    >>> enc = MinHashEncoder(n_components=256).fit(X)
+    >>> signatures = enc.transform_signatures(X, n_bits=2)
+    >>> similarities = bbit_jaccard_similarity(
+    ...     signatures, n_components=256, n_bits=2
+    ... )
+    >>> similarities.shape
+    (3, 3)
+    """
+    _check_n_bits(n_bits)
+    signatures_a = np.asarray(signatures_a)
+    signatures_b = signatures_a if signatures_b is None else np.asarray(signatures_b)
+    # Work on bytes: the layout of the signatures does not depend on the word
+    # size, as they are little-endian.
+    bytes_a = np.ascontiguousarray(signatures_a).view(np.uint8)
+    bytes_b = np.ascontiguousarray(signatures_b).view(np.uint8)
+
+    mismatches = np.empty((len(bytes_a), len(bytes_b)), dtype=np.int64)
+    chunk_size = max(_MAX_PAIRS // max(len(bytes_b), 1), 1)
+    for start in range(0, len(bytes_a), chunk_size):
+        xor = bytes_a[start : start + chunk_size, None, :] ^ bytes_b[None, :, :]
+        mismatches[start : start + chunk_size] = _count_mismatches(xor, n_bits)
+
+    match_rate = 1 - mismatches / n_components
+    chance = 2.0**-n_bits
+    return np.clip((match_rate - chance) / (1 - chance), 0, 1)
@@ -2,8 +2,8 @@
 n-gram hashing by simple dot products
 
 The principle is as follows:
-  1. A string is viewed as a succession of numbers (the ASCII or UTF8
-     representation of its elements).
+  1. A string is viewed as a succession of numbers (the bytes of its UTF-8
+     encoding).
   2. Each n-gram is then an n-dimensional vector of integers "g". A simple
      hash function is then computed by taking the dot product with a
      given random vector "atom", modulo max-int (integers larger than
@@ -12,11 +12,23 @@ The principle is as follows:
   3. Computing this dot product over a sliding window (to compute it for
      every n-gram is a convolution)
   4. We can then take the min (or the max) of the resulting sliding window
+
+``ngram_min_hash`` applies this to a single string and a single seed.
+``ngram_min_hash_batch`` computes the same hashes for many strings and
+many seeds at once: the strings are packed in a single buffer, the dot
+products of all the windows with all the atoms are computed with one
+matrix product per n-gram length, and the min (or max) is then taken
+segment-wise, string by string. ``pack_strings`` builds the packed
+buffer from a whole column of strings, reusing the buffers of Arrow-backed
+columns without copying them.
 """
 
 import functools
+import sys
+from collections.abc import Collection, Iterable
 
 import numpy as np
+from numpy.typing import NDArray
 
 # Precompute to avoid the cost and
 # cast to int32 to speed up the min
@@ -75,8 +87,8 @@ def ngram_min_hash(
     int or tuple
         The min_hash or (min_hash, max_hash) of the n-grams of the string.
     """
-    # Create a numerical 1D array from the string
-    array = np.frombuffer(string.encode(), dtype="int8", count=len(string))
+    # Create a numerical 1D array from the UTF-8 bytes of the string
+    array = np.frombuffer(string.encode(), dtype="int8")
 
     max_hash = MININT32
     min_hash = MAXINT32
@@ -94,3 +106,251 @@ def ngram_min_hash(
     if return_minmax:
         return min_hash, max_hash
     return min_hash
+
+
+# Upper bound on the number of (window, seed) hashes held in memory at once
+# by ``ngram_min_hash_batch``: strings are processed in chunks so that the
+# intermediate hash matrices stay a few tens of megabytes large.
+_BATCH_MAX_HASHES = 2**22
+
+
+def _as_arrow_array(strings):
+    """
+    Return the Arrow array backing `strings`, or None if there is none.
+
+    Supports pyarrow arrays, pandas columns with an Arrow-backed dtype
+    (``"string[pyarrow]"`` or ``pd.ArrowDtype``) and polars series.
+    """
+    if "pyarrow" not in sys.modules:
+        return None
+    import pyarrow as pa
+
+    if isinstance(strings, (pa.Array, pa.ChunkedArray)):
+        return strings
+    module = type(strings).__module__.split(".")[0]
+    if module == "pandas":
+        array = getattr(strings, "array", strings)
+        dtype = getattr(array, "dtype", None)
+        if getattr(dtype, "storage", None) == "pyarrow" or (
+            type(dtype).__name__ == "ArrowDtype"
+        ):
+            return pa.chunked_array(array.__arrow_array__())
+    if module == "polars":
+        return strings.to_arrow()
+    return None
+
+
+def _pack_arrow(array) -> tuple[NDArray, NDArray]:
+    """Pack an Arrow string array, without copying its data buffer."""
+    import pyarrow as pa
+
+    if isinstance(array, pa.ChunkedArray):
+        if array.num_chunks == 1:
+            array = array.chunk(0)
+        else:
+            array = array.combine_chunks()
+    if array.type not in (pa.string(), pa.large_string()):
+        array = array.cast(pa.large_string())
+    offset_dtype = np.int64 if array.type == pa.large_string() else np.int32
+    _, offsets_buffer, data_buffer = array.buffers()
+    offsets = np.frombuffer(
+        offsets_buffer,
+        dtype=offset_dtype,
+        count=len(array) + 1,
+        offset=array.offset * np.dtype(offset_dtype).itemsize,
+    ).astype(np.int64)
+    if data_buffer is None:
+        return np.empty(0, dtype="int8"), offsets
+    return np.frombuffer(data_buffer, dtype="int8"), offsets
+
+
+def pack_strings(strings) -> tuple[NDArray, NDArray]:
+    """
+    Pack a column of strings in a single buffer of UTF-8 bytes.
+
+    Each string is represented as in ``ngram_min_hash``. Arrow-backed
+    columns are packed without copying their data, and columns of ASCII
+    strings are encoded all at once rather than string by string.
+    Null values of Arrow-backed columns are packed as empty strings.
+
+    Parameters
+    ----------
+    strings : collection of str
+        The strings to pack: a list or a numpy array of str, a pandas
+        Series, a pyarrow Array or ChunkedArray, or a polars Series.
+
+    Returns
+    -------
+    buffer : ndarray of shape (n_bytes, )
+        The UTF-8 bytes of the strings, with dtype int8.
+    offsets : ndarray of shape (n_strings + 1, )
+        The bytes of string ``i`` are ``buffer[offsets[i]:offsets[i + 1]]``.
+    """
+    arrow_array = _as_arrow_array(strings)
+    if arrow_array is not None:
+        return _pack_arrow(arrow_array)
+
+    strings = list(strings)
+    joined = "".join(strings)
+    if joined.isascii():
+        # One byte per character: no need to encode the strings one by one
+        lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        data = joined.encode("ascii")
+    else:
+        encoded = [string.encode() for string in strings]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        data = b"".join(encoded)
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.frombuffer(data, dtype="int8"), offsets
+
+
+def _gen_atoms(atom_len: int, seeds: Iterable[int]) -> NDArray:
+    """Stack the atoms of the given seeds in a (atom_len, n_seeds) matrix."""
+    return np.stack([gen_atom(atom_len, seed=seed) for seed in seeds], axis=1)
+
+
+def _wrap_int32(hashes: NDArray) -> NDArray:
+    """
+    Cast exact dot products to int32, with the same overflow as ``np.correlate``.
+
+    The products of int8 characters with int32 atoms and their sums over
+    n-grams are at most of the order of 2**40, so they are exactly represented
+    in float64 and can be computed with a BLAS matrix product.
+    """
+    return hashes.astype(np.int64).astype(np.int32)
+
+
+def _segment_hashes(
+    buffer: NDArray,
+    offsets: NDArray,
+    ngram_range: tuple[int, int],
+    seeds: Collection[int],
+    return_minmax: bool,
+) -> tuple[NDArray, NDArray | None]:
+    """Compute the min (and max) hashes of the packed strings."""
+    n_strings = len(offsets) - 1
+    lengths = np.diff(offsets)
+    chars = buffer[offsets[0] : offsets[-1]].astype(np.float64)
+    offsets = offsets - offsets[0]
+    min_hashes = np.full((n_strings, len(seeds)), MAXINT32, dtype=np.int32)
+    max_hashes = (
+        np.full((n_strings, len(seeds)), MININT32, dtype=np.int32)
+        if return_minmax
+        else None
+    )
+
+    def update(rows, hashes, reduce_indices=None):
+        # Reduce per string the hashes of its n-grams, then merge with the
+        # hashes obtained for the other n-gram lengths.
+        if reduce_indices is None:
+            mins, maxs = hashes, hashes
+        else:
+            mins = np.minimum.reduceat(hashes, reduce_indices, axis=0)
+            if return_minmax:
+                maxs = np.maximum.reduceat(hashes, reduce_indices, axis=0)
+        min_hashes[rows] = np.minimum(min_hashes[rows], mins)
+        if return_minmax:
+            max_hashes[rows] = np.maximum(max_hashes[rows], maxs)
+
+    for atom_len in range(ngram_range[0], ngram_range[1]):
+        atoms = _gen_atoms(atom_len, seeds).astype(np.float64)
+
+        # Strings with at least atom_len characters: one hash per sliding
+        # window, i.e. per n-gram.
+        rows = np.flatnonzero(lengths >= atom_len)
+        if rows.size:
+            n_windows = lengths[rows] - atom_len + 1
+            segment_starts = np.zeros(len(rows), dtype=np.int64)
+            np.cumsum(n_windows[:-1], out=segment_starts[1:])
+            window_starts = (
+                np.arange(n_windows.sum())
+                - np.repeat(segment_starts, n_windows)
+                + np.repeat(offsets[rows], n_windows)
+            )
+            windows = chars[window_starts[:, None] + np.arange(atom_len)]
+            hashes = _wrap_int32(windows @ atoms)
+            update(rows, hashes, segment_starts)
+
+        # Strings shorter than the atom: like np.correlate, slide the string
+        # along the atom instead.
+        for length in range(1, atom_len):
+            rows = np.flatnonzero(lengths == length)
+            if not rows.size:
+                continue
+            short = chars[offsets[rows][:, None] + np.arange(length)]
+            for shift in range(atom_len - length + 1):
+                hashes = _wrap_int32(short @ atoms[shift : shift + length])
+                update(rows, hashes)
+
+    return min_hashes, max_hashes
+
+
+def ngram_min_hash_batch(
+    strings,
+    ngram_range: tuple[int, int] = (2, 4),
+    seeds: Collection[int] = (0,),
+    return_minmax: bool = False,
+) -> NDArray | tuple[NDArray, NDArray]:
+    """
+    Compute the min/max hashes of the n-grams of many strings for many seeds.
+
+    This is a vectorized equivalent of calling ``ngram_min_hash`` on every
+    string and every seed.
+
+    Parameters
+    ----------
+    strings : collection of str or tuple of ndarray
+        Strings to encode, in any format accepted by ``pack_strings``,
+        or the ``(buffer, offsets)`` pair it returns.
+    ngram_range : 2-tuple of int, default=(2, 4)
+        The lower and upper boundaries of the range of n-values for different
+        n-grams used in the string similarity. All values of `n` such
+        that ``min_n <= n <= max_n`` will be used.
+    seeds : collection of int, default=(0,)
+        Integers used to seed the hashing functions, one per output column.
+    return_minmax : bool, default=False
+        If True, returns both the minhashes and maxhashes of the strings.
+        Else, only returns the minhashes.
+
+    Returns
+    -------
+    ndarray or tuple of ndarray
+        The min_hashes or (min_hashes, max_hashes), each of shape
+        (n_strings, n_seeds) and dtype int32.
+        The hashes of empty strings are ``MAXINT32`` (min) and
+        ``MININT32`` (max).
+    """
+    seeds = list(seeds)
+    is_packed = (
+        isinstance(strings, tuple)
+        and len(strings) == 2
+        and all(isinstance(array, np.ndarray) for array in strings)
+    )
+    if is_packed:
+        buffer, offsets = strings
+    else:
+        buffer, offsets = pack_strings(strings)
+    lengths = np.diff(offsets)
+
+    # Process the strings in chunks holding a bounded number of hashes.
+    n_hashes = np.cumsum((lengths + 1) * max(len(seeds), 1))
+    chunk_ids = n_hashes // _BATCH_MAX_HASHES
+    bounds = np.flatnonzero(np.diff(chunk_ids)) + 1
+    bounds = np.concatenate([[0], bounds, [len(lengths)]]).astype(np.int64)
+
+    min_hashes, max_hashes = [], []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        mins, maxs = _segment_hashes(
+            buffer,
+            offsets[start : stop + 1],
+            ngram_range,
+            seeds,
+            return_minmax,
+        )
+        min_hashes.append(mins)
+        max_hashes.append(maxs)
+
+    if return_minmax:
+        return np.concatenate(min_hashes), np.concatenate(max_hashes)
+    return np.concatenate(min_hashes)
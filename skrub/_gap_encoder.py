@@ -3,23 +3,23 @@ Implements the GapEncoder: a probabilistic encoder for categorical variables.
 """
 from __future__ import annotations
 
-from collections.abc import Generator
-from copy import deepcopy
+import numbers
+from collections.abc import Callable, Collection, Generator, Iterable, KeysView
 from typing import Literal
 
 import numpy as np
 import pandas as pd
-import scipy.sparse as sp
+import sklearn
 from joblib import Parallel, delayed
 from numpy.random import RandomState
 from numpy.typing import ArrayLike, NDArray
 from scipy import sparse
 from sklearn.base import BaseEstimator, TransformerMixin, clone
-from sklearn.cluster import KMeans, kmeans_plusplus
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
 from sklearn.decomposition._nmf import _beta_divergence
 from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
-from sklearn.neighbors import NearestNeighbors
-from sklearn.utils import check_random_state, gen_batches
+from sklearn.metrics import pairwise_distances_argmin
+from sklearn.utils import check_random_state, gen_batches, parse_version
 from sklearn.utils.extmath import row_norms, safe_sparse_dot
 from sklearn.utils.fixes import _object_dtype_isnan
 from sklearn.utils.validation import _num_samples, check_is_fitted
@@ -27,6 +27,95 @@ from sklearn.utils.validation import _num_samples, check_is_fitted
 from ._utils import check_input
 
 
+class ActivationStore:
+    """Activations of strings, stored in the rows of a single array.
+
+    A dict maps each string to its row, and the array grows geometrically
+    as strings are added. Compared to a dict of vectors, lookups and
+    insertions of whole batches are vectorized, and the store is pickled as
+    two arrays.
+
+    Parameters
+    ----------
+    n_components : int
+        The size of the activation vectors.
+    dtype : dtype, default=np.float64
+        The dtype of the activations.
+    """
+
+    def __init__(self, n_components: int, dtype: np.dtype | type = np.float64):
+        self.n_components = n_components
+        self.dtype = np.dtype(dtype)
+        self._index: dict[str, int] = {}
+        self._values = np.empty((0, n_components), dtype=self.dtype)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __getitem__(self, key: str) -> NDArray:
+        return self._values[self._index[key]]
+
+    def keys(self) -> KeysView[str]:
+        """Return a view of the stored strings."""
+        return self._index.keys()
+
+    def _find(self, keys: Collection[str]) -> NDArray:
+        """Return the rows of `keys`, -1 for the keys that are not stored."""
+        return np.fromiter(
+            (self._index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys)
+        )
+
+    def contains_many(self, keys: Collection[str]) -> NDArray:
+        """Return a boolean mask of the `keys` that are stored."""
+        return self._find(keys) >= 0
+
+    def get_many(self, keys: Collection[str]) -> NDArray:
+        """Return a copy of the activations of `keys`, which must be stored."""
+        rows = self._find(keys)
+        if (rows < 0).any():
+            raise KeyError(
+                f"The strings {list(np.asarray(keys)[rows < 0][:5])} are not stored."
+            )
+        return self._values[rows]
+
+    def put_many(self, keys: Collection[str], values: ArrayLike):
+        """Insert or update the activations of `keys`."""
+        rows = self._find(keys)
+        is_new = rows < 0
+        n_stored = len(self._index)
+        for key in np.asarray(keys, dtype=object)[is_new]:
+            # Duplicated new keys get the row of their first occurrence
+            self._index.setdefault(key, len(self._index))
+        if is_new.any():
+            rows[is_new] = self._find(np.asarray(keys, dtype=object)[is_new])
+        if len(self._index) > len(self._values):
+            values_ = np.empty(
+                (max(len(self._index), 2 * len(self._values)), self.n_components),
+                dtype=self.dtype,
+            )
+            values_[:n_stored] = self._values[:n_stored]
+            self._values = values_
+        self._values[rows] = values
+
+    def __getstate__(self) -> dict:
+        # Pickle the strings in the order of their rows, instead of the dict
+        return {
+            "n_components": self.n_components,
+            "dtype": self.dtype,
+            "keys": np.array(list(self._index), dtype=object),
+            "values": self._values[: len(self._index)],
+        }
+
+    def __setstate__(self, state: dict):
+        self.n_components = state["n_components"]
+        self.dtype = state["dtype"]
+        self._index = {key: row for row, key in enumerate(state["keys"])}
+        self._values = state["values"]
+
+
 class GapEncoderColumn(BaseEstimator, TransformerMixin):
 
     """GapEncoder for encoding a single column.
@@ -40,7 +129,7 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
     """
 
     rho_: float
-    H_dict_: dict[NDArray, NDArray]
+    H_dict_: ActivationStore
 
     def __init__(
         self,
@@ -52,7 +141,12 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
         rescale_rho: bool = False,
         hashing: bool = False,
         hashing_n_features: int = 2**12,
-        init: Literal["k-means++", "random", "k-means"] = "k-means++",
+        min_df: int | float = 1,
+        max_features: int | None = None,
+        init: Literal[
+            "k-means++", "random", "k-means", "minibatch-k-means"
+        ] = "k-means++",
+        init_max_samples: int | None = None,
         max_iter: int = 5,
         ngram_range: tuple[int, int] = (2, 4),
         analyzer: Literal["word", "char", "char_wb"] = "char",
@@ -61,6 +155,9 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
         rescale_W: bool = True,
         max_iter_e_step: int = 1,
         max_no_improvement: int = 5,
+        check_cost_every: int = 1,
+        dtype: type = np.float64,
+        warm_start: bool = False,
         verbose: int = 0,
     ):
         self.ngram_range = ngram_range
@@ -72,52 +169,179 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
         self.batch_size = batch_size
         self.hashing = hashing
         self.hashing_n_features = hashing_n_features
+        self.min_df = min_df
+        self.max_features = max_features
         self.max_iter = max_iter
         self.init = init
+        self.init_max_samples = init_max_samples
         self.analyzer = analyzer
         self.add_words = add_words
         self.random_state = check_random_state(random_state)
         self.rescale_W = rescale_W
         self.max_iter_e_step = max_iter_e_step
         self.max_no_improvement = max_no_improvement
+        self.check_cost_every = check_cost_every
+        self.dtype = dtype
+        self.warm_start = warm_start
         self.verbose = verbose
 
-    def _init_vars(self, X) -> tuple[NDArray, NDArray, NDArray]:
+    def _make_vectorizers(
+        self,
+    ) -> tuple[
+        CountVectorizer | HashingVectorizer, CountVectorizer | HashingVectorizer | None
+    ]:
         """
-        Build the bag-of-n-grams representation `V` of `X` and initialize
-        the topics `W`.
+        Create the n-grams counts vectorizer, and the word counts vectorizer
+        if `add_words` is True (None otherwise). They are not fitted.
         """
-        # Init n-grams counts vectorizer
+        word_count = None
         if self.hashing:
-            self.ngrams_count_ = HashingVectorizer(
+            ngrams_count = HashingVectorizer(
                 analyzer=self.analyzer,
                 ngram_range=self.ngram_range,
                 n_features=self.hashing_n_features,
                 norm=None,
                 alternate_sign=False,
+                dtype=self.dtype,
             )
             if self.add_words:  # Init a word counts vectorizer if needed
-                self.word_count_ = HashingVectorizer(
+                word_count = HashingVectorizer(
                     analyzer="word",
                     n_features=self.hashing_n_features,
                     norm=None,
                     alternate_sign=False,
+                    dtype=self.dtype,
                 )
         else:
-            self.ngrams_count_ = CountVectorizer(
-                analyzer=self.analyzer, ngram_range=self.ngram_range, dtype=np.float64
+            ngrams_count = CountVectorizer(
+                analyzer=self.analyzer, ngram_range=self.ngram_range, dtype=self.dtype
             )
             if self.add_words:
-                self.word_count_ = CountVectorizer(dtype=np.float64)
+                word_count = CountVectorizer(dtype=self.dtype)
+        return ngrams_count, word_count
 
-        # Init H_dict_ with empty dict to train from scratch
-        self.H_dict_ = dict()
+    def _init_vars(self, X) -> tuple[NDArray, NDArray, NDArray]:
+        """
+        Build the bag-of-n-grams representation `V` of `X` and initialize
+        the topics `W`.
+        """
+        ngrams_count, word_count = self._make_vectorizers()
         # Build the n-grams counts matrix unq_V on unique elements of X
         unq_X, lookup = np.unique(X, return_inverse=True)
-        unq_V = self.ngrams_count_.fit_transform(unq_X)
+        unq_V = ngrams_count.fit_transform(unq_X)
         if self.add_words:  # Add word counts to unq_V
-            unq_V2 = self.word_count_.fit_transform(unq_X)
+            unq_V2 = word_count.fit_transform(unq_X)
             unq_V = sparse.hstack((unq_V, unq_V2), format="csr")
+        # Same n-grams order in each row as in the matrices built by transform
+        unq_V.sort_indices()
+        unq_V, ngrams_count, word_count = self._prune_vocabulary(
+            unq_V, lookup, ngrams_count, word_count
+        )
+        self._init_vars_from_counts(unq_X, unq_V, lookup, ngrams_count, word_count)
+        return unq_X, unq_V, lookup
+
+    def _select_features(
+        self,
+        unq_V: sparse.csr_matrix,
+        lookup: NDArray,
+        is_known: NDArray | None = None,
+        n_known: int = 0,
+    ) -> NDArray:
+        """
+        Return the mask of the features (the columns of the counts `unq_V` of
+        the unique strings) kept by `min_df` and `max_features`, with the
+        frequencies computed on the data ``X = unq_X[lookup]``.
+        The features marked by `is_known` are already in the vocabulary, of
+        size `n_known`, and are not selected again: only
+        ``max_features - n_known`` new features are selected.
+        """
+        no_min_df = isinstance(self.min_df, numbers.Integral) and self.min_df == 1
+        keep = np.ones(unq_V.shape[1], dtype=bool)
+        if is_known is not None:
+            keep &= ~is_known
+        if no_min_df and self.max_features is None:
+            return keep
+        if isinstance(self.min_df, numbers.Integral):
+            min_count = self.min_df
+        else:
+            min_count = self.min_df * len(lookup)
+        weights = np.bincount(lookup, minlength=unq_V.shape[0]).astype(np.float64)
+        # Number of samples containing each feature, and total counts
+        doc_freqs = sparse.csr_matrix(
+            (np.ones_like(unq_V.data), unq_V.indices, unq_V.indptr), unq_V.shape
+        )
+        doc_freqs = safe_sparse_dot(weights, doc_freqs)
+        keep &= doc_freqs >= min_count
+        if self.max_features is not None:
+            max_features = max(self.max_features - n_known, 0)
+            if keep.sum() > max_features:
+                term_freqs = np.where(keep, safe_sparse_dot(weights, unq_V), -1)
+                top = np.argsort(-term_freqs, kind="stable")[:max_features]
+                keep = np.zeros_like(keep)
+                keep[top] = True
+        return keep
+
+    def _prune_vocabulary(
+        self,
+        unq_V: sparse.csr_matrix,
+        lookup: NDArray,
+        ngrams_count: CountVectorizer | HashingVectorizer,
+        word_count: CountVectorizer | HashingVectorizer | None = None,
+    ) -> tuple[
+        sparse.csr_matrix,
+        CountVectorizer | HashingVectorizer,
+        CountVectorizer | HashingVectorizer | None,
+    ]:
+        """
+        Remove the n-grams and words pruned by `min_df` and `max_features`
+        from the counts `unq_V` of the unique strings and from the vocabularies
+        of the fitted vectorizers. The frequencies are computed on the data
+        ``X = unq_X[lookup]``.
+        """
+        if self.hashing:
+            return unq_V, ngrams_count, word_count
+        keep = self._select_features(unq_V, lookup)
+        if keep.all():
+            return unq_V, ngrams_count, word_count
+
+        n_ngrams = len(ngrams_count.vocabulary_)
+        ngrams_features = np.flatnonzero(keep[:n_ngrams])
+        word_features = np.flatnonzero(keep[n_ngrams:])
+        if not len(ngrams_features) or (self.add_words and not len(word_features)):
+            raise ValueError(
+                f"No n-grams or words remain with min_df={self.min_df!r} and "
+                f"max_features={self.max_features!r}. "
+            )
+        ngrams_count = _set_vocabulary(
+            ngrams_count, ngrams_count.get_feature_names_out()[ngrams_features]
+        )
+        if self.add_words:
+            word_count = _set_vocabulary(
+                word_count, word_count.get_feature_names_out()[word_features]
+            )
+        unq_V = unq_V[:, np.flatnonzero(keep)]
+        unq_V.sort_indices()
+        return unq_V, ngrams_count, word_count
+
+    def _init_vars_from_counts(
+        self,
+        unq_X: NDArray,
+        unq_V: sparse.csr_matrix,
+        lookup: NDArray,
+        ngrams_count: CountVectorizer | HashingVectorizer,
+        word_count: CountVectorizer | HashingVectorizer | None = None,
+    ) -> None:
+        """
+        Initialize the topics `W` and the activations, given the unique values
+        `unq_X` of the data, their bag-of-n-grams representation `unq_V`
+        computed by the fitted vectorizers, and the `lookup` array such that
+        ``X = unq_X[lookup]``.
+        """
+        self.ngrams_count_ = ngrams_count
+        if self.add_words:
+            self.word_count_ = word_count
+        # Init H_dict_ with an empty store to train from scratch
+        self.H_dict_ = ActivationStore(self.n_components, dtype=self.dtype)
 
         if not self.hashing:  # Build n-grams/word vocabulary
             self.vocabulary = self.ngrams_count_.get_feature_names_out()
@@ -127,42 +351,159 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
                 )
         _, self.n_vocab = unq_V.shape
         # Init the topics W given the n-grams counts V
-        self.W_, self.A_, self.B_ = self._init_w(unq_V[lookup], X)
+        self.W_, self.A_, self.B_ = self._init_w(
+            unq_V, unq_X, sample_weight=np.bincount(lookup, minlength=len(unq_X))
+        )
         # Init the activations unq_H of each unique input string
-        unq_H = _rescale_h(unq_V, np.ones((len(unq_X), self.n_components)))
+        unq_H = _rescale_h(
+            unq_V, np.ones((len(unq_X), self.n_components), dtype=self.dtype)
+        )
         # Update self.H_dict_ with unique input strings and their activations
-        self.H_dict_.update(zip(unq_X, unq_H))
+        self.H_dict_.put_many(unq_X, unq_H)
         if self.rescale_rho:
             # Make update rate per iteration independent of the batch_size
-            self.rho_ = self.rho ** (self.batch_size / len(X))
+            self.rho_ = self.rho ** (self.batch_size / len(lookup))
+
+    def _init_vars_warm_start(self, X) -> tuple[NDArray, NDArray, NDArray]:
+        """
+        Build the bag-of-n-grams representation `V` of `X` to fit the model
+        again from its current state. The n-grams (and words) of `X` missing
+        from the vocabulary are added to it, with topic weights initialized
+        to the mean weight of each topic, and the activations of the new
+        strings are initialized as in ``_init_vars``.
+        """
+        unq_X, lookup = np.unique(X, return_inverse=True)
+        if self.hashing:
+            unq_V = self.ngrams_count_.transform(unq_X)
+            if self.add_words:
+                unq_V2 = self.word_count_.transform(unq_X)
+                unq_V = sparse.hstack((unq_V, unq_V2), format="csr")
+        else:
+            # Count the n-grams of X, and select the new ones to add as when
+            # pruning the vocabulary from scratch
+            vectorizers = list(self._make_vectorizers())
+            counts = [vectorizers[0].fit_transform(unq_X)]
+            if self.add_words:
+                counts.append(vectorizers[1].fit_transform(unq_X))
+            unq_V = (
+                counts[0] if len(counts) == 1 else sparse.hstack(counts, format="csr")
+            )
+            fitted_vectorizers = [self.ngrams_count_]
+            if self.add_words:
+                fitted_vectorizers.append(self.word_count_)
+            features = [
+                vectorizer.get_feature_names_out()
+                for vectorizer in vectorizers[: len(counts)]
+            ]
+            # Select the new features only, within the room left by max_features
+            is_known = np.concatenate(
+                [
+                    np.fromiter(
+                        (feature in fitted.vocabulary_ for feature in names),
+                        dtype=bool,
+                        count=len(names),
+                    )
+                    for fitted, names in zip(fitted_vectorizers, features)
+                ]
+            )
+            n_known = sum(len(fitted.vocabulary_) for fitted in fitted_vectorizers)
+            keep = self._select_features(unq_V, lookup, is_known, n_known)
+            keep = np.split(keep, [len(features[0])])
+
+            extended, old_columns, n_vocab = [], [], 0
+            for i, fitted in enumerate(fitted_vectorizers):
+                # Append the new features to the vocabulary
+                vocabulary = dict(fitted.vocabulary_)
+                for feature in features[i][keep[i]]:
+                    vocabulary[feature] = len(vocabulary)
+                # Move the counts to the columns of the extended vocabulary
+                columns = np.array(
+                    [vocabulary.get(feature, -1) for feature in features[i]],
+                    dtype=np.int64,
+                )
+                rows = np.flatnonzero(columns >= 0)
+                projection = sparse.csr_matrix(
+                    (np.ones(len(rows), dtype=self.dtype), (rows, columns[rows])),
+                    shape=(len(columns), len(vocabulary)),
+                )
+                counts[i] = counts[i] @ projection
+                extended.append(
+                    _set_vocabulary(fitted, sorted(vocabulary, key=vocabulary.get))
+                )
+                old_columns.append(n_vocab + np.arange(len(fitted.vocabulary_)))
+                n_vocab += len(vocabulary)
+            unq_V = (
+                counts[0] if len(counts) == 1 else sparse.hstack(counts, format="csr")
+            )
+            self._extend_topics(np.concatenate(old_columns), n_vocab)
+            self.ngrams_count_ = extended[0]
+            self.vocabulary = self.ngrams_count_.get_feature_names_out()
+            if self.add_words:
+                self.word_count_ = extended[1]
+                self.vocabulary = np.concatenate(
+                    (self.vocabulary, self.word_count_.get_feature_names_out())
+                )
+        unq_V.sort_indices()
+        self.H_dict_.put_many(unq_X, self._get_or_init_H(unq_X, unq_V))
+        if self.rescale_rho:
+            self.rho_ = self.rho ** (self.batch_size / len(lookup))
         return unq_X, unq_V, lookup
 
+    def _extend_topics(self, old_columns: NDArray, n_vocab: int) -> None:
+        """
+        Move the columns of the topics `W_` and of their sufficient
+        statistics `A_` and `B_` to `old_columns` in matrices with `n_vocab`
+        columns. The weights of the new columns are the mean weights of the
+        topics, and their statistics are set so that ``W_ = A_ / B_``.
+        """
+        is_new = np.ones(n_vocab, dtype=bool)
+        is_new[old_columns] = False
+        W = np.empty((self.n_components, n_vocab), dtype=self.W_.dtype)
+        W[:, old_columns] = self.W_
+        W[:, is_new] = self.W_.mean(axis=1, keepdims=True)
+        # All the columns of B_ are equal
+        B = np.repeat(self.B_[:, :1], n_vocab, axis=1)
+        A = np.empty_like(W)
+        A[:, old_columns] = self.A_
+        A[:, is_new] = W[:, is_new] * B[:, is_new]
+        if self.rescale_W:
+            _rescale_W(W, A)
+        self.W_, self.A_, self.B_ = W, A, B
+        self.n_vocab = n_vocab
+
     def _get_H(self, X: NDArray) -> NDArray:
         """
-        Return the bag-of-n-grams representation of `X`.
+        Return the learnt activations of the strings `X`.
         """
-        H_out = np.empty((len(X), self.n_components))
-        for x, h_out in zip(X, H_out):
-            h_out[:] = self.H_dict_[x]
-        return H_out
+        return self.H_dict_.get_many(X)
 
-    def _init_w(self, V: NDArray, X) -> tuple[NDArray, NDArray, NDArray]:
+    def _init_w(
+        self, V: sparse.csr_matrix, X: NDArray, sample_weight: NDArray
+    ) -> tuple[NDArray, NDArray, NDArray]:
         """
-        Initialize the topics `W`.
+        Initialize the topics `W`, given the n-grams counts `V` of the unique
+        strings `X` and their numbers of occurrences `sample_weight`.
         If `self.init='k-means++'`, we use the init method of
         sklearn.cluster.KMeans.
         If `self.init='random'`, topics are initialized with a Gamma
         distribution.
         If `self.init='k-means'`, topics are initialized with a KMeans on the
-        n-grams counts.
+        n-grams counts, or a MiniBatchKMeans if `self.init='minibatch-k-means'`.
+        The k-means methods run on at most `self.init_max_samples` samples,
+        or `self.n_components` if larger.
         """
+        if self.init in ["k-means++", "k-means", "minibatch-k-means"]:
+            max_samples = self.init_max_samples
+            if max_samples is not None:
+                # Keep enough samples to draw the n_components topics
+                max_samples = max(max_samples, self.n_components)
+            indices, sample_weight = _subsample(
+                sample_weight, max_samples, self.random_state
+            )
+            V, X = V[indices], X[indices]
         if self.init == "k-means++":
-            W, _ = kmeans_plusplus(
-                V,
-                self.n_components,
-                x_squared_norms=row_norms(V, squared=True),
-                random_state=self.random_state,
-                n_local_trials=None,
+            W = _weighted_kmeans_plusplus(
+                V, self.n_components, sample_weight, self.random_state
             )
             W = W + 0.1  # To avoid restricting topics to a few n-grams only
         elif self.init == "random":
@@ -171,12 +512,15 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
                 scale=self.gamma_scale_prior,
                 size=(self.n_components, self.n_vocab),
             )
-        elif self.init == "k-means":
+        elif self.init in ["k-means", "minibatch-k-means"]:
             prototypes = get_kmeans_prototypes(
                 X,
                 self.n_components,
                 analyzer=self.analyzer,
+                sparse=True,
+                sample_weight=sample_weight,
                 random_state=self.random_state,
+                minibatch=self.init == "minibatch-k-means",
             )
             W = self.ngrams_count_.transform(prototypes).A + 0.1
             if self.add_words:
@@ -184,19 +528,19 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
                 W = np.hstack((W, W2))
             # if k-means doesn't find the exact number of prototypes
             if W.shape[0] < self.n_components:
-                W2, _ = kmeans_plusplus(
+                W2 = _weighted_kmeans_plusplus(
                     V,
                     self.n_components - W.shape[0],
-                    x_squared_norms=row_norms(V, squared=True),
-                    random_state=self.random_state,
-                    n_local_trials=None,
+                    sample_weight,
+                    self.random_state,
                 )
                 W2 = W2 + 0.1
                 W = np.concatenate((W, W2), axis=0)
         else:
             raise ValueError(f"Initialization method {self.init!r} does not exist. ")
+        W = W.astype(self.dtype, copy=False)
         W /= W.sum(axis=1, keepdims=True)
-        A = np.ones((self.n_components, self.n_vocab)) * 1e-10
+        A = np.full((self.n_components, self.n_vocab), 1e-10, dtype=self.dtype)
         B = A.copy()
         return W, A, B
 
@@ -206,7 +550,8 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
         batch_cost: float,
         n_samples: int,
         step: int,
-        n_steps: int,
+        n_steps: int | None,
+        n_batches: int = 1,
     ):
         """
         Helper function to encapsulate the early stopping logic.
@@ -221,8 +566,12 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
             The total number of samples in X.
         step : int
             The current step (for verbose mode).
-        n_steps : int
-            The total number of steps (for verbose mode).
+        n_steps : int or None
+            The total number of steps (for verbose mode), None if unknown.
+        n_batches : int, default=1
+            The number of mini batches since the previous cost check. The
+            smoothing of the cost is scaled accordingly, so that it follows
+            the cost at the same pace whatever the checking frequency.
 
         Returns
         -------
@@ -233,11 +582,12 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
 
         # counts steps starting from 1 for user friendly verbose mode.
         step = step + 1
+        progress = f"{step}" if n_steps is None else f"{step}/{n_steps}"
 
         # Ignore first iteration because H is not updated yet.
         if step == 1:
             if self.verbose:
-                print(f"Minibatch step {step}/{n_steps}: mean batch cost: {batch_cost}")
+                print(f"Minibatch step {progress}: mean batch cost: {batch_cost}")
             return False
 
         # Compute an Exponentially Weighted Average of the cost function to
@@ -246,14 +596,14 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
         if self._ewa_cost is None:
             self._ewa_cost = batch_cost
         else:
-            alpha = batch_size / (n_samples + 1)
+            alpha = n_batches * batch_size / (n_samples + 1)
             alpha = min(alpha, 1)
             self._ewa_cost = self._ewa_cost * (1 - alpha) + batch_cost * alpha
 
         # Log progress to be able to monitor convergence
         if self.verbose:
             print(
-                f"Minibatch step {step}/{n_steps}: mean batch cost: "
+                f"Minibatch step {progress}: mean batch cost: "
                 f"{batch_cost}, ewa cost: {self._ewa_cost}"
             )
 
@@ -272,7 +622,7 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
             if self.verbose:
                 print(
                     "Converged (lack of improvement in objective function) "
-                    f"at step {step}/{n_steps}"
+                    f"at step {progress}"
                 )
             return True
 
@@ -294,19 +644,52 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
         GapEncoderColumn
             The fitted GapEncoderColumn instance (self).
         """
+        # Check if first item has str or np.str_ type
+        assert isinstance(X[0], str), "Input data is not string. "
         # Copy parameter rho
         self.rho_ = self.rho
+        # Make n-grams counts matrix unq_V
+        if self.warm_start and hasattr(self, "H_dict_"):
+            unq_X, unq_V, lookup = self._init_vars_warm_start(X)
+        else:
+            unq_X, unq_V, lookup = self._init_vars(X)
+        return self._fit_counts(unq_X, unq_V, lookup)
+
+    def _fit_from_counts(
+        self,
+        unq_X: NDArray,
+        unq_V: sparse.csr_matrix,
+        lookup: NDArray,
+        ngrams_count: CountVectorizer | HashingVectorizer,
+        word_count: CountVectorizer | HashingVectorizer | None = None,
+    ) -> "GapEncoderColumn":
+        """
+        Fit the GapEncoder on the data ``X = unq_X[lookup]``, given the
+        bag-of-n-grams representation `unq_V` of `unq_X` computed by the
+        fitted vectorizers.
+        """
+        assert isinstance(unq_X[0], str), "Input data is not string. "
+        # Copy parameter rho
+        self.rho_ = self.rho
+        unq_V, ngrams_count, word_count = self._prune_vocabulary(
+            unq_V, lookup, ngrams_count, word_count
+        )
+        self._init_vars_from_counts(unq_X, unq_V, lookup, ngrams_count, word_count)
+        return self._fit_counts(unq_X, unq_V, lookup)
+
+    def _fit_counts(
+        self, unq_X: NDArray, unq_V: sparse.csr_matrix, lookup: NDArray
+    ) -> "GapEncoderColumn":
+        """
+        Run the minibatch optimization of the topics and activations,
+        initialized by ``_init_vars_from_counts``.
+        """
         # Attributes to monitor the convergence
         self._ewa_cost = None
         self._ewa_cost_min = None
         self._no_improvement = 0
-        # Check if first item has str or np.str_ type
-        assert isinstance(X[0], str), "Input data is not string. "
-        # Make n-grams counts matrix unq_V
-        unq_X, unq_V, lookup = self._init_vars(X)
-        n_batch = (len(X) - 1) // self.batch_size + 1
-        n_samples = len(X)
-        del X
+        n_batch = (len(lookup) - 1) // self.batch_size + 1
+        n_samples = len(lookup)
         # Get activations unq_H
         unq_H = self._get_H(unq_X)
         converged = False
@@ -324,8 +707,11 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
                     gamma_shape_prior=self.gamma_shape_prior,
                     gamma_scale_prior=self.gamma_scale_prior,
                 )
-                # Update the topics self.W_
-                _multiplicative_update_w(
+                # Update the topics self.W_, and compute the cost of the
+                # batch from the same products if needed
+                step = n_iter_ * n_batch + i
+                check_cost = step % self.check_cost_every == 0
+                result = _multiplicative_update_w(
                     unq_V[idx],
                     self.W_,
                     self.A_,
@@ -333,20 +719,18 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
                     unq_H[idx],
                     self.rescale_W,
                     self.rho_,
+                    return_cost=check_cost,
                 )
-                batch_cost = _beta_divergence(
-                    unq_V[idx],
-                    unq_H[idx],
-                    self.W_,
-                    "kullback-leibler",
-                    square_root=False,
-                ) / len(idx)
+                if not check_cost:
+                    continue
+                batch_cost = result[-1] / len(idx)
                 if self._minibatch_convergence(
                     batch_size=len(idx),
                     batch_cost=batch_cost,
                     n_samples=n_samples,
-                    step=n_iter_ * n_batch + i,
+                    step=step,
                     n_steps=self.max_iter * n_batch,
+                    n_batches=self.check_cost_every,
                 ):
                     converged = True
                     break
@@ -354,7 +738,7 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
                 break
 
         # Update self.H_dict_ with the learned encoded vectors (activations)
-        self.H_dict_.update(zip(unq_X, unq_H))
+        self.H_dict_.put_many(unq_X, unq_H)
         return self
 
     def get_feature_names_out(
@@ -418,8 +802,7 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
             unq_V2 = self.word_count_.transform(unq_X)
             unq_V = sparse.hstack((unq_V, unq_V2), format="csr")
 
-        self._add_unseen_keys_to_H_dict(unq_X)
-        unq_H = self._get_H(unq_X)
+        unq_H = self._get_or_init_H(unq_X, unq_V)
         # Given the learnt topics W, optimize the activations H to fit V = HW
         for slice in gen_batches(n=unq_H.shape[0], batch_size=self.batch_size):
             unq_H[slice] = _multiplicative_update_h(
@@ -456,41 +839,35 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
         GapEncoderColumn
             The fitted GapEncoderColumn instance (self).
         """
+        self._partial_fit(X)
+        return self
+
+    def _partial_fit(self, X: ArrayLike, return_cost: bool = False) -> float | None:
+        """
+        Update the model with the batch `X`, as ``partial_fit``.
 
-        # Init H_dict_ with empty dict if it's the first call of partial_fit
-        if not hasattr(self, "H_dict_"):
-            self.H_dict_ = dict()
-        # Same thing for the rho_ parameter
+        If `return_cost` is True, return the Kullback-Leibler divergence
+        between the n-grams counts of `X` and their factorization.
+        """
+        # Init the rho_ parameter if it's the first call of partial_fit
         if not hasattr(self, "rho_"):
             self.rho_ = self.rho
         # Check if first item has str or np.str_ type
         assert isinstance(X[0], str), "Input data is not string. "
         # Check if it is not the first batch
-        if hasattr(self, "vocabulary"):  # Update unq_X, unq_V with new batch
+        if hasattr(self, "H_dict_"):  # Update unq_X, unq_V with new batch
             unq_X, lookup = np.unique(X, return_inverse=True)
             unq_V = self.ngrams_count_.transform(unq_X)
             if self.add_words:
                 unq_V2 = self.word_count_.transform(unq_X)
                 unq_V = sparse.hstack((unq_V, unq_V2), format="csr")
-
-            unseen_X = np.setdiff1d(unq_X, np.array([*self.H_dict_]))
-            unseen_V = self.ngrams_count_.transform(unseen_X)
-            if self.add_words:
-                unseen_V2 = self.word_count_.transform(unseen_X)
-                unseen_V = sparse.hstack((unseen_V, unseen_V2), format="csr")
-
-            if unseen_V.shape[0] != 0:
-                unseen_H = _rescale_h(
-                    unseen_V, np.ones((len(unseen_X), self.n_components))
-                )
-                for x, h in zip(unseen_X, unseen_H):
-                    self.H_dict_[x] = h
-                del unseen_H
-            del unseen_X, unseen_V
+            # The activations of the unseen strings are initialized from
+            # their n-grams counts
+            unq_H = self._get_or_init_H(unq_X, unq_V)
         else:  # If it is the first batch, call _init_vars to init unq_X, unq_V
             unq_X, unq_V, lookup = self._init_vars(X)
+            unq_H = self._get_H(unq_X)
 
-        unq_H = self._get_H(unq_X)
         # Update unq_H, the activations
         unq_H = _multiplicative_update_h(
             unq_V,
@@ -503,7 +880,7 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
             gamma_scale_prior=self.gamma_scale_prior,
         )
         # Update the topics self.W_
-        _multiplicative_update_w(
+        result = _multiplicative_update_w(
             unq_V[lookup],
             self.W_,
             self.A_,
@@ -511,26 +888,29 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
             unq_H[lookup],
             self.rescale_W,
             self.rho_,
+            return_cost=return_cost,
         )
         # Update self.H_dict_ with the learned encoded vectors (activations)
-        self.H_dict_.update(zip(unq_X, unq_H))
-        return self
+        self.H_dict_.put_many(unq_X, unq_H)
+        if return_cost:
+            return result[-1]
 
-    def _add_unseen_keys_to_H_dict(self, X) -> None:
+    def _get_or_init_H(self, unq_X: NDArray, unq_V: sparse.csr_matrix) -> NDArray:
         """
-        Add activations of unseen string categories from `X` to `H_dict`.
+        Return the activations of the unique strings `unq_X`: the learnt ones
+        for the strings in `H_dict_`, and initial ones computed from their
+        n-grams counts `unq_V` for the others. `H_dict_` is not modified.
         """
-        unseen_X = np.setdiff1d(X, np.array([*self.H_dict_]))
-        if unseen_X.size > 0:
-            unseen_V = self.ngrams_count_.transform(unseen_X)
-            if self.add_words:
-                unseen_V2 = self.word_count_.transform(unseen_X)
-                unseen_V = sparse.hstack((unseen_V, unseen_V2), format="csr")
-
-            unseen_H = _rescale_h(
-                unseen_V, np.ones((unseen_V.shape[0], self.n_components))
+        is_known = self.H_dict_.contains_many(unq_X)
+        unq_H = np.empty((len(unq_X), self.n_components), dtype=self.dtype)
+        unq_H[is_known] = self._get_H(unq_X[is_known])
+        n_unseen = len(unq_X) - is_known.sum()
+        if n_unseen:
+            unq_H[~is_known] = _rescale_h(
+                unq_V[~is_known],
+                np.ones((n_unseen, self.n_components), dtype=self.dtype),
             )
-            self.H_dict_.update(zip(unseen_X, unseen_H))
+        return unq_H
 
     def transform(self, X: ArrayLike) -> NDArray:
         """Return the encoded vectors (activations) `H` of input strings in `X`.
@@ -546,19 +926,17 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
             Transformed input.
         """
         check_is_fitted(self, "H_dict_")
-        # Copy the state of H before continuing fitting it
-        pre_trans_H_dict_ = deepcopy(self.H_dict_)
         # Check if the first item has str or np.str_ type
         assert isinstance(X[0], str), "Input data is not string. "
-        unq_X = np.unique(X)
+        unq_X, lookup = np.unique(X, return_inverse=True)
         # Build the n-grams counts matrix V for the string data to encode
         unq_V = self.ngrams_count_.transform(unq_X)
         if self.add_words:  # Add words counts
             unq_V2 = self.word_count_.transform(unq_X)
             unq_V = sparse.hstack((unq_V, unq_V2), format="csr")
-        # Add unseen strings in X to H_dict
-        self._add_unseen_keys_to_H_dict(unq_X)
-        unq_H = self._get_H(unq_X)
+        # The activations are computed for the batch only, the learnt ones
+        # are left untouched
+        unq_H = self._get_or_init_H(unq_X, unq_V)
         # Loop over batches
         for slc in gen_batches(n=unq_H.shape[0], batch_size=self.batch_size):
             # Given the learnt topics W, optimize H to fit V = HW
@@ -572,12 +950,8 @@ class GapEncoderColumn(BaseEstimator, TransformerMixin):
                 gamma_shape_prior=self.gamma_shape_prior,
                 gamma_scale_prior=self.gamma_scale_prior,
             )
-        # Store and return the encoded vectors of X
-        self.H_dict_.update(zip(unq_X, unq_H))
-        feature_names_out = self._get_H(X)
-        # Restore H
-        self.H_dict_ = pre_trans_H_dict_
-        return feature_names_out
+        # Return the encoded vectors of X
+        return unq_H[lookup]
 
 
 class GapEncoder(TransformerMixin, BaseEstimator):
@@ -629,12 +1003,32 @@ class GapEncoder(TransformerMixin, BaseEstimator):
     hashing_n_features : int, default=2**12
         Number of features for the HashingVectorizer.
         Only relevant if `hashing=True`.
-    init : {'k-means++', 'random', 'k-means'}, default='k-means++'
+    min_df : int or float, default=1
+        Remove the n-grams (and words) that appear in fewer samples than
+        `min_df`, before allocating the topics. If float in range (0.0, 1.0],
+        the parameter represents a proportion of the samples.
+        Only relevant if `hashing=False`.
+    max_features : int, optional
+        If not None, keep only the `max_features` most frequent n-grams
+        (and words) in the samples, before allocating the topics. This bounds
+        the size of the topics, and the cost of their updates, on long texts.
+        Only relevant if `hashing=False`.
+    init : {'k-means++', 'random', 'k-means', 'minibatch-k-means'}, \
+default='k-means++'
         Initialization method of the `W` matrix.
         If `init='k-means++'`, we use the init method of KMeans.
         If `init='random'`, topics are initialized with a Gamma distribution.
         If `init='k-means'`, topics are initialized with a KMeans on the
-        n-grams counts.
+        n-grams counts. `init='minibatch-k-means'` uses a MiniBatchKMeans
+        instead, which is faster on many unique strings.
+    init_max_samples : int, optional
+        Maximum number of samples used to initialize the topics with
+        `init='k-means++'`, `init='k-means'` or `init='minibatch-k-means'`.
+        If the data has more samples, the topics are initialized on a random
+        subsample of this size, or of `n_components` samples if larger.
+        In any case, the initialization runs on the unique strings only,
+        weighted by their number of occurrences.
+        If None, all the samples are used.
     max_iter : int, default=5
         Maximum number of iterations on the input data.
     ngram_range : int 2-tuple, default=(2, 4)
@@ -663,6 +1057,27 @@ class GapEncoder(TransformerMixin, BaseEstimator):
         that do not yield an improvement on the smoothed cost function.
         To disable early stopping and run the process fully,
         set ``max_no_improvement=None``.
+    check_cost_every : int, default=1
+        Compute the cost used for early stopping only on one mini batch out of
+        `check_cost_every`. The cost is computed from the products needed to
+        update the topics, so that checking every mini batch is cheap, but
+        checking less often still saves some time on small batches.
+        The smoothing of the cost is scaled accordingly, and
+        `max_no_improvement` then counts the checked mini batches only.
+    dtype : {np.float64, np.float32}, default=np.float64
+        The dtype used to fit the model, store the topics and activations,
+        and encode the data. Using float32 halves the memory used by the
+        topics, and speeds up their updates, with encodings that are slightly
+        less precise.
+    warm_start : bool, default=False
+        If `True`, fitting again reuses the topics and the activations learnt
+        by the previous call to :term:`fit` as initialization, instead of
+        initializing them from scratch. Only the n-grams and the strings that
+        were not seen before are initialized. As the previous solution is
+        usually close to the new one, early stopping then ends the fit after
+        a few mini batches. The n-grams added to the vocabulary are selected
+        by `min_df` and `max_features` among the new n-grams only, so that
+        the vocabulary never has more than `max_features` n-grams.
     handle_missing : {'error', 'empty_impute'}, default='empty_impute'
         Whether to raise an error or impute with empty string ('') if missing
         values (NaN) are present during GapEncoder.fit (default is to impute).
@@ -788,7 +1203,12 @@ class GapEncoder(TransformerMixin, BaseEstimator):
         rescale_rho: bool = False,
         hashing: bool = False,
         hashing_n_features: int = 2**12,
-        init: Literal["k-means++", "random", "k-means"] = "k-means++",
+        min_df: int | float = 1,
+        max_features: int | None = None,
+        init: Literal[
+            "k-means++", "random", "k-means", "minibatch-k-means"
+        ] = "k-means++",
+        init_max_samples: int | None = None,
         max_iter: int = 5,
         ngram_range: tuple[int, int] = (2, 4),
         analyzer: Literal["word", "char", "char_wb"] = "char",
@@ -797,6 +1217,9 @@ class GapEncoder(TransformerMixin, BaseEstimator):
         rescale_W: bool = True,
         max_iter_e_step: int = 1,
         max_no_improvement: int = 5,
+        check_cost_every: int = 1,
+        dtype: type = np.float64,
+        warm_start: bool = False,
         handle_missing: Literal["error", "empty_impute"] = "zero_impute",
         n_jobs: int | None = None,
         verbose: int = 0,
@@ -810,14 +1233,20 @@ class GapEncoder(TransformerMixin, BaseEstimator):
         self.batch_size = batch_size
         self.hashing = hashing
         self.hashing_n_features = hashing_n_features
+        self.min_df = min_df
+        self.max_features = max_features
         self.max_iter = max_iter
         self.init = init
+        self.init_max_samples = init_max_samples
         self.analyzer = analyzer
         self.add_words = add_words
         self.random_state = random_state
         self.rescale_W = rescale_W
         self.max_iter_e_step = max_iter_e_step
         self.max_no_improvement = max_no_improvement
+        self.check_cost_every = check_cost_every
+        self.dtype = dtype
+        self.warm_start = warm_start
         self.handle_missing = handle_missing
         self.n_jobs = n_jobs
         self.verbose = verbose
@@ -836,16 +1265,69 @@ class GapEncoder(TransformerMixin, BaseEstimator):
             batch_size=self.batch_size,
             hashing=self.hashing,
             hashing_n_features=self.hashing_n_features,
+            min_df=self.min_df,
+            max_features=self.max_features,
             max_iter=self.max_iter,
             init=self.init,
+            init_max_samples=self.init_max_samples,
             add_words=self.add_words,
             random_state=self.random_state,
             rescale_W=self.rescale_W,
             max_iter_e_step=self.max_iter_e_step,
             max_no_improvement=self.max_no_improvement,
+            check_cost_every=self.check_cost_every,
+            dtype=self.dtype,
+            warm_start=self.warm_start,
             verbose=self.verbose,
         )
 
+    def _check_dtype(self):
+        try:
+            dtype = np.dtype(self.dtype)
+        except TypeError:
+            dtype = None
+        if dtype not in [np.float64, np.float32]:
+            raise ValueError(
+                f"Got dtype={self.dtype!r}, but expected "
+                "any of {np.float64, np.float32}. "
+            )
+
+    def _check_params(self):
+        if isinstance(self.min_df, numbers.Integral):
+            valid_min_df = self.min_df >= 1
+        else:
+            valid_min_df = (
+                isinstance(self.min_df, numbers.Real) and 0 < self.min_df <= 1
+            )
+        if not valid_min_df:
+            raise ValueError(
+                f"Got min_df={self.min_df!r}, but expected an int >= 1 or a "
+                "float in (0, 1]. "
+            )
+        if self.max_features is not None and not (
+            isinstance(self.max_features, numbers.Integral) and self.max_features >= 1
+        ):
+            raise ValueError(
+                f"Got max_features={self.max_features!r}, but expected a "
+                "positive int or None. "
+            )
+        if self.init_max_samples is not None and not (
+            isinstance(self.init_max_samples, numbers.Integral)
+            and self.init_max_samples >= 1
+        ):
+            raise ValueError(
+                f"Got init_max_samples={self.init_max_samples!r}, but expected "
+                "a positive int or None. "
+            )
+        if not (
+            isinstance(self.check_cost_every, numbers.Integral)
+            and self.check_cost_every >= 1
+        ):
+            raise ValueError(
+                f"Got check_cost_every={self.check_cost_every!r}, but expected "
+                "a positive int. "
+            )
+
     def _handle_missing(self, X):
         """
         Imputes missing values with `` or raises an error
@@ -889,6 +1371,8 @@ class GapEncoder(TransformerMixin, BaseEstimator):
             raise ValueError(
                 f"n_samples={n_samples} should be >= n_components={self.n_components}. "
             )
+        self._check_dtype()
+        self._check_params()
         # Copy parameter rho
         self.rho_ = self.rho
         # If X is a dataframe, store its column names
@@ -896,14 +1380,98 @@ class GapEncoder(TransformerMixin, BaseEstimator):
             self.column_names_ = list(X.columns)
         # Check input data shape
         X = check_input(X)
-        self._check_n_features(X, reset=True)
+        warm_start = self.warm_start and hasattr(self, "fitted_models_")
+        self._check_n_features(X, reset=not warm_start)
         X = self._handle_missing(X)
+        if warm_start:
+            return self._fit_warm_start(X)
+        # The columns are vectorized here, so that only their unique values
+        # and sparse n-grams counts are sent to the workers
         self.fitted_models_ = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
-            delayed(self._create_column_gap_encoder().fit)(X[:, k])
-            for k in range(X.shape[1])
+            delayed(self._create_column_gap_encoder()._fit_from_counts)(*counts)
+            for counts in self._count_ngrams(X)
         )
         return self
 
+    def _fit_warm_start(self, X: NDArray) -> "GapEncoder":
+        """
+        Fit the models of the columns of `X` again, starting from their
+        current topics and activations.
+        """
+        params = self._create_column_gap_encoder().get_params()
+        for param in [
+            "n_components",
+            "hashing",
+            "hashing_n_features",
+            "ngram_range",
+            "analyzer",
+            "add_words",
+            "dtype",
+        ]:
+            fitted_value = self.fitted_models_[0].get_params()[param]
+            if fitted_value != params[param]:
+                raise ValueError(
+                    f"Got {param}={params[param]!r}, but the encoder was fitted "
+                    f"with {param}={fitted_value!r}: it cannot be warm started. "
+                )
+        for model in self.fitted_models_:
+            model.set_params(**params)
+        self.fitted_models_ = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+            delayed(model.fit)(X[:, k]) for k, model in enumerate(self.fitted_models_)
+        )
+        return self
+
+    def _count_ngrams(self, X: NDArray) -> list[tuple]:
+        """
+        Build the bag-of-n-grams representation of each column of `X`.
+
+        Each distinct string of `X` is tokenized only once, even if it
+        appears in several columns. The vocabulary of each column is then
+        restricted to its own n-grams, so that the counts and the fitted
+        vectorizers are the same as if each column was vectorized separately.
+
+        Returns
+        -------
+        list of tuple
+            For each column, its unique values `unq_X`, their n-grams counts
+            `unq_V`, the `lookup` array such that ``X[:, k] = unq_X[lookup]``,
+            and the fitted n-grams and word counts vectorizers, as expected by
+            ``GapEncoderColumn._fit_from_counts``.
+        """
+        columns = [np.unique(X[:, k], return_inverse=True) for k in range(X.shape[1])]
+        # Rows of the unique values of each column in the unique values of X
+        all_unq_X, all_rows = np.unique(
+            np.concatenate([unq_X for unq_X, _ in columns]), return_inverse=True
+        )
+        row_bounds = np.cumsum([0] + [len(unq_X) for unq_X, _ in columns])
+        vectorizers = self._create_column_gap_encoder()._make_vectorizers()
+        all_V = [
+            None if vectorizer is None else vectorizer.fit_transform(all_unq_X)
+            for vectorizer in vectorizers
+        ]
+
+        counts = []
+        for (unq_X, lookup), start, stop in zip(columns, row_bounds, row_bounds[1:]):
+            rows = all_rows[start:stop]
+            col_vectorizers, col_V = [], []
+            for vectorizer, V in zip(vectorizers, all_V):
+                if vectorizer is None:
+                    col_vectorizers.append(None)
+                    continue
+                V = V[rows]
+                if isinstance(vectorizer, CountVectorizer):
+                    features = np.unique(V.indices)
+                    V = V[:, features]
+                    V.sort_indices()
+                    vectorizer = _set_vocabulary(
+                        vectorizer, vectorizer.get_feature_names_out()[features]
+                    )
+                col_vectorizers.append(vectorizer)
+                col_V.append(V)
+            unq_V = col_V[0] if len(col_V) == 1 else sparse.hstack(col_V, format="csr")
+            counts.append((unq_X, unq_V, lookup, *col_vectorizers))
+        return counts
+
     def transform(self, X: ArrayLike) -> NDArray:
         """Return the encoded vectors (activations) `H` of input strings in `X`.
 
@@ -911,9 +1479,8 @@ class GapEncoder(TransformerMixin, BaseEstimator):
         ``V = HW``. When `X` has several columns, they are encoded separately
         and then concatenated.
 
-        Remark: calling transform multiple times in a row on the same
-        input `X` can give slightly different encodings. This is expected
-        due to a caching mechanism to speed things up.
+        The learnt activations of the strings seen during :term:`fit` are
+        used as a starting point, and are not modified.
 
         Parameters
         ----------
@@ -955,6 +1522,8 @@ class GapEncoder(TransformerMixin, BaseEstimator):
             The fitted GapEncoder instance (self).
         """
 
+        self._check_dtype()
+        self._check_params()
         # If X is a dataframe, store its column names
         if isinstance(X, pd.DataFrame):
             self.column_names_ = list(X.columns)
@@ -971,6 +1540,95 @@ class GapEncoder(TransformerMixin, BaseEstimator):
             self.fitted_models_[k].partial_fit(X[:, k])
         return self
 
+    def fit_from_batches(
+        self, X_batches: Iterable | Callable[[], Iterable], n_epochs: int = 1
+    ) -> "GapEncoder":
+        """Fit the instance on an iterable of batches of rows, one at a time.
+
+        This allows fitting on datasets that do not fit in memory, e.g. read
+        chunk by chunk from parquet or CSV files. Each batch updates the
+        model as :meth:`partial_fit`, and only the learnt topics and the
+        activations of the distinct strings seen so far are kept in memory.
+        Training stops early when the cost of the batches stops improving,
+        as controlled by `max_no_improvement`.
+
+        The model is trained from scratch. As with :meth:`partial_fit`, the
+        n-grams vocabulary is built on the first batch when `hashing=False`:
+        use `hashing=True` if the first batch is not representative.
+
+        Parameters
+        ----------
+        X_batches : iterable of array-like, or callable
+            The batches of rows, shape (n_batch_samples, n_features). They can
+            be arrays, pandas dataframes, or any object with a ``to_pandas``
+            method such as Arrow record batches or tables. To run several
+            epochs, pass a collection that can be iterated several times
+            such as a list, or a callable returning a new iterable of batches
+            for each epoch, e.g. ``lambda: pd.read_csv(path, chunksize=10_000)``.
+        n_epochs : int, default=1
+            The maximum number of passes over the batches.
+
+        Returns
+        -------
+        GapEncoder
+            The fitted GapEncoder instance (self).
+        """
+        self._check_dtype()
+        self._check_params()
+        if n_epochs > 1 and not callable(X_batches) and iter(X_batches) is X_batches:
+            raise ValueError(
+                f"Got n_epochs={n_epochs}, but X_batches is an iterator that can "
+                "only be iterated once. Pass a list or a callable returning a new "
+                "iterable of batches instead. "
+            )
+        for attribute in ["fitted_models_", "column_names_"]:
+            if hasattr(self, attribute):
+                delattr(self, attribute)
+        # Copy parameter rho
+        self.rho_ = self.rho
+        n_samples, step = 0, 0
+        for epoch in range(n_epochs):
+            batches = X_batches() if callable(X_batches) else X_batches
+            for X in batches:
+                if hasattr(X, "to_pandas"):
+                    X = X.to_pandas()
+                if isinstance(X, pd.DataFrame) and not hasattr(self, "column_names_"):
+                    self.column_names_ = list(X.columns)
+                X = check_input(X)
+                X = self._handle_missing(X)
+                if not hasattr(self, "fitted_models_"):
+                    self._check_n_features(X, reset=True)
+                    self.fitted_models_ = [
+                        self._create_column_gap_encoder() for _ in range(X.shape[1])
+                    ]
+                    converged = np.zeros(X.shape[1], dtype=bool)
+                    for model in self.fitted_models_:
+                        model._ewa_cost = None
+                        model._ewa_cost_min = None
+                        model._no_improvement = 0
+                else:
+                    self._check_n_features(X, reset=False)
+                # The total number of samples is only known after one epoch
+                if epoch == 0:
+                    n_samples += len(X)
+                for k, model in enumerate(self.fitted_models_):
+                    if converged[k]:
+                        continue
+                    batch_cost = model._partial_fit(X[:, k], return_cost=True)
+                    converged[k] = model._minibatch_convergence(
+                        batch_size=len(X),
+                        batch_cost=batch_cost / len(X),
+                        n_samples=n_samples,
+                        step=step,
+                        n_steps=None,
+                    )
+                step += 1
+                if converged.all():
+                    return self
+            if not hasattr(self, "fitted_models_"):
+                raise ValueError("X_batches did not yield any batch. ")
+        return self
+
     def get_feature_names_out(
         self,
         col_names: Literal["auto"] | list[str] | None = None,
@@ -1070,6 +1728,18 @@ class GapEncoder(TransformerMixin, BaseEstimator):
         }
 
 
+def _set_vocabulary(
+    vectorizer: CountVectorizer, vocabulary: NDArray
+) -> CountVectorizer:
+    """
+    Return a fitted copy of `vectorizer` with the fixed `vocabulary`.
+    """
+    # With a fixed vocabulary, fit only validates it
+    vectorizer = clone(vectorizer).set_params(vocabulary=vocabulary)
+    vectorizer.fit([])
+    return vectorizer
+
+
 def _rescale_W(W: NDArray, A: NDArray) -> None:
     """
     Rescale the topics `W` to have a L1-norm equal to 1.
@@ -1080,27 +1750,26 @@ def _rescale_W(W: NDArray, A: NDArray) -> None:
     A /= s
 
 
-def _special_sparse_dot(H, W, X):
-    """Computes np.dot(H, W), only where X is non zero."""
-    # adapted from sklearn.decomposition.MiniBatchNMF
-    if sp.issparse(X):
-        ii, jj = X.nonzero()
-        n_vals = ii.shape[0]
-        dot_vals = np.empty(n_vals)
-        n_components = H.shape[1]
-        batch_size = max(n_components, n_vals // n_components)
-        for start in range(0, n_vals, batch_size):
-            batch = slice(start, start + batch_size)
-            dot_vals[batch] = np.multiply(H[ii[batch], :], W.T[jj[batch], :]).sum(
-                axis=1
-            )
-
-        HW = sp.coo_matrix((dot_vals, (ii, jj)), shape=X.shape)
-        # in sklearn, it was return WH.tocsr(), but it breaks the code in our case
-        # I'm not sure why
-        return HW
-    else:
-        return np.dot(H, W)
+def _kl_divergence(V_data: NDArray, HW_data: NDArray, H: NDArray, W: NDArray) -> float:
+    """
+    Compute the Kullback-Leibler divergence between a sparse matrix `V` and
+    ``np.dot(H, W)``, from their values `V_data` and `HW_data` at the non-zero
+    entries of `V`.
+    """
+    # adapted from sklearn.decomposition._nmf._beta_divergence
+    # The sums are computed in float64, even if the model is in float32
+    V_data = V_data.astype(np.float64)
+    HW_data = HW_data.astype(np.float64)
+    H = H.astype(np.float64)
+    W = W.astype(np.float64)
+    epsilon = np.finfo(np.float32).eps
+    # do not affect the zeros: here 0 ** (-1) = 0 and not infinity
+    indices = V_data > epsilon
+    V_data = V_data[indices]
+    HW_data = np.maximum(HW_data[indices], epsilon)
+    # fast and memory efficient computation of np.sum(np.dot(H, W))
+    sum_HW = np.dot(np.sum(H, axis=0), np.sum(W, axis=1))
+    return np.dot(V_data, np.log(V_data / HW_data)) + sum_HW - V_data.sum()
 
 
 def _multiplicative_update_w(
@@ -1111,14 +1780,22 @@ def _multiplicative_update_w(
     Ht: NDArray,
     rescale_W: bool,
     rho: float,
-) -> tuple[NDArray, NDArray, NDArray]:
+    return_cost: bool = False,
+) -> tuple[NDArray, NDArray, NDArray] | tuple[NDArray, NDArray, NDArray, float]:
     """
     Multiplicative update step for the topics `W`.
+
+    Note that the values of `Vt` are modified in-place.
+    If `return_cost` is True, the Kullback-Leibler divergence between `Vt`
+    and ``np.dot(Ht, W)`` before the update is also returned. It is computed
+    from the products at the non-zero entries of `Vt` needed for the update.
     """
+    Vt = sparse.csr_matrix(Vt)
     A *= rho
-    HtW = _special_sparse_dot(Ht, W, Vt)
+    HtW_data = _dot_nonzero(Ht, W, Vt)
+    if return_cost:
+        cost = _kl_divergence(Vt.data, HtW_data, Ht, W)
     Vt_data = Vt.data
-    HtW_data = HtW.data
     np.divide(Vt_data, HtW_data + 1e-10, out=Vt_data)
     HtVt = safe_sparse_dot(Ht.T, Vt)
     A += W * HtVt
@@ -1127,6 +1804,8 @@ def _multiplicative_update_w(
     np.divide(A, B, out=W)
     if rescale_W:
         _rescale_W(W, A)
+    if return_cost:
+        return W, A, B, cost
     return W, A, B
 
 
@@ -1140,6 +1819,23 @@ def _rescale_h(V: NDArray, H: NDArray) -> NDArray:
     return H
 
 
+def _dot_nonzero(H: NDArray, W: NDArray, V: sparse.csr_matrix) -> NDArray:
+    """
+    Compute ``np.dot(H, W)`` at the non-zero entries of the CSR matrix `V`,
+    in the order of ``V.data``.
+    """
+    rows = np.repeat(np.arange(V.shape[0]), np.diff(V.indptr))
+    dot_vals = np.empty(len(rows), dtype=np.result_type(H, W))
+    # Bound the size of the temporary arrays of shape (batch_size, n_components)
+    batch_size = max(2**16 // max(H.shape[1], 1), 1)
+    for start in range(0, len(rows), batch_size):
+        batch = slice(start, start + batch_size)
+        dot_vals[batch] = np.einsum(
+            "ij,ji->i", H[rows[batch]], W[:, V.indices[batch]], optimize=False
+        )
+    return dot_vals
+
+
 def _multiplicative_update_h(
     Vt: NDArray,
     W: NDArray,
@@ -1152,6 +1848,10 @@ def _multiplicative_update_h(
 ):
     """
     Multiplicative update step for the activations `H`.
+
+    All the rows are updated at once with sparse matrix products. A row
+    stops being updated when the squared relative change of its activations
+    is below ``epsilon ** 2``.
     """
     if rescale_W:
         WT1 = 1 + 1 / gamma_scale_prior
@@ -1161,19 +1861,23 @@ def _multiplicative_update_h(
         W_WT1 = W / WT1.reshape(-1, 1)
     const = (gamma_shape_prior - 1) / WT1
     squared_epsilon = epsilon**2
-    for vt, ht in zip(Vt, Ht):
-        vt_ = vt.data
-        idx = vt.indices
-        W_WT1_ = W_WT1[:, idx]
-        W_ = W[:, idx]
-        squared_norm = 1
-        for _ in range(max_iter):
-            if squared_norm <= squared_epsilon:
-                break
-            aux = np.dot(W_WT1_, vt_ / (np.dot(ht, W_) + 1e-10))
-            ht_out = ht * aux + const
-            squared_norm = np.dot(ht_out - ht, ht_out - ht) / np.dot(ht, ht)
-            ht[:] = ht_out
+    Vt = sparse.csr_matrix(Vt)
+    # Rows of Vt and Ht that have not converged yet
+    active = np.arange(Vt.shape[0])
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        vt = Vt if len(active) == Vt.shape[0] else Vt[active]
+        ht = Ht[active]
+        ratio = sparse.csr_matrix(
+            (vt.data / (_dot_nonzero(ht, W, vt) + 1e-10), vt.indices, vt.indptr),
+            shape=vt.shape,
+        )
+        aux = safe_sparse_dot(ratio, W_WT1.T)
+        ht_out = ht * aux + const
+        squared_norm = ((ht_out - ht) ** 2).sum(axis=1) / (ht**2).sum(axis=1)
+        Ht[active] = ht_out
+        active = active[~(squared_norm <= squared_epsilon)]
     return Ht
 
 
@@ -1191,22 +1895,87 @@ def batch_lookup(
         yield unq_indices, indices
 
 
+def _subsample(
+    sample_weight: NDArray,
+    max_samples: int | None,
+    random_state: RandomState,
+) -> tuple[NDArray, NDArray]:
+    """
+    Subsample weighted samples, as if drawing `max_samples` rows with
+    replacement from the data in which sample ``i`` occurs
+    ``sample_weight[i]`` times.
+    Returns the indices of the drawn samples and their new weights, the
+    number of times they were drawn.
+    """
+    if max_samples is None or sample_weight.sum() <= max_samples:
+        return np.arange(len(sample_weight)), sample_weight
+    counts = random_state.multinomial(max_samples, sample_weight / sample_weight.sum())
+    indices = np.flatnonzero(counts)
+    return indices, counts[indices]
+
+
+def _weighted_kmeans_plusplus(
+    V: sparse.csr_matrix,
+    n_clusters: int,
+    sample_weight: NDArray,
+    random_state: RandomState,
+) -> NDArray:
+    """
+    Run the k-means++ initialization on the rows of `V` weighted by
+    `sample_weight`. The rows are repeated according to their weights with
+    scikit-learn < 1.3, which does not support sample weights, or if there
+    are fewer unique rows than clusters.
+    """
+    if (
+        parse_version(sklearn.__version__) < parse_version("1.3")
+        or V.shape[0] < n_clusters
+    ):
+        V = V[np.repeat(np.arange(V.shape[0]), sample_weight.astype(np.int64))]
+        kwargs = {}
+    else:
+        kwargs = {"sample_weight": sample_weight}
+    centers, _ = kmeans_plusplus(
+        V,
+        n_clusters,
+        x_squared_norms=row_norms(V, squared=True),
+        random_state=random_state,
+        n_local_trials=None,
+        **kwargs,
+    )
+    return centers
+
+
 def get_kmeans_prototypes(
     X: ArrayLike,
     n_prototypes: int,
     analyzer: Literal["word", "char", "char_wb"] = "char",
     hashing_dim: int = 128,
     ngram_range: tuple[int, int] = (2, 4),
-    sparse: bool = False,
+    sparse: bool = True,
     sample_weight=None,
     random_state: int | RandomState | None = None,
+    max_samples: int | None = None,
+    minibatch: bool = False,
 ) -> NDArray:
     """
     Computes prototypes based on:
       - dimensionality reduction (via hashing n-grams)
       - k-means clustering
       - nearest neighbor
+
+    The k-means runs on the unique values of `X`, weighted by their total
+    `sample_weight`. If `max_samples` is not None, it runs on a random
+    subsample of `max_samples` values of `X` at most instead. The k-means
+    runs on the sparse hashed n-grams counts, unless `sparse` is False, in
+    which case they are densified first.
+    If `minibatch` is True, MiniBatchKMeans is used instead of KMeans.
+    The prototypes are the unique values nearest to the cluster centers.
     """
+    random_state = check_random_state(random_state)
+    unq_X, lookup = np.unique(np.asarray(X), return_inverse=True)
+    unq_weight = np.bincount(lookup, weights=sample_weight, minlength=len(unq_X))
+    indices, unq_weight = _subsample(unq_weight, max_samples, random_state)
+    unq_X = unq_X[indices]
     vectorizer = HashingVectorizer(
         analyzer=analyzer,
         norm=None,
@@ -1214,13 +1983,18 @@ def get_kmeans_prototypes(
         ngram_range=ngram_range,
         n_features=hashing_dim,
     )
-    projected = vectorizer.transform(X)
+    projected = vectorizer.transform(unq_X)
     if not sparse:
         projected = projected.toarray()
-    kmeans = KMeans(n_clusters=n_prototypes, n_init=10, random_state=random_state)
-    kmeans.fit(projected, sample_weight=sample_weight)
-    centers = kmeans.cluster_centers_
-    neighbors = NearestNeighbors()
-    neighbors.fit(projected)
-    indexes_prototypes = np.unique(neighbors.kneighbors(centers, 1)[-1])
-    return np.sort(X[indexes_prototypes])
+    n_clusters = min(n_prototypes, len(unq_X))
+    if minibatch:
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters, n_init=3, random_state=random_state
+        )
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state)
+    kmeans.fit(projected, sample_weight=unq_weight)
+    indexes_prototypes = np.unique(
+        pairwise_distances_argmin(kmeans.cluster_centers_, projected)
+    )
+    return np.sort(unq_X[indexes_prototypes])
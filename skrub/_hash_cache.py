@@ -0,0 +1,373 @@
+"""
+Cache of string hashes, used by the MinHashEncoder.
+
+The hashes are stored as the rows of a single array, and a dictionary maps
+each string to its row. The cache can be saved to a directory and loaded
+back with the hash array memory-mapped, so that it is shared read-only
+between processes (e.g. joblib workers, or successive scoring runs).
+"""
+
+import json
+import os
+import re
+import uuid
+from collections.abc import Collection, Hashable, KeysView
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from ._fast_hash import pack_strings
+
+_SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30}
+
+_METADATA_FILE = "hash_cache.json"
+
+
+def parse_cache_size(
+    cache_size: int | str, n_components: int, dtype: np.dtype | type = np.float64
+) -> int:
+    """
+    Convert a cache size to a number of entries.
+
+    Parameters
+    ----------
+    cache_size : int or str
+        Either a number of entries, or a memory budget for the hash array
+        given as a string such as ``"500K"``, ``"100MB"`` or ``"2G"``.
+    n_components : int
+        The number of values stored for each entry.
+    dtype : dtype, default=np.float64
+        The dtype of the stored values.
+
+    Returns
+    -------
+    int
+        The maximum number of entries of the cache.
+    """
+    if isinstance(cache_size, str):
+        match = re.fullmatch(
+            r"\s*(\d+(?:\.\d*)?)\s*([KMG]?)i?B?\s*", cache_size, flags=re.IGNORECASE
+        )
+        if match is None:
+            raise ValueError(
+                f"Got cache_size={cache_size!r}, but expected an int or a memory "
+                "size such as '500K', '100MB' or '2G'. "
+            )
+        n_bytes = float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()]
+        row_bytes = max(n_components, 1) * np.dtype(dtype).itemsize
+        return max(int(n_bytes // row_bytes), 1)
+    if isinstance(cache_size, (int, np.integer)) and cache_size > 0:
+        return int(cache_size)
+    raise ValueError(
+        f"Got cache_size={cache_size!r}, but expected a positive int or a memory "
+        "size such as '500K', '100MB' or '2G'. "
+    )
+
+
+def _read_files(path: Path) -> dict[str, str]:
+    """Return the files of the cache saved in `path`, if any."""
+    try:
+        return json.loads((path / _METADATA_FILE).read_text())["files"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return {}
+
+
+class HashCache:
+    """Cache of fixed-size hash vectors, with limited capacity and LRU eviction.
+
+    The hashes are stored in the rows of a single array, grown as needed up
+    to `capacity` rows, and a dict maps each key to its row. The time of
+    last use of each row is tracked in another array: when the cache is
+    full, new entries replace the least recently used ones.
+
+    Besides the dict-like interface, ``get_many`` and ``put_many`` look up
+    and insert whole batches of keys at once.
+
+    Parameters
+    ----------
+    n_components : int
+        The size of the stored vectors.
+    capacity : int, default=1024
+        The maximum number of entries, at least 1.
+    dtype : dtype, default=np.float64
+        The dtype of the stored vectors.
+    metadata : dict, optional
+        JSON-serializable information saved along with the cache, used to
+        check that a cache loaded from disk is compatible.
+
+    Attributes
+    ----------
+    modified : bool
+        Whether entries were inserted since the cache was created, saved or
+        loaded.
+    """
+
+    def __init__(
+        self,
+        n_components: int,
+        capacity: int = 1024,
+        dtype: np.dtype | type = np.float64,
+        metadata: dict | None = None,
+    ):
+        if not isinstance(capacity, (int, np.integer)) or capacity < 1:
+            raise ValueError(
+                f"Got capacity={capacity!r}, but expected a positive int. "
+            )
+        self.n_components = n_components
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.metadata = {} if metadata is None else metadata
+        self._index: dict[Hashable, int] = {}
+        self._keys: list[Hashable] = []
+        self._values = np.empty((0, n_components), dtype=self.dtype)
+        # Time of last use of each row, and current time
+        self._last_used = np.empty(0, dtype=np.int64)
+        self._clock = 0
+        self.modified = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    def __getitem__(self, key: Hashable) -> NDArray:
+        row = self._index[key]
+        self._clock += 1
+        self._last_used[row] = self._clock
+        return self._values[row]
+
+    def __setitem__(self, key: Hashable, value: ArrayLike):
+        self.put_many([key], np.asarray(value)[None])
+
+    def keys(self) -> KeysView[Hashable]:
+        """Return a view of the cached keys."""
+        return self._index.keys()
+
+    def get(self, key: Hashable, default=None):
+        """Return the value of `key` if it is cached, else `default`."""
+        if key not in self._index:
+            return default
+        return self[key]
+
+    def get_many(self, keys: Collection[Hashable]) -> tuple[NDArray, NDArray]:
+        """
+        Look up a batch of keys.
+
+        Parameters
+        ----------
+        keys : collection of hashable
+            The keys to look up.
+
+        Returns
+        -------
+        values : ndarray of shape (n_found, n_components)
+            The values of the keys that are cached, in the order of `keys`.
+        found : ndarray of shape (n_keys, )
+            Boolean mask of the keys that are cached.
+        """
+        rows = np.fromiter(
+            (self._index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys)
+        )
+        found = rows >= 0
+        rows = rows[found]
+        self._clock += 1
+        self._last_used[rows] = self._clock
+        return self._values[rows], found
+
+    def put_many(self, keys: Collection[Hashable], values: ArrayLike):
+        """
+        Insert or update a batch of keys.
+
+        If there are more new keys than free rows, the least recently used
+        entries are evicted. If there are more keys than the capacity, only
+        the last ones are kept.
+
+        Parameters
+        ----------
+        keys : collection of hashable
+            The keys to insert.
+        values : array-like of shape (n_keys, n_components)
+            The values of the keys.
+        """
+        # Deduplicate the keys, keeping the last value of each
+        positions = {key: position for position, key in enumerate(keys)}
+        keys = list(positions)
+        values = np.asarray(values)[list(positions.values())]
+        if len(keys) > self.capacity:
+            keys, values = keys[-self.capacity :], values[-self.capacity :]
+        self._ensure_writeable()
+        self._clock += 1
+        self.modified = True
+
+        rows = np.fromiter(
+            (self._index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys)
+        )
+        is_new = rows < 0
+        new_positions = np.flatnonzero(is_new)
+        # Mark the updated rows as used so that they are not evicted below
+        self._last_used[rows[~is_new]] = self._clock
+
+        n_free = self.capacity - len(self._keys)
+        n_appended = min(len(new_positions), n_free)
+        new_rows = np.arange(len(self._keys), len(self._keys) + n_appended)
+        self._reserve(len(self._keys) + n_appended)
+        self._keys.extend(keys[i] for i in new_positions[:n_appended])
+        self._last_used[new_rows] = self._clock
+
+        n_evicted = len(new_positions) - n_appended
+        if n_evicted:
+            evicted_rows = np.argpartition(
+                self._last_used[: len(self._keys)], n_evicted - 1
+            )[:n_evicted]
+            for position, row in zip(new_positions[n_appended:], evicted_rows):
+                del self._index[self._keys[row]]
+                self._keys[row] = keys[position]
+            new_rows = np.concatenate([new_rows, evicted_rows])
+
+        for position, row in zip(new_positions, new_rows):
+            self._index[keys[position]] = row
+        rows[new_positions] = new_rows
+        self._values[rows] = values
+        self._last_used[rows] = self._clock
+
+    def _reserve(self, n_rows: int):
+        """Make room for `n_rows` rows, growing the arrays geometrically."""
+        if n_rows <= len(self._values):
+            return
+        new_len = min(max(n_rows, 2 * len(self._values), 16), self.capacity)
+        values = np.empty((new_len, self.n_components), dtype=self.dtype)
+        values[: len(self._keys)] = self._values[: len(self._keys)]
+        self._values = values
+        last_used = np.zeros(new_len, dtype=np.int64)
+        last_used[: len(self._keys)] = self._last_used[: len(self._keys)]
+        self._last_used = last_used
+
+    def _ensure_writeable(self):
+        """Copy the values in memory if they are a read-only memory map."""
+        if not self._values.flags.writeable:
+            self._values = np.array(self._values)
+
+    def _lru_order(self) -> NDArray:
+        """Return the rows, from the least to the most recently used."""
+        return np.argsort(self._last_used[: len(self._keys)], kind="stable")
+
+    def save(self, path: str | Path):
+        """
+        Save the cache in the directory `path`.
+
+        The files are written under unique names, and the metadata file
+        pointing to them is replaced atomically last, so that concurrent
+        readers always see a consistent cache. Only the files of the cache
+        whose metadata is replaced are then removed, so that concurrent
+        writers do not remove each other's files.
+
+        Parameters
+        ----------
+        path : str or Path
+            The directory where the cache is stored. Created if needed.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        token = uuid.uuid4().hex
+        files = {name: f"{name}-{token}.npy" for name in ["values", "keys", "offsets"]}
+        # Store the entries from the least to the most recently used
+        order = self._lru_order()
+        key_buffer, key_offsets = pack_strings([self._keys[row] for row in order])
+        np.save(path / files["values"], self._values[order])
+        np.save(path / files["keys"], key_buffer)
+        np.save(path / files["offsets"], key_offsets)
+        info = {
+            "files": files,
+            "n_components": self.n_components,
+            "dtype": self.dtype.str,
+            "metadata": self.metadata,
+        }
+        tmp_file = path / f"{_METADATA_FILE}.{token}"
+        tmp_file.write_text(json.dumps(info))
+        replaced_files = _read_files(path)
+        os.replace(tmp_file, path / _METADATA_FILE)
+        self.modified = False
+
+        # Remove the files of the cache that was saved there. The files of
+        # other caches being saved concurrently are left untouched.
+        for name in replaced_files.values():
+            if name not in files.values():
+                (path / name).unlink(missing_ok=True)
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        capacity: int | None = None,
+        mmap_mode: str | None = "r",
+    ) -> "HashCache":
+        """
+        Load a cache saved with ``save``.
+
+        Parameters
+        ----------
+        path : str or Path
+            The directory where the cache is stored.
+        capacity : int, optional
+            The capacity of the loaded cache, at least 1. Defaults to the
+            number of stored entries, or 1 if there are none. If smaller, only
+            the most recently used entries are kept.
+        mmap_mode : {None, 'r', 'c'}, default='r'
+            Passed to ``numpy.load`` to memory-map the hash array. The array
+            is only copied in memory when new entries are added.
+
+        Returns
+        -------
+        HashCache
+            The loaded cache.
+        """
+        path = Path(path)
+        info = json.loads((path / _METADATA_FILE).read_text())
+        files = info["files"]
+        values = np.load(path / files["values"], mmap_mode=mmap_mode)
+        key_bytes = np.load(path / files["keys"]).tobytes()
+        key_offsets = np.load(path / files["offsets"])
+        keys = [
+            key_bytes[start:stop].decode()
+            for start, stop in zip(key_offsets[:-1], key_offsets[1:])
+        ]
+
+        if capacity is not None and capacity < len(keys):
+            # Keep the most recently used entries
+            keys = keys[len(keys) - capacity :]
+            values = values[len(values) - capacity :]
+
+        cache = cls(
+            info["n_components"],
+            capacity=max(len(keys), 1) if capacity is None else capacity,
+            dtype=info["dtype"],
+            metadata=info["metadata"],
+        )
+        cache._keys = keys
+        cache._index = {key: row for row, key in enumerate(keys)}
+        cache._values = values
+        cache._last_used = np.arange(len(keys), dtype=np.int64)
+        cache._clock = len(keys)
+        return cache
+
+
+def combine_hash_caches(capacity: int, *caches: HashCache) -> HashCache:
+    """
+    Combine several caches into a single one with the given capacity.
+
+    The entries of each cache are copied as one block, from the least to the
+    most recently used, so that the most recently used entries of the last
+    caches are kept if the capacity is exceeded.
+    """
+    combined = HashCache(
+        caches[0].n_components,
+        capacity=capacity,
+        dtype=caches[0].dtype,
+        metadata=caches[0].metadata,
+    )
+    for cache in caches:
+        order = cache._lru_order()
+        combined.put_many([cache._keys[row] for row in order], cache._values[order])
+    return combined
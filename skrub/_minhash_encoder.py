@@ -4,23 +4,93 @@ applying the MinHash method to n-gram decompositions of strings.
 """
 from __future__ import annotations
 
-from collections.abc import Callable, Collection
+from collections.abc import Callable, Collection, Iterable, Iterator
+from functools import partial
 from typing import Literal
 
 import numpy as np
 from joblib import Parallel, delayed, effective_n_jobs
 from numpy.typing import ArrayLike, NDArray
 from sklearn.base import BaseEstimator, TransformerMixin, clone
-from sklearn.utils import gen_even_slices, murmurhash3_32
+from sklearn.utils import gen_even_slices
 from sklearn.utils.validation import _check_feature_names_in, check_is_fitted
 
-from ._fast_hash import ngram_min_hash
-from ._string_distances import get_unique_ngrams
-from ._utils import LRUDict, check_input, combine_lru_dicts
+from ._bbit_minhash import pack_bbit_signatures
+from ._fast_hash import ngram_min_hash_batch
+from ._hash_cache import HashCache, combine_hash_caches, parse_cache_size
+from ._murmur_hash import ngram_murmur_min_hash_batch
+from ._utils import check_input
 
 NoneType = type(None)
 
 
+def _murmur_min_hash(
+    strings: Collection[str], ngram_range: tuple[int, int], n_components: int
+) -> NDArray:
+    """
+    Encode strings using murmur hashing function.
+
+    The n-grams of all the strings are hashed at once by
+    ``ngram_murmur_min_hash_batch``.
+
+    Parameters
+    ----------
+    strings : collection of str
+        The strings to encode.
+    ngram_range : 2-tuple of int
+        The range of n-values of the n-grams.
+    n_components : int
+        The number of hashing functions.
+
+    Returns
+    -------
+    ndarray of shape (n_strings, n_components)
+        The encoded strings.
+    """
+    min_hashes = ngram_murmur_min_hash_batch(strings, ngram_range, range(n_components))
+    return min_hashes / (2**32 - 1)
+
+
+def _fast_min_hash(
+    strings: Collection[str],
+    ngram_range: tuple[int, int],
+    n_components: int,
+    minmax_hash: bool,
+) -> NDArray:
+    """Encode strings with fast hashing function.
+
+    Fast hashing supports both min_hash and minmax_hash encoding.
+    All the strings and all the seeds are hashed at once by
+    ``ngram_min_hash_batch``.
+
+    Parameters
+    ----------
+    strings : collection of str
+        The strings to encode.
+    ngram_range : 2-tuple of int
+        The range of n-values of the n-grams.
+    n_components : int
+        The number of hashing functions, or twice that number if
+        `minmax_hash` is True.
+    minmax_hash : bool
+        Whether to return the min and max hashes, interleaved.
+
+    Returns
+    -------
+    ndarray of shape (n_strings, n_components)
+        The encoded strings, using specified encoding scheme.
+    """
+    if minmax_hash:
+        min_hashes, max_hashes = ngram_min_hash_batch(
+            strings, ngram_range, range(n_components // 2), return_minmax=True
+        )
+        # Interleave the min and max hashes of each seed
+        return np.stack([min_hashes, max_hashes], axis=2).reshape(
+            len(strings), n_components
+        )
+    return ngram_min_hash_batch(strings, ngram_range, range(n_components))
+
+
 class MinHashEncoder(TransformerMixin, BaseEstimator):
     """Encode string categorical features by applying the MinHash method to n-gram \
     decompositions of strings.
@@ -61,14 +131,32 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
         vectors filled with zeros.
     n_jobs : int, optional
         The number of jobs to run in parallel.
-        The hash computations for all unique elements are parallelized.
+        The hash computations for all unique elements are parallelized,
+        in threads unless another backend is selected with
+        joblib.parallel_backend.
         `None` means 1 unless in a joblib.parallel_backend.
         -1 means using all processors.
         See :term:`n_jobs` for more details.
+    cache_size : int or str, default=1024
+        The capacity of the cache of computed hashes, either as a number of
+        strings or as a memory budget for the hashes such as ``"500MB"``.
+        When the cache is full, the least recently used hashes are discarded.
+    cache_path : str or path-like, optional
+        Directory where the cache of computed hashes is persisted.
+        If not None, the hashes stored there by previous runs with the same
+        hashing parameters are loaded during :term:`fit`, memory-mapped
+        read-only so that they are shared with the parallel workers, and the
+        hashes computed by :term:`transform` are saved back there.
+    dtype : {np.float64, np.float32, np.int32}, default=np.float64
+        Desired dtype of output, also used to store the cached hashes.
+        The `fast` hashes are 32-bit integers, so they are exactly
+        represented with np.int32 or np.float64, and rounded with np.float32.
+        np.int32 is not supported with the `murmur` hashing function, whose
+        hashes are normalized to [0, 1].
 
     Attributes
     ----------
-    hash_dict_ : LRUDict
+    hash_dict_ : HashCache
         Computed hashes.
     n_features_in_ : int
         Number of features seen during :term:`fit`.
@@ -115,9 +203,7 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
             -1.45918266e+09, -1.58098831e+09]])
     """
 
-    hash_dict_: LRUDict
-
-    _capacity: int = 2**10
+    hash_dict_: HashCache
 
     @classmethod
     def _merge(cls, transformers_list: list[MinHashEncoder]):
@@ -127,8 +213,8 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
         over columns in the TableVectorizer.
         """
         full_transformer = clone(transformers_list[0])
-        capacity = transformers_list[0]._capacity
-        full_transformer.hash_dict_ = combine_lru_dicts(
+        capacity = transformers_list[0].hash_dict_.capacity
+        full_transformer.hash_dict_ = combine_hash_caches(
             capacity, *[transformer.hash_dict_ for transformer in transformers_list]
         )
         full_transformer.n_features_in_ = sum(
@@ -150,7 +236,7 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
         transformer_list = []
         for i in range(self.n_features_in_):
             trans = clone(self)
-            attributes = ["hash_dict_", "_capacity"]
+            attributes = ["hash_dict_"]
             for a in attributes:
                 if hasattr(self, a):
                     setattr(trans, a, getattr(self, a))
@@ -169,6 +255,9 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
         minmax_hash: bool = False,
         handle_missing: Literal["error", "zero_impute"] = "zero_impute",
         n_jobs: int = None,
+        cache_size: int | str = 1024,
+        cache_path: str | None = None,
+        dtype: type = np.float64,
     ):
         self.ngram_range = ngram_range
         self.n_components = n_components
@@ -176,99 +265,90 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
         self.minmax_hash = minmax_hash
         self.handle_missing = handle_missing
         self.n_jobs = n_jobs
-
-    def _get_murmur_hash(self, string: str) -> NDArray:
-        """
-        Encode a string using murmur hashing function.
-
-        Parameters
-        ----------
-        string : str
-            The string to encode.
-
-        Returns
-        -------
-        ndarray of shape (n_components, )
-            The encoded string.
-        """
-        min_hashes = np.ones(self.n_components) * np.infty
-        grams = get_unique_ngrams(string, self.ngram_range)
-        if len(grams) == 0:
-            grams = get_unique_ngrams(" Na ", self.ngram_range)
-        for gram in grams:
-            hash_array = np.array(
-                [
-                    murmurhash3_32("".join(gram), seed=d, positive=True)
-                    for d in range(self.n_components)
-                ]
-            )
-            min_hashes = np.minimum(min_hashes, hash_array)
-        return min_hashes / (2**32 - 1)
-
-    def _get_fast_hash(self, string: str) -> NDArray:
-        """Encode a string with fast hashing function.
-
-        Fast hashing supports both min_hash and minmax_hash encoding.
-
-        Parameters
-        ----------
-        string : str
-            The string to encode.
-
-        Returns
-        -------
-        ndarray of shape (n_components, )
-            The encoded string, using specified encoding scheme.
-        """
-        if self.minmax_hash:
-            return np.concatenate(
-                [
-                    ngram_min_hash(string, self.ngram_range, seed, return_minmax=True)
-                    for seed in range(self.n_components // 2)
-                ]
-            )
-        else:
-            return np.array(
-                [
-                    ngram_min_hash(string, self.ngram_range, seed)
-                    for seed in range(self.n_components)
-                ]
-            )
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+        self.dtype = dtype
 
     def _compute_hash_batched(
-        self, batch: Collection[str], hash_func: Callable[[str], NDArray]
+        self,
+        batch: Collection[str],
+        hash_func: Callable[[Collection[str]], NDArray],
     ) -> NDArray:
         """Function called to compute the hashes of a batch of strings.
 
-        Check if the string is in the hash dictionary, if not, compute the hash
-        using the specified hashing function and add it to the dictionary.
+        Look up the strings in the hash cache. The strings that are not
+        cached are hashed in parallel on `n_jobs` batches using the specified
+        hashing function, and added to the cache.
+
+        The batches are hashed in threads by default: the hashing functions
+        work on whole arrays and release the GIL for most of their run time,
+        and the results are written in the cache by the calling thread, so
+        that nothing is serialized.
 
         Parameters
         ----------
         batch : collection of str
             The batch of strings to encode.
         hash_func : callable
-            Hashing function to use on the string.
+            Hashing function to use on the strings missing from the
+            cache, all at once.
 
         Returns
         -------
         ndarray of shape (n_samples, n_components)
             The encoded strings, using specified encoding scheme.
         """
-        res = np.zeros((len(batch), self.n_components))
-        for i, string in enumerate(batch):
-            if string not in self.hash_dict_:
-                if string == "NAN":  # true if x is a missing value
-                    self.hash_dict_[string] = np.zeros(self.n_components)
-                else:
-                    self.hash_dict_[string] = hash_func(string)
-            res[i] = self.hash_dict_[string]
+        batch = np.asarray(batch)
+        res = np.zeros((len(batch), self.n_components), dtype=self.dtype)
+        cached, found = self.hash_dict_.get_many(batch)
+        res[found] = cached
+        # Missing values are encoded with zeros
+        unseen_indices = np.flatnonzero(~found & (batch != "NAN"))
+        if not len(unseen_indices):
+            return res
+
+        unseen = batch[unseen_indices]
+        n_jobs = effective_n_jobs(self.n_jobs)
+        hashes = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(hash_func)(unseen[idx_slice])
+            for idx_slice in gen_even_slices(len(unseen), n_jobs)
+        )
+        hashes = np.concatenate(hashes)
+        res[unseen_indices] = hashes
+        self.hash_dict_.put_many(unseen, hashes)
         return res
 
+    def _save_hash_cache(self):
+        """Save the hash cache in `cache_path` if new hashes were computed."""
+        if self.cache_path is not None and self.hash_dict_.modified:
+            self.hash_dict_.save(self.cache_path)
+
+    def _init_hash_cache(self) -> HashCache:
+        """Create the hash cache, loading it from `cache_path` if possible."""
+        capacity = parse_cache_size(self.cache_size, self.n_components, self.dtype)
+        metadata = {
+            "n_components": self.n_components,
+            "ngram_range": list(self.ngram_range),
+            "hashing": self.hashing,
+            "minmax_hash": self.minmax_hash,
+            "dtype": np.dtype(self.dtype).str,
+        }
+        if self.cache_path is not None:
+            try:
+                cache = HashCache.load(self.cache_path, capacity=capacity)
+            except FileNotFoundError:
+                pass
+            else:
+                if cache.metadata == metadata:
+                    return cache
+        return HashCache(
+            self.n_components, capacity=capacity, dtype=self.dtype, metadata=metadata
+        )
+
     def fit(self, X: ArrayLike, y=None) -> "MinHashEncoder":
         """Fit the MinHashEncoder to `X`.
 
-        In practice, just initializes a dictionary
+        In practice, just initializes a cache
         to store encodings to speed up computation.
 
         Parameters
@@ -297,7 +377,22 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
                 f"Got handle_missing={self.handle_missing!r}, but expected "
                 "any of {'error', 'zero_impute'}. "
             )
-        self.hash_dict_ = LRUDict(capacity=self._capacity)
+        try:
+            # np.dtype(None) is float64, which must not be accepted silently
+            dtype = None if self.dtype is None else np.dtype(self.dtype)
+        except TypeError:
+            dtype = None
+        if dtype not in [np.float64, np.float32, np.int32]:
+            raise ValueError(
+                f"Got dtype={self.dtype!r}, but expected "
+                "any of {np.float64, np.float32, np.int32}. "
+            )
+        if self.hashing == "murmur" and dtype == np.int32:
+            raise ValueError(
+                "dtype=np.int32 is not supported with the murmur hashing "
+                "function, use a floating dtype instead. "
+            )
+        self.hash_dict_ = self._init_hash_cache()
         return self
 
     def transform(self, X: ArrayLike) -> NDArray:
@@ -314,6 +409,110 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
         ndarray of shape (n_samples, n_columns * n_components)
             Transformed input.
         """
+        X_out = self._transform(X)
+        self._save_hash_cache()
+        return X_out
+
+    def transform_iter(
+        self, X_chunks: Iterable, out: NDArray | None = None
+    ) -> Iterator[NDArray]:
+        """
+        Transform an iterable of chunks of rows, one chunk at a time.
+
+        This allows encoding datasets that do not fit in memory, e.g. read
+        chunk by chunk from parquet or CSV files. The hash cache is shared by
+        all the chunks, so that strings seen in previous chunks are not
+        hashed again. When `cache_path` is set, the cache is saved once,
+        after the last chunk.
+
+        Parameters
+        ----------
+        X_chunks : iterable of array-like
+            The chunks of rows to encode, with the columns seen during
+            :term:`fit`. The chunks can be arrays, pandas dataframes, or any
+            object with a ``to_pandas`` method such as Arrow record batches
+            or tables.
+        out : ndarray of shape (n_samples, n_columns * n_components), optional
+            If not None, the encoded chunks are written in the consecutive
+            rows of `out`, which can be a ``numpy.memmap``.
+
+        Yields
+        ------
+        ndarray of shape (n_chunk_samples, n_columns * n_components)
+            The encoded chunks. When `out` is given, these are views of `out`.
+        """
+        check_is_fitted(self, "hash_dict_")
+        start = 0
+        try:
+            for X in X_chunks:
+                if hasattr(X, "to_pandas"):
+                    X = X.to_pandas()
+                X_out = self._transform(X)
+                if out is not None:
+                    stop = start + len(X_out)
+                    if stop > len(out):
+                        raise ValueError(
+                            f"The chunks have more than len(out)={len(out)} rows."
+                        )
+                    out[start:stop] = X_out
+                    X_out = out[start:stop]
+                    start = stop
+                yield X_out
+        finally:
+            self._save_hash_cache()
+
+    def transform_signatures(
+        self, X: ArrayLike, n_bits: int = 1, dtype: type = np.uint64
+    ) -> NDArray:
+        """
+        Encode `X` as packed b-bit min-hash signatures.
+
+        Only the lowest `n_bits` bits of each min-hash are kept, and packed
+        in unsigned integers. These compact signatures can be used as index
+        keys for deduplication or candidate generation, and the Jaccard
+        similarity of the n-grams of two strings can be estimated from their
+        signatures with :func:`bbit_jaccard_similarity`.
+
+        Parameters
+        ----------
+        X : array-like, shape (n_samples, ) or (n_samples, n_columns)
+            The string data to encode.
+        n_bits : {1, 2, 4, 8}, default=1
+            The number of bits kept per min-hash.
+        dtype : {np.uint8, np.uint64}, default=np.uint64
+            The dtype of the packed signatures.
+
+        Returns
+        -------
+        ndarray of shape (n_samples, n_columns * n_words)
+            The signatures of each column, one after the other. ``n_words``
+            is the number of words of `dtype` needed to store
+            ``n_components * n_bits`` bits.
+        """
+        check_is_fitted(self, "hash_dict_")
+        if np.dtype(self.dtype) == np.float32:
+            raise ValueError(
+                "transform_signatures requires the min-hashes to be exact, "
+                "use dtype=np.float64 or dtype=np.int32 rather than np.float32."
+            )
+        X_out = self._transform(X)
+        self._save_hash_cache()
+        if self.hashing == "murmur":
+            # Undo the normalization of the murmur hashes to [0, 1]
+            hashes = np.rint(X_out * (2**32 - 1)).astype(np.int64)
+        else:
+            hashes = X_out.astype(np.int64)
+        hashes = hashes.reshape(len(hashes), -1, self.n_components)
+        return np.concatenate(
+            [
+                pack_bbit_signatures(hashes[:, i], n_bits=n_bits, dtype=dtype)
+                for i in range(hashes.shape[1])
+            ],
+            axis=1,
+        )
+
+    def _transform(self, X: ArrayLike) -> NDArray:
+        """Transform `X`, without saving the hash cache."""
         check_is_fitted(self, "hash_dict_")
         self._check_feature_names(X, reset=False)
         X = check_input(X)
@@ -353,10 +552,21 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
                 # NANs will be replaced by zeroes in _compute_hash
                 X[missing_mask] = "NAN"
 
+        # The hashing functions only get the parameters they need, so that
+        # the estimator and its cache are never copied to the workers
         if self.hashing == "fast":
-            hash_func = self._get_fast_hash
+            hash_func = partial(
+                _fast_min_hash,
+                ngram_range=self.ngram_range,
+                n_components=self.n_components,
+                minmax_hash=self.minmax_hash,
+            )
         elif self.hashing == "murmur":
-            hash_func = self._get_murmur_hash
+            hash_func = partial(
+                _murmur_min_hash,
+                ngram_range=self.ngram_range,
+                n_components=self.n_components,
+            )
         else:
             raise ValueError(
                 "Hashing function should be either 'fast' or 'murmur', "
@@ -365,23 +575,14 @@ class MinHashEncoder(TransformerMixin, BaseEstimator):
 
         # Compute the hashes for unique values
         unique_x, indices_x = np.unique(X, return_inverse=True)
-        n_jobs = effective_n_jobs(self.n_jobs)
-
-        # Compute the hashes in parallel on n_jobs batches
-        unique_x_trans = Parallel(n_jobs=n_jobs)(
-            delayed(self._compute_hash_batched)(
-                unique_x[idx_slice],
-                hash_func,
-            )
-            for idx_slice in gen_even_slices(len(unique_x), n_jobs)
-        )
+        unique_x_trans = self._compute_hash_batched(unique_x, hash_func)
 
         # Match the hashes of the unique value to the original values
-        X_out = np.concatenate(unique_x_trans)[indices_x].reshape(
+        X_out = unique_x_trans[indices_x].reshape(
             len(X), X.shape[1] * self.n_components
         )
 
-        return X_out.astype(np.float64)  # The output is an int32 before conversion
+        return X_out
 
     def get_feature_names_out(
         self, input_features: ArrayLike | str | None = None
@@ -0,0 +1,301 @@
+"""
+Locality-sensitive hashing index on min-hash signatures.
+
+The min-hashes of each string are split in bands of consecutive
+components, and each band is hashed to a bucket of a hash table. Strings
+with a high Jaccard similarity are likely to agree on all the components of
+at least one band, and thus to share a bucket: the strings of the buckets of
+a query are the candidates, which are then ranked by the fraction of
+min-hashes they share with the query.
+
+For a detailed description of the method, see chapter 3 of
+`Mining of Massive Datasets <http://www.mmds.org/>`_ by Leskovec, Rajaraman
+and Ullman.
+"""
+
+from collections.abc import Collection, Hashable
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+# Multipliers used to combine the 64-bit words of a band into a single hash
+_MIX_1 = np.uint64(0x9E3779B97F4A7C15)
+_MIX_2 = np.uint64(0xBF58476D1CE4E5B9)
+
+
+def _hash_bands(signatures: NDArray, n_bands: int, band_size: int) -> NDArray:
+    """Hash each band of the signatures to a 64-bit integer.
+
+    Returns an array of shape (n_samples, n_bands), of dtype uint64.
+    """
+    n_samples = len(signatures)
+    bands = signatures[:, : n_bands * band_size].reshape(n_samples, n_bands, -1)
+    # Read the bytes of each band as 64-bit words, zero-padded
+    band_bytes = np.ascontiguousarray(bands).view(np.uint8)
+    n_words = -(-band_bytes.shape[2] // 8)
+    padded = np.zeros((n_samples, n_bands, 8 * n_words), dtype=np.uint8)
+    padded[:, :, : band_bytes.shape[2]] = band_bytes
+    words = padded.view(np.uint64)
+
+    hashes = np.zeros((n_samples, n_bands), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for i in range(n_words):
+            hashes = (hashes ^ words[:, :, i]) * _MIX_1
+            hashes ^= hashes >> np.uint64(31)
+            hashes *= _MIX_2
+    return hashes
+
+
+class MinHashLSHIndex:
+    """Index of min-hash signatures for approximate nearest neighbor queries.
+
+    The signatures, such as the output of :class:`MinHashEncoder` for a
+    single column, are split in `n_bands` bands of consecutive components,
+    and each band is stored in a hash table. The candidate neighbors of a
+    query are the indexed signatures that are identical to it on at least
+    one band, so that only a small fraction of the index is compared with
+    the query. The candidates are ranked by their estimated Jaccard
+    similarity with the query, the fraction of identical components.
+
+    With bands of ``r`` components, two strings with Jaccard similarity
+    ``s`` are candidates of each other with probability
+    ``1 - (1 - s ** r) ** n_bands``: more bands find more distant neighbors,
+    larger bands reduce the number of false candidates.
+
+    Parameters
+    ----------
+    n_bands : int, default=10
+        The number of bands, at most the number of components of the
+        signatures. Each band is made of ``n_components // n_bands``
+        components. The remaining components are only used to rank the
+        candidates.
+
+    Attributes
+    ----------
+    n_components_ : int
+        The number of components of the indexed signatures. Set by the first
+        call to ``add``.
+    band_size_ : int
+        The number of components of each band.
+
+    See Also
+    --------
+    MinHashEncoder
+        Encode string categorical features by applying the MinHash method.
+    bbit_jaccard_similarity
+        Estimate Jaccard similarities from packed b-bit min-hash signatures.
+
+    Examples
+    --------
+    >>> from skrub import MinHashEncoder, MinHashLSHIndex
+    >>> enc = MinHashEncoder(n_components=100)
+    >>> X = [["Paris, FR"], ["Paris"], ["London, UK"], ["London"]]
+    >>> index = MinHashLSHIndex(n_bands=50)
+    >>> ids = ["paris fr", "paris", "london uk", "london"]
+    >>> index.add(enc.fit_transform(X), ids=ids)
+    >>> similarities, ids = index.query(enc.transform([["London, U.K."]]), k=1)
+    >>> ids[0]
+    array(['london uk'], dtype=object)
+    """
+
+    def __init__(self, n_bands: int = 10):
+        self.n_bands = n_bands
+        self._ids: list[Hashable] = []
+        self._id_to_row: dict[Hashable, int] = {}
+        self._free_rows: list[int] = []
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    def __contains__(self, id_: Hashable) -> bool:
+        return id_ in self._id_to_row
+
+    def _init_tables(self, n_components: int):
+        if not isinstance(self.n_bands, (int, np.integer)) or not (
+            1 <= self.n_bands <= n_components
+        ):
+            raise ValueError(
+                f"Got n_bands={self.n_bands!r}, but expected an int between 1 "
+                f"and the number of components of the signatures, {n_components}. "
+            )
+        self.n_components_ = n_components
+        self.band_size_ = n_components // self.n_bands
+        self._signatures = None
+        self._band_hashes = np.empty((0, self.n_bands), dtype=np.uint64)
+        self._tables: list[dict[int, set[int]]] = [{} for _ in range(self.n_bands)]
+
+    def _check_signatures(self, signatures: ArrayLike) -> NDArray:
+        signatures = np.asarray(signatures)
+        if signatures.ndim != 2:
+            raise ValueError(
+                "Expected a 2-dimensional array of signatures, got an array of "
+                f"shape {signatures.shape}. "
+            )
+        if not hasattr(self, "n_components_"):
+            self._init_tables(signatures.shape[1])
+        elif signatures.shape[1] != self.n_components_:
+            raise ValueError(
+                f"The signatures have {signatures.shape[1]} components, but the "
+                f"index contains signatures with {self.n_components_} components. "
+            )
+        if self._signatures is not None:
+            signatures = signatures.astype(self._signatures.dtype, copy=False)
+        return signatures
+
+    def _reserve(self, n_rows: int):
+        """Make room for `n_rows` rows, growing the arrays geometrically."""
+        if n_rows <= len(self._band_hashes):
+            return
+        new_len = max(n_rows, 2 * len(self._band_hashes), 16)
+        signatures = np.empty((new_len, self.n_components_), self._signatures.dtype)
+        signatures[: len(self._ids)] = self._signatures[: len(self._ids)]
+        self._signatures = signatures
+        band_hashes = np.zeros((new_len, self.n_bands), dtype=np.uint64)
+        band_hashes[: len(self._ids)] = self._band_hashes[: len(self._ids)]
+        self._band_hashes = band_hashes
+
+    def add(self, signatures: ArrayLike, ids: Collection[Hashable] | None = None):
+        """
+        Add signatures to the index.
+
+        Parameters
+        ----------
+        signatures : array-like of shape (n_samples, n_components)
+            The signatures to add, e.g. the output of
+            :meth:`MinHashEncoder.transform` for a single column.
+        ids : collection of hashable, optional
+            The identifiers of the signatures, returned by ``query``.
+            They must be distinct, and distinct from the identifiers already
+            in the index. Defaults to consecutive integers, following the
+            last default identifier used.
+        """
+        signatures = self._check_signatures(signatures)
+        if self._signatures is None:
+            self._signatures = np.empty((0, self.n_components_), signatures.dtype)
+        n_samples = len(signatures)
+        if ids is None:
+            ids = range(self._next_id, self._next_id + n_samples)
+            self._next_id += n_samples
+        ids = list(ids)
+        if len(ids) != n_samples:
+            raise ValueError(
+                f"Got {len(ids)} ids for {n_samples} signatures, expected as "
+                "many ids as signatures. "
+            )
+        duplicates = {id_ for id_ in ids if id_ in self._id_to_row}
+        if duplicates or len(set(ids)) != n_samples:
+            raise ValueError(
+                "The ids must be distinct and not already in the index, got "
+                f"duplicated ids {sorted(duplicates, key=repr)[:5]}. "
+            )
+
+        # Reuse the rows of the removed signatures first
+        n_reused = min(len(self._free_rows), n_samples)
+        rows = [self._free_rows.pop() for _ in range(n_reused)]
+        rows.extend(range(len(self._ids), len(self._ids) + n_samples - n_reused))
+        self._reserve(len(self._ids) + n_samples - n_reused)
+        self._ids.extend([None] * (n_samples - n_reused))
+        rows = np.asarray(rows, dtype=np.int64)
+
+        band_hashes = _hash_bands(signatures, self.n_bands, self.band_size_)
+        self._signatures[rows] = signatures
+        self._band_hashes[rows] = band_hashes
+        for row, id_ in zip(rows.tolist(), ids):
+            self._ids[row] = id_
+            self._id_to_row[id_] = row
+        for table, keys in zip(self._tables, band_hashes.T.tolist()):
+            for row, key in zip(rows.tolist(), keys):
+                table.setdefault(key, set()).add(row)
+
+    def remove(self, ids: Collection[Hashable]):
+        """
+        Remove signatures from the index.
+
+        Parameters
+        ----------
+        ids : collection of hashable
+            The identifiers of the signatures to remove. They must be distinct
+            and in the index, otherwise an error is raised and the index is
+            left unchanged.
+        """
+        ids = list(ids)
+        missing = [id_ for id_ in ids if id_ not in self._id_to_row]
+        if missing:
+            raise KeyError(f"The ids {missing[:5]} are not in the index.")
+        if len(set(ids)) != len(ids):
+            seen = set()
+            duplicates = {id_ for id_ in ids if id_ in seen or seen.add(id_)}
+            raise ValueError(
+                "The ids must be distinct, got duplicated ids "
+                f"{sorted(duplicates, key=repr)[:5]}. "
+            )
+        rows = [self._id_to_row.pop(id_) for id_ in ids]
+        for table, keys in zip(self._tables, self._band_hashes[rows].T.tolist()):
+            for row, key in zip(rows, keys):
+                bucket = table[key]
+                bucket.discard(row)
+                if not bucket:
+                    del table[key]
+        for row in rows:
+            self._ids[row] = None
+        self._free_rows.extend(rows)
+
+    def query(
+        self,
+        signatures: ArrayLike,
+        k: int | None = 10,
+        threshold: float | None = None,
+    ) -> tuple[list[NDArray], list[NDArray]]:
+        """
+        Find the indexed signatures most similar to each query.
+
+        Only the signatures that share a band with the query are considered,
+        so that neighbors with a low similarity may be missed.
+
+        Parameters
+        ----------
+        signatures : array-like of shape (n_queries, n_components)
+            The signatures of the queries.
+        k : int, optional, default=10
+            The maximum number of neighbors returned per query. If None, all
+            the candidates are returned.
+        threshold : float, optional
+            If not None, only the neighbors with an estimated similarity
+            greater than or equal to `threshold` are returned.
+
+        Returns
+        -------
+        similarities : list of ndarray
+            For each query, the estimated Jaccard similarities of its
+            neighbors, in decreasing order.
+        ids : list of ndarray
+            For each query, the identifiers of its neighbors.
+        """
+        if not hasattr(self, "n_components_"):
+            raise ValueError("The index is empty, call 'add' before 'query'.")
+        if k is not None and (not isinstance(k, (int, np.integer)) or k < 1):
+            raise ValueError(f"Got k={k!r}, but expected a positive int or None. ")
+        signatures = self._check_signatures(signatures)
+        band_hashes = _hash_bands(signatures, self.n_bands, self.band_size_)
+
+        all_similarities, all_ids = [], []
+        empty = set()
+        for signature, keys in zip(signatures, band_hashes.tolist()):
+            candidates = set().union(
+                *(table.get(key, empty) for table, key in zip(self._tables, keys))
+            )
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarities = (self._signatures[rows] == signature).mean(axis=1)
+            if threshold is not None:
+                keep = similarities >= threshold
+                rows, similarities = rows[keep], similarities[keep]
+            if k is not None and len(rows) > k:
+                top = np.argpartition(-similarities, k - 1)[:k]
+                rows, similarities = rows[top], similarities[top]
+            order = np.argsort(-similarities, kind="stable")
+            all_similarities.append(similarities[order])
+            ids = np.empty(len(rows), dtype=object)
+            ids[:] = [self._ids[row] for row in rows[order]]
+            all_ids.append(ids)
+        return all_similarities, all_ids
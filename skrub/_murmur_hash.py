@@ -0,0 +1,157 @@
+"""
+Vectorized murmur hashing of n-grams.
+
+``murmurhash3_32_batch`` is a NumPy implementation of the 32-bit
+MurmurHash3 (x86 variant) computing the hashes of many strings for many
+seeds at once. It gives the same values as
+``sklearn.utils.murmurhash3_32(string, seed=seed, positive=True)``.
+
+``ngram_murmur_min_hash_batch`` uses it for the min-hash encoding of a
+batch of strings: the n-grams of all the strings are extracted once, each
+distinct n-gram is hashed with all the seeds, and the min of the hashes of
+the n-grams of each string is taken segment-wise.
+"""
+
+from collections.abc import Collection
+
+import numpy as np
+from numpy.typing import NDArray
+
+from ._fast_hash import _BATCH_MAX_HASHES, pack_strings
+from ._string_distances import ngram_count_matrix
+
+_C1 = np.uint32(0xCC9E2D51)
+_C2 = np.uint32(0x1B873593)
+
+
+def _rotl(x: NDArray, r: int) -> NDArray:
+    return (x << np.uint32(r)) | (x >> np.uint32(32 - r))
+
+
+def _mix_key(k: NDArray) -> NDArray:
+    k = k * _C1
+    k = _rotl(k, 15)
+    return k * _C2
+
+
+def murmurhash3_32_batch(strings, seeds: Collection[int]) -> NDArray:
+    """
+    Compute the positive 32-bit murmur hashes of strings for several seeds.
+
+    Parameters
+    ----------
+    strings : collection of str
+        The strings to hash, in any format accepted by ``pack_strings``.
+        Their UTF-8 bytes are hashed.
+    seeds : collection of int
+        The seeds of the hash functions.
+
+    Returns
+    -------
+    ndarray of shape (n_strings, n_seeds)
+        The hashes, with dtype uint32.
+    """
+    buffer, offsets = pack_strings(strings)
+    data = buffer.view(np.uint8)
+    lengths = np.diff(offsets)
+    n_strings = len(lengths)
+
+    # Pad the strings with zeros to a multiple of 4 bytes, and read them as
+    # little-endian 32-bit blocks.
+    n_blocks = (lengths + 3) // 4
+    width = 4 * int(n_blocks.max(initial=0))
+    padded = np.zeros((n_strings, width), dtype=np.uint32)
+    rows = np.repeat(np.arange(n_strings), lengths)
+    cols = np.arange(len(rows)) - np.repeat(offsets[:-1] - offsets[0], lengths)
+    padded[rows, cols] = data[offsets[0] : offsets[-1]]
+    padded = padded.reshape(n_strings, -1, 4)
+    blocks = (
+        padded[:, :, 0]
+        | (padded[:, :, 1] << np.uint32(8))
+        | (padded[:, :, 2] << np.uint32(16))
+        | (padded[:, :, 3] << np.uint32(24))
+    )
+
+    h = np.empty((n_strings, len(seeds)), dtype=np.uint32)
+    h[:] = np.asarray(seeds, dtype=np.int64).astype(np.uint32)
+    n_full_blocks = lengths // 4
+    for i in range(blocks.shape[1]):
+        k = _mix_key(blocks[:, i])[:, None]
+        is_full = (n_full_blocks > i)[:, None]
+        is_tail = ((n_full_blocks == i) & (lengths % 4 > 0))[:, None]
+        # Full blocks
+        mixed = _rotl(h ^ k, 13) * np.uint32(5) + np.uint32(0xE6546B64)
+        # The remaining 1 to 3 bytes (zero-padded) form the tail
+        h = np.where(is_full, mixed, np.where(is_tail, h ^ k, h))
+
+    h ^= lengths.astype(np.uint32)[:, None]
+    h ^= h >> np.uint32(16)
+    h *= np.uint32(0x85EBCA6B)
+    h ^= h >> np.uint32(13)
+    h *= np.uint32(0xC2B2AE35)
+    h ^= h >> np.uint32(16)
+    return h
+
+
+def ngram_murmur_min_hash_batch(
+    strings: Collection[str],
+    ngram_range: tuple[int, int] = (2, 4),
+    seeds: Collection[int] = (0,),
+) -> NDArray:
+    """
+    Compute the min of the murmur hashes of the n-grams of many strings.
+
+    The n-grams are those of ``get_unique_ngrams``, extracted for all the
+    strings at once by ``ngram_count_matrix``. Strings without any
+    n-gram are encoded as the string ``" Na "``, and if it has no n-gram
+    either, their hashes are the maximum uint32 value.
+
+    Parameters
+    ----------
+    strings : collection of str
+        Strings to encode.
+    ngram_range : 2-tuple of int, default=(2, 4)
+        The lower and upper boundaries of the range of n-values for different
+        n-grams used in the string similarity. All values of `n` such
+        that ``min_n <= n <= max_n`` will be used.
+    seeds : collection of int, default=(0,)
+        Integers used to seed the hashing functions, one per output column.
+
+    Returns
+    -------
+    ndarray of shape (n_strings, n_seeds)
+        The min-hashes, with dtype uint32.
+    """
+    # Give an integer ID to each distinct n-gram of the batch
+    grams, vocabulary = ngram_count_matrix(strings, ngram_range)
+    n_grams = np.diff(grams.indptr)
+    if not n_grams.all():
+        strings = [
+            string if n else " Na " for string, n in zip(strings, n_grams.tolist())
+        ]
+        grams, vocabulary = ngram_count_matrix(strings, ngram_range)
+        n_grams = np.diff(grams.indptr)
+
+    min_hashes = np.full(
+        (len(strings), len(seeds)), np.iinfo(np.uint32).max, dtype=np.uint32
+    )
+    has_grams = n_grams > 0
+    if not has_grams.any():
+        return min_hashes
+    hashes = murmurhash3_32_batch(vocabulary, seeds)
+    gram_ids = grams.indices
+    segment_starts = grams.indptr.astype(np.int64)
+
+    # Reduce the strings in chunks holding a bounded number of hashes
+    chunk_ids = segment_starts[1:] * max(len(seeds), 1) // _BATCH_MAX_HASHES
+    bounds = np.flatnonzero(np.diff(chunk_ids)) + 1
+    bounds = np.concatenate([[0], bounds, [len(strings)]])
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        rows = np.flatnonzero(has_grams[start:stop]) + start
+        if not len(rows):
+            continue
+        first, last = segment_starts[start], segment_starts[stop]
+        min_hashes[rows] = np.minimum.reduceat(
+            hashes[gram_ids[first:last]], segment_starts[rows] - first, axis=0
+        )
+    return min_hashes
@@ -3,6 +3,7 @@ Implements the SimilarityEncoder, a generalization of the OneHotEncoder,
 which encodes similarity instead of equality of values.
 """
 
+import numbers
 from typing import Literal
 
 import numpy as np
@@ -12,64 +13,81 @@ from numpy.typing import ArrayLike, NDArray
 from scipy import sparse
 from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
 from sklearn.preprocessing import OneHotEncoder
-from sklearn.utils import parse_version
+from sklearn.utils import gen_batches, parse_version
 from sklearn.utils.fixes import _object_dtype_isnan
 from sklearn.utils.validation import check_is_fitted
 
+from ._gap_encoder import get_kmeans_prototypes
 from ._string_distances import get_ngram_count, preprocess
+from ._utils import factorize
 
 # Ignore lines too long, first docstring lines can't be cut
 # flake8: noqa: E501
 
 
-def _ngram_similarity_one_sample_inplace(
-    x_count_vector: NDArray,
-    vocabulary_count_matrix: NDArray,
-    str_x: str,
-    vocabulary_ngram_counts: NDArray,
-    se_dict: dict,
-    unq_X: NDArray,
-    i: int,
-    ngram_range: tuple[int, int],
-) -> None:
+# Strategies selecting the prototypes among the training values
+_PROTOTYPE_STRATEGIES = ["k-means", "minibatch-k-means", "most_frequent"]
+
+# Maximum number of similarities computed at once by _ngram_similarity_fast
+_BLOCK_MAX_SIMILARITIES = 2**22
+
+
+def _threshold_levels(
+    M: sparse.csr_matrix, n_levels: int, dtype: type = np.float64
+) -> sparse.csr_matrix:
     """
-    Update inplace a dict of similarities between a string and a vocabulary
+    Stack horizontally the binarized matrices ``M >= t`` of the count matrix
+    `M`, for the thresholds ``1 <= t <= n_levels``.
+    """
+    if n_levels == 0:
+        return sparse.csr_matrix((M.shape[0], 0), dtype=dtype)
+    return sparse.hstack(
+        [M >= threshold for threshold in range(1, n_levels + 1)], format="csr"
+    ).astype(dtype)
 
-    Parameters
-    ----------
-    x_count_vector : ndarray
-        Count vector of the sample based on the ngrams of the vocabulary
-    vocabulary_count_matrix : ndarray
-        Count vector of the vocabulary based on its ngrams
-    str_x: str
-        The actual sample string
-    vocabulary_ngram_counts : ndarray
-        Number of ngrams for each unique element of the vocabulary
-    se_dict : dict
-        Dictionary containing the similarities for each x in unq_X
-    unq_X : ndarray
-        The arrays of all unique samples
-    i : str
-        The index of x_count_vector in the csr count matrix
-    ngram_range : 2-tuple of int
-        The lower and upper boundaries of the range of n-values for different
-        n-grams used in the string similarity. All values of `n` such
-        that ``min_n <= n <= max_n`` will be used.
+
+def _sum_of_minimums(
+    X: sparse.csr_matrix,
+    Y: sparse.csr_matrix,
+    Y_levels_T: sparse.csr_matrix | None = None,
+) -> NDArray:
     """
-    nonzero_idx = x_count_vector.indices
-    nonzero_vals = x_count_vector.data
+    Compute the sums of the element-wise minimums of the rows of two count
+    matrices, ``out[i, j] = sum(minimum(X[i], Y[j]))``.
 
-    same_grams = np.asarray(
-        (vocabulary_count_matrix[:, nonzero_idx].minimum(nonzero_vals)).sum(axis=1)
-    )
+    The counts must be non-negative integers. The minimum of two counts is
+    the number of thresholds ``t >= 1`` that both reach, so that the sums of
+    minimums are the sums, over the thresholds, of the products of the
+    binarized matrices ``X >= t`` and ``Y >= t``.
 
-    all_grams = (
-        get_ngram_count(str_x, ngram_range) + vocabulary_ngram_counts - same_grams
-    )
-    similarity = np.divide(
-        same_grams, all_grams, out=np.zeros_like(same_grams), where=all_grams != 0
-    )
-    se_dict[unq_X[i]] = similarity.reshape(-1)
+    Parameters
+    ----------
+    X : sparse matrix of shape (n_samples_X, n_features)
+        The first count matrix.
+    Y : sparse matrix of shape (n_samples_Y, n_features)
+        The second count matrix.
+    Y_levels_T : sparse matrix, optional
+        The transposed levels of `Y`, ``_threshold_levels(Y, Y.max()).T`` in
+        CSR format. When `Y` is compared with many matrices `X`, they are
+        computed once and passed here.
+
+    Returns
+    -------
+    ndarray of shape (n_samples_X, n_samples_Y)
+        The sums of minimums.
+    """
+    X, Y = sparse.csr_matrix(X), sparse.csr_matrix(Y)
+    dtype = np.result_type(X, Y)
+    n_levels = int(min(X.max(), Y.max())) if X.nnz and Y.nnz else 0
+    if n_levels == 0:
+        return np.zeros((X.shape[0], Y.shape[0]), dtype=dtype)
+    if Y_levels_T is None:
+        Y_levels_T = _threshold_levels(Y, n_levels, dtype).T.tocsr()
+    # The products of the binarized matrices of all the thresholds are
+    # summed by a single sparse product, with the levels of Y up to n_levels
+    X_levels = _threshold_levels(X, n_levels, dtype)
+    Y_levels_T = Y_levels_T[: n_levels * Y.shape[1]].astype(dtype, copy=False)
+    return (X_levels @ Y_levels_T).toarray()
 
 
 def ngram_similarity_matrix(
@@ -171,10 +189,18 @@ class SimilarityEncoder(OneHotEncoder):
         word counts or character-level n-gram counts.
         Option ‘char_wb’ creates character n-grams only from text inside word
         boundaries; n-grams at the edges of words are padded with space.
-    categories : {'auto'} or list of list of str
+    categories : {'auto', 'k-means', 'minibatch-k-means', 'most_frequent'} \
+or list of list of str
         Categories (unique values) per feature:
 
         - 'auto' : Determine categories automatically from the training data.
+        - 'k-means' : Use the `n_prototypes` unique values nearest to the
+          centers of a k-means clustering of the training data, as in
+          :class:`GapEncoder` with `init='k-means'`.
+        - 'minibatch-k-means' : Same as 'k-means', with a MiniBatchKMeans
+          clustering, which is faster on many unique values.
+        - 'most_frequent' : Use the `n_prototypes` most frequent values of
+          the training data.
         - list : `categories[i]` holds the categories expected in the i-th
           column. The passed categories must be sorted and should not mix
           strings and numeric values.
@@ -200,6 +226,24 @@ class SimilarityEncoder(OneHotEncoder):
     hashing_dim : int, optional
         If `None`, the base vectorizer is a CountVectorizer, otherwise it is a
         HashingVectorizer with a number of features equal to `hashing_dim`.
+    n_prototypes : int, optional
+        The number of prototypes selected per feature with
+        `categories='k-means'`, `categories='minibatch-k-means'` or
+        `categories='most_frequent'`.
+    random_state : int or RandomState, optional
+        Random number generator seed for reproducible output across multiple
+        function calls. Only used with `categories='k-means'` or
+        `categories='minibatch-k-means'`.
+    top_k : int, optional
+        If not None, keep only the `top_k` highest similarities of each
+        sample to the categories of each feature, and set the others to 0.
+        The encoding is then returned as a sparse CSR matrix.
+    min_similarity : float, optional
+        If not None, set the similarities lower than `min_similarity` to 0.
+        The encoding is then returned as a sparse CSR matrix. Combined with
+        `top_k`, only the `top_k` highest similarities above `min_similarity`
+        are kept. Without dense intermediate results of the size of the
+        output, the sparse encoding fits in memory even with many categories.
     n_jobs : int, optional
         Maximum number of processes used to compute similarity matrices. Used
         only if `fast=True` in SimilarityEncoder.transform.
@@ -277,11 +321,16 @@ class SimilarityEncoder(OneHotEncoder):
         *,
         ngram_range: tuple[int, int] = (2, 4),
         analyzer: Literal["word", "char", "char_wb"] = "char",
-        categories: Literal["auto"] | list[list[str]] = "auto",
+        categories: Literal["auto", "k-means", "minibatch-k-means", "most_frequent"]
+        | list[list[str]] = "auto",
         dtype: type = np.float64,
         handle_unknown: Literal["error", "ignore"] = "ignore",
         handle_missing: Literal["error", ""] = "",
         hashing_dim: int | None = None,
+        n_prototypes: int | None = None,
+        random_state: int | np.random.RandomState | None = None,
+        top_k: int | None = None,
+        min_similarity: float | None = None,
         n_jobs: int | None = None,
     ):
         super().__init__()
@@ -292,13 +341,18 @@ class SimilarityEncoder(OneHotEncoder):
         self.ngram_range = ngram_range
         self.analyzer = analyzer
         self.hashing_dim = hashing_dim
+        self.n_prototypes = n_prototypes
+        self.random_state = random_state
+        self.top_k = top_k
+        self.min_similarity = min_similarity
         self.n_jobs = n_jobs
 
         if not isinstance(categories, list):
-            if categories not in ["auto"]:
+            if categories not in ["auto", *_PROTOTYPE_STRATEGIES]:
                 raise ValueError(
-                    f"Got categories={self.categories}, but expected "
-                    "'auto' or a list of prototypes. "
+                    f"Got categories={self.categories}, but expected any of "
+                    "{'auto', 'k-means', 'minibatch-k-means', 'most_frequent'} "
+                    "or a list of prototypes. "
                 )
 
     def fit(self, X: ArrayLike, y=None) -> "SimilarityEncoder":
@@ -359,7 +413,36 @@ class SimilarityEncoder(OneHotEncoder):
                 f"type ({type(self.hashing_dim)}), expected None or int. "
             )
 
-        if self.categories not in ["auto"]:
+        if self.top_k is not None and not (
+            isinstance(self.top_k, numbers.Integral) and self.top_k > 0
+        ):
+            raise ValueError(
+                f"Got top_k={self.top_k!r}, but expected a positive int or None. "
+            )
+        if self.min_similarity is not None and not isinstance(
+            self.min_similarity, numbers.Real
+        ):
+            raise ValueError(
+                f"Got min_similarity={self.min_similarity!r}, but expected a "
+                "float or None. "
+            )
+
+        if self.categories in _PROTOTYPE_STRATEGIES:
+            if not (
+                isinstance(self.n_prototypes, numbers.Integral)
+                and self.n_prototypes > 0
+            ):
+                raise ValueError(
+                    f"Got n_prototypes={self.n_prototypes!r}, but expected a "
+                    f"positive int with categories={self.categories!r}. "
+                )
+            if self.handle_unknown == "error":
+                raise ValueError(
+                    "Got handle_unknown='error', but the values that are not "
+                    "prototypes are unknown categories with "
+                    f"categories={self.categories!r}. "
+                )
+        elif self.categories not in ["auto"]:
             for cats in self.categories:
                 if not np.all(np.sort(cats) == np.array(cats)):
                     raise ValueError("Unsorted categories are not yet supported. ")
@@ -370,11 +453,13 @@ class SimilarityEncoder(OneHotEncoder):
             Xi = Xlist[i]
             if self.categories == "auto":
                 self.categories_.append(np.unique(Xi))
+            elif self.categories in _PROTOTYPE_STRATEGIES:
+                self.categories_.append(self._select_prototypes(Xi))
             else:
                 if self.handle_unknown == "error":
-                    valid_mask = np.in1d(Xi, self.categories[i])
-                    if not np.all(valid_mask):
-                        diff = np.unique(Xi[~valid_mask])
+                    unq_Xi, _, is_known = factorize(Xi, self.categories[i])
+                    if not np.all(is_known):
+                        diff = unq_Xi[~is_known]
                         raise ValueError(
                             f"Found unknown categories {diff} in column {i} "
                             "during fit. "
@@ -403,17 +488,13 @@ class SimilarityEncoder(OneHotEncoder):
 
             self.vectorizers_.append(vectorizer)
 
+            preprocessed_categories = preprocess(categories)
             self.vocabulary_count_matrices_.append(
-                vectorizer.fit_transform(
-                    [preprocess(category) for category in categories]
-                )
+                vectorizer.fit_transform(preprocessed_categories)
             )
 
             self.vocabulary_ngram_counts_.append(
-                [
-                    get_ngram_count(preprocess(category), self.ngram_range)
-                    for category in categories
-                ]
+                get_ngram_count(preprocessed_categories, self.ngram_range).tolist()
             )
 
         self._infrequent_enabled = False
@@ -424,7 +505,30 @@ class SimilarityEncoder(OneHotEncoder):
 
         return self
 
-    def transform(self, X: ArrayLike, fast: bool = True) -> NDArray:
+    def _select_prototypes(self, X: NDArray) -> NDArray:
+        """
+        Select the prototypes of a feature with the strategy `categories`,
+        from its unique values weighted by their number of occurrences.
+        """
+        unq_X, lookup, _ = factorize(X)
+        counts = np.bincount(lookup, minlength=len(unq_X))
+        if self.categories == "most_frequent":
+            most_frequent = np.argsort(-counts, kind="stable")[: self.n_prototypes]
+            return unq_X[np.sort(most_frequent)]
+        # The prototypes are among the unique values, which may not be strings
+        prototypes = get_kmeans_prototypes(
+            unq_X.astype(str),
+            self.n_prototypes,
+            analyzer=self.analyzer,
+            ngram_range=self.ngram_range,
+            sparse=True,
+            sample_weight=counts,
+            random_state=self.random_state,
+            minibatch=self.categories == "minibatch-k-means",
+        )
+        return unq_X[np.isin(unq_X.astype(str), prototypes)]
+
+    def transform(self, X: ArrayLike, fast: bool = True) -> NDArray | sparse.csr_matrix:
         """Transform `X` using specified encoding scheme.
 
         Parameters
@@ -436,8 +540,9 @@ class SimilarityEncoder(OneHotEncoder):
 
         Returns
         -------
-        ndarray, shape [n_samples, n_features_new]
-            Transformed input.
+        ndarray or sparse CSR matrix, shape [n_samples, n_features_new]
+            Transformed input. It is sparse if `top_k` or `min_similarity` is
+            not None.
         """
         check_is_fitted(self, "categories_")
         if hasattr(X, "iloc") and X.isna().values.any():
@@ -465,25 +570,28 @@ class SimilarityEncoder(OneHotEncoder):
         Xlist, n_samples, n_features = self._check_X(X)
         self._check_n_features(X, reset=False)
 
+        # Factorize each column once, and check its unique values only
+        factorized = []
         for i in range(n_features):
-            Xi = Xlist[i]
-            valid_mask = np.in1d(Xi, self.categories_[i])
-
-            if not np.all(valid_mask):
-                if self.handle_unknown == "error":
-                    diff = np.unique(X[~valid_mask, i])
-                    raise ValueError(
-                        f"Found unknown categories {diff} in column {i} during fit. "
-                    )
+            unq_Xi, lookup, is_known = factorize(Xlist[i], self.categories_[i])
+            if not np.all(is_known) and self.handle_unknown == "error":
+                diff = unq_Xi[~is_known]
+                raise ValueError(
+                    f"Found unknown categories {diff} in column {i} during fit. "
+                )
+            factorized.append((unq_Xi, lookup))
 
         min_n, max_n = self.ngram_range
 
         total_length = sum(len(x) for x in self.categories_)
-        out = np.empty((n_samples, total_length), dtype=self.dtype)
+        if self._sparse_output():
+            out = []
+        else:
+            out = np.empty((n_samples, total_length), dtype=self.dtype)
         last = 0
         for j, categories in enumerate(self.categories_):
             if fast:
-                encoded_Xj = self._ngram_similarity_fast(Xlist[j], j)
+                encoded_Xj = self._ngram_similarity_fast(*factorized[j], j)
             else:
                 encoded_Xj = ngram_similarity_matrix(
                     Xlist[j],
@@ -493,16 +601,47 @@ class SimilarityEncoder(OneHotEncoder):
                     hashing_dim=self.hashing_dim,
                     dtype=np.float32,
                 )
+                if self._sparse_output():
+                    encoded_Xj = self._sparsify(encoded_Xj.astype(self.dtype))
 
+            if self._sparse_output():
+                out.append(encoded_Xj)
+                continue
             out[:, last : last + len(categories)] = encoded_Xj
             last += len(categories)
+        if self._sparse_output():
+            return sparse.hstack(out, format="csr")
         return out
 
+    def _sparse_output(self) -> bool:
+        return self.top_k is not None or self.min_similarity is not None
+
+    def _sparsify(self, similarities: NDArray) -> sparse.csr_matrix:
+        """
+        Keep the `top_k` highest similarities of each row that are greater
+        than or equal to `min_similarity`, in a CSR matrix.
+        """
+        n_rows, n_cols = similarities.shape
+        if self.top_k is not None and self.top_k < n_cols:
+            cols = np.argpartition(-similarities, self.top_k - 1, axis=1)
+            cols = np.sort(cols[:, : self.top_k], axis=1).ravel()
+            rows = np.repeat(np.arange(n_rows), self.top_k)
+        else:
+            rows, cols = np.indices((n_rows, n_cols)).reshape(2, -1)
+        values = similarities[rows, cols]
+        keep = values != 0
+        if self.min_similarity is not None:
+            keep &= values >= self.min_similarity
+        return sparse.csr_matrix(
+            (values[keep], (rows[keep], cols[keep])), shape=(n_rows, n_cols)
+        )
+
     def _ngram_similarity_fast(
         self,
-        X: list | NDArray,
+        unq_X: NDArray,
+        lookup: NDArray,
         col_idx: int,
-    ) -> NDArray:
+    ) -> NDArray | sparse.csr_matrix:
         """
         Fast computation of ngram similarity.
 
@@ -516,49 +655,66 @@ class SimilarityEncoder(OneHotEncoder):
 
         Parameters
         ----------
-        X : list or ndarray
-            Observations being transformed.
+        unq_X : ndarray
+            The unique values of the observations being transformed.
+        lookup : ndarray
+            The indices of the observations in `unq_X`.
         col_idx : int
-            The column index of X in the original feature matrix.
+            The column index of the observations in the original feature
+            matrix.
         """
         vectorizer = self.vectorizers_[col_idx]
 
-        unq_X = np.unique(X)
-        unq_X_ = np.array([preprocess(x) for x in unq_X])
+        unq_X_ = preprocess(unq_X)
 
         X_count_matrix = vectorizer.transform(unq_X_)
         vocabulary_count_matrix = self.vocabulary_count_matrices_[col_idx]
+        X_ngram_count = (
+            get_ngram_count(unq_X_, self.ngram_range).astype(self.dtype).reshape(-1, 1)
+        )
         vocabulary_ngram_count = np.array(
-            self.vocabulary_ngram_counts_[col_idx]
-        ).reshape(-1, 1)
-
-        se_dict = {}
-
-        Parallel(n_jobs=self.n_jobs, backend="threading")(
-            delayed(_ngram_similarity_one_sample_inplace)(
-                X_count_vector,
-                vocabulary_count_matrix,
-                x_str,
-                vocabulary_ngram_count,
-                se_dict,
-                unq_X,
-                i,
-                self.ngram_range,
+            self.vocabulary_ngram_counts_[col_idx], dtype=self.dtype
+        )
+
+        # The levels of the prototypes are shared by all the blocks
+        vocabulary_levels_T = _threshold_levels(
+            vocabulary_count_matrix,
+            int(vocabulary_count_matrix.max()) if vocabulary_count_matrix.nnz else 0,
+            self.dtype,
+        ).T.tocsr()
+
+        def similarity_block(rows: slice) -> sparse.csr_matrix | None:
+            same_grams = _sum_of_minimums(
+                X_count_matrix[rows], vocabulary_count_matrix, vocabulary_levels_T
             )
-            for X_count_vector, x_str, i in zip(
-                X_count_matrix, unq_X_, range(len(unq_X))
+            all_grams = X_ngram_count[rows] + vocabulary_ngram_count - same_grams
+            if unq_out is not None:
+                np.divide(
+                    same_grams, all_grams, out=unq_out[rows], where=all_grams != 0
+                )
+                return None
+            similarities = np.zeros_like(same_grams, dtype=self.dtype)
+            np.divide(same_grams, all_grams, out=similarities, where=all_grams != 0)
+            return self._sparsify(np.nan_to_num(similarities, copy=False))
+
+        # Compute the similarities of blocks of unique values to all the
+        # prototypes at once. With a sparse output, each block is sparsified
+        # as soon as it is computed.
+        unq_out = None
+        if not self._sparse_output():
+            unq_out = np.zeros(
+                (len(unq_X), vocabulary_count_matrix.shape[0]), dtype=self.dtype
             )
+        block_size = max(
+            _BLOCK_MAX_SIMILARITIES // max(vocabulary_count_matrix.shape[0], 1), 1
         )
-
-        out = np.empty(
-            (len(X), vocabulary_count_matrix.shape[0]),
-            dtype=self.dtype,
+        blocks = Parallel(n_jobs=self.n_jobs, backend="threading")(
+            delayed(similarity_block)(rows)
+            for rows in gen_batches(len(unq_X), block_size)
         )
-
-        for x, out_row in zip(X, out):
-            out_row[:] = se_dict[x]
-
-        return np.nan_to_num(out, copy=False)
+        if unq_out is None:
+            return sparse.vstack(blocks, format="csr")[lookup]
+        return np.nan_to_num(unq_out[lookup], copy=False)
 
     def _more_tags(self):
         return {
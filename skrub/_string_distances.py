@@ -4,13 +4,21 @@ Some string distances
 
 import re
 from collections import Counter
+from collections.abc import Collection
 
-# TODO vectorize these functions (accept arrays)
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy import sparse
 
+_WHITE_SPACES = re.compile(r"\s\s+")
 
-def get_ngram_count(string: str, ngram_range: tuple[int, int]) -> int:
+
+def get_ngram_count(
+    string: str | Collection[str], ngram_range: tuple[int, int]
+) -> int | NDArray:
     """
-    Compute the number of ngrams in a string.
+    Compute the number of ngrams in a string, or in each string of an array.
 
     Here is where the formula comes from:
 
@@ -22,15 +30,19 @@ def get_ngram_count(string: str, ngram_range: tuple[int, int]) -> int:
 
     """
     min_n, max_n = ngram_range
+    if isinstance(string, str):
+        length = len(string)
+    else:
+        length = np.fromiter(map(len, string), dtype=np.int64, count=len(string))
     ngram_count = 0
 
     for i in range(min_n, max_n + 1):
-        ngram_count += len(string) - i + 1
+        ngram_count += length - i + 1
 
     return ngram_count
 
 
-def preprocess(x: str) -> str:
+def preprocess(x: str | Collection[str]) -> str | NDArray:
     """
     Combine preprocessing done by CountVectorizer and the SimilarityEncoder.
 
@@ -45,15 +57,20 @@ def preprocess(x: str) -> str:
     stripping sequences of 2 or more whitespaces into 1). In order for the two
     methods to output similar results, this pre-processing is done upstream,
     prior to the CountVectorizer.
+
+    If `x` is an array of strings, an object array of the preprocessed
+    strings is returned.
     """
+    if not isinstance(x, str):
+        return np.array(
+            [_WHITE_SPACES.sub(" ", f" {string} ") for string in x], dtype=object
+        )
 
     # Preprocessing step done in ngram_similarity
     x = f" {x} "
 
     # Preprocessing step done in the CountVectorizer
-    _white_spaces = re.compile(r"\s\s+")
-
-    return _white_spaces.sub(" ", x)
+    return _WHITE_SPACES.sub(" ", x)
 
 
 def get_unique_ngrams(string: str, ngram_range: tuple[int, int]):
@@ -83,6 +100,77 @@ def get_unique_ngrams(string: str, ngram_range: tuple[int, int]):
     return ngram_set
 
 
+def ngram_count_matrix(
+    strings: Collection[str], ngram_range: tuple[int, int]
+) -> tuple[sparse.csr_matrix, list[str]]:
+    """
+    Count the n-grams of many strings at once.
+
+    The strings are split in n-grams as in ``get_unique_ngrams``: they are
+    lower-cased, their whitespaces are collapsed and they are padded with a
+    space on each side. The characters of all the strings are concatenated
+    and integer-coded with ``pd.factorize``, and the code of each n-gram is
+    computed from the code of the (n-1)-gram starting at the same position
+    and the code of its last character, so that the n-grams are only ever
+    handled as integers.
+
+    Parameters
+    ----------
+    strings : collection of str
+        The strings to split in n-grams.
+    ngram_range : tuple (min_n, max_n)
+        The lower and upper boundaries of the range of n-values for different
+        n-grams used in the string similarity. All values of `n` such
+        that ``min_n <= n <= max_n`` will be used.
+
+    Returns
+    -------
+    counts : sparse matrix of shape (n_strings, n_ngrams)
+        The number of occurrences of each n-gram in each string, with sorted
+        indices.
+    vocabulary : list of str
+        The n-grams of the columns of `counts`.
+    """
+    padded = [f" {' '.join(string.lower().split())} " for string in strings]
+    lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+    text = "".join(padded)
+    chars = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+    char_codes, unq_chars = pd.factorize(chars)
+    # Index of the string of each character, and end of that string
+    string_idx = np.repeat(np.arange(len(padded)), lengths)
+    ends = np.repeat(np.cumsum(lengths), lengths)
+    positions = np.arange(len(chars))
+
+    rows, cols, vocabulary = [], [], []
+    gram_codes = char_codes.astype(np.int64)
+    for n in range(1, ngram_range[1] + 1):
+        if n > 1:
+            gram_codes = gram_codes[:-1] * len(unq_chars) + char_codes[n - 1 :]
+        # Keep the n-grams that do not cross the end of their string
+        is_valid = positions[: len(gram_codes)] + n <= ends[: len(gram_codes)]
+        valid_positions = np.flatnonzero(is_valid)
+        codes, unq_codes = pd.factorize(gram_codes[valid_positions])
+        # Make the codes dense again, so that they do not overflow
+        gram_codes = np.zeros(len(gram_codes), dtype=np.int64)
+        gram_codes[valid_positions] = codes
+        if n >= ngram_range[0]:
+            rows.append(string_idx[valid_positions])
+            cols.append(codes + len(vocabulary))
+            # Any occurrence of an n-gram gives its text
+            gram_starts = np.empty(len(unq_codes), dtype=np.int64)
+            gram_starts[codes] = valid_positions
+            vocabulary.extend(text[start : start + n] for start in gram_starts.tolist())
+
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+        shape=(len(padded), len(vocabulary)),
+    )
+    counts.sum_duplicates()
+    return counts, vocabulary
+
+
 def get_ngrams(string: str, n: int) -> list[tuple]:
     """Return the set of different n-grams in a string"""
     # Pure Python implementation: no numpy
@@ -93,7 +181,16 @@ def get_ngrams(string: str, n: int) -> list[tuple]:
 
 
 def ngram_similarity(string1, string2, n, preprocess_strings=True):
-    """n-gram similarity between two strings"""
+    """n-gram similarity between two strings, or between pairs of strings.
+
+    If `string1` and `string2` are arrays of strings of the same length, the
+    similarities of the pairs ``(string1[i], string2[i])`` are returned as
+    an array, computed at once from the n-gram counts of ``ngram_count_matrix``.
+    The similarity of two strings without any n-gram is nan.
+    """
+    if not (isinstance(string1, str) and isinstance(string2, str)):
+        return _ngram_similarity_pairs(string1, string2, n, preprocess_strings)
+
     if preprocess_strings:
         string1, string2 = preprocess(string1), preprocess(string2)
 
@@ -107,3 +204,27 @@ def ngram_similarity(string1, string2, n, preprocess_strings=True):
     allgrams = len(ngrams1) + len(ngrams2)
     similarity = samegrams / (allgrams - samegrams)
     return similarity
+
+
+def _ngram_similarity_pairs(
+    strings1: Collection[str],
+    strings2: Collection[str],
+    n: int,
+    preprocess_strings: bool = True,
+) -> NDArray:
+    """n-gram similarity of each pair of strings of two arrays."""
+    if len(strings1) != len(strings2):
+        raise ValueError(
+            f"Got {len(strings1)} and {len(strings2)} strings, but expected "
+            "as many strings in both arrays. "
+        )
+    strings = list(strings1) + list(strings2)
+    if preprocess_strings:
+        strings = preprocess(strings)
+    counts, _ = ngram_count_matrix(strings, (n, n))
+    counts1, counts2 = counts[: len(strings1)], counts[len(strings1) :]
+    samegrams = np.asarray(counts1.minimum(counts2).sum(axis=1), dtype=np.float64)
+    allgrams = np.asarray(counts1.sum(axis=1) + counts2.sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        similarity = samegrams / (allgrams - samegrams)
+    return similarity.ravel()
@@ -9,7 +9,7 @@ from sklearn.utils import check_array
 from sklearn.utils.fixes import _object_dtype_isnan
 from sklearn.utils.validation import _check_y, check_is_fitted
 
-from skrub._utils import check_input
+from skrub._utils import check_input, factorize
 
 
 def lambda_(x, n):
@@ -197,9 +197,9 @@ class TargetEncoder(BaseEstimator, TransformerMixin):
                 le.fit(Xj)
             else:
                 if self.handle_unknown == "error":
-                    valid_mask = np.in1d(Xj, self.categories[j])
-                    if not np.all(valid_mask):
-                        diff = np.unique(Xj[~valid_mask])
+                    unq_Xj, _, is_known = factorize(Xj, self.categories[j])
+                    if not np.all(is_known):
+                        diff = unq_Xj[~is_known]
                         raise ValueError(
                             f"Found unknown categories {diff} in column {j} during fit"
                         )
@@ -266,61 +266,40 @@ class TargetEncoder(BaseEstimator, TransformerMixin):
         X_temp = check_array(X, dtype=None)
         X = X_temp
 
-        n_samples, n_features = X.shape
-        X_int = np.zeros_like(X, dtype=int)
-        X_mask = np.ones_like(X, dtype=bool)
-
-        for i in range(n_features):
-            Xi = X[:, i]
-            valid_mask = np.in1d(Xi, self.categories_[i])
-
-            if not np.all(valid_mask):
-                if self.handle_unknown == "error":
-                    diff = np.unique(X[~valid_mask, i])
-                    raise ValueError(
-                        f"Found unknown categories {diff} in column {i} "
-                        "during transform."
-                    )
-                else:
-                    # Set the problematic rows to an acceptable value and
-                    # continue `The rows are marked `X_mask` and will be
-                    # removed later.
-                    X_mask[:, i] = valid_mask
-                    Xi = Xi.copy()
-                    Xi[~valid_mask] = self.categories_[i][0]
-            X_int[:, i] = self._label_encoders_[i].transform(Xi)
-
         out = []
-
         for j, cats in enumerate(self.categories_):
-            unqX = np.unique(X[:, j])
-            encoder = {x: 0 for x in unqX}
+            # Factorize the column once, and encode its unique values only
+            unq_X, lookup, is_known = factorize(X[:, j], cats)
+            if not np.all(is_known) and self.handle_unknown == "error":
+                diff = unq_X[~is_known]
+                raise ValueError(
+                    f"Found unknown categories {diff} in column {j} during transform."
+                )
+            lambda_n = np.array(
+                [lambda_(self.counter_[j][x], self.n_ / self.k_[j]) for x in unq_X],
+                dtype=np.float64,
+            )
             if self.clf_type in ["binary-clf", "regression"]:
-                for x in unqX:
-                    if x not in cats:
-                        Eyx = 0
-                    else:
-                        Eyx = self.Eyx_[j][x]
-                    lambda_n = lambda_(self.counter_[j][x], self.n_ / self.k_[j])
-                    encoder[x] = lambda_n * Eyx + (1 - lambda_n) * self.Ey_
-                x_out = np.zeros((len(X[:, j]), 1))
-                for i, x in enumerate(X[:, j]):
-                    x_out[i, 0] = encoder[x]
-                out.append(x_out.reshape(-1, 1))
+                Eyx = np.array(
+                    [
+                        self.Eyx_[j][x] if known else 0
+                        for x, known in zip(unq_X, is_known)
+                    ],
+                    dtype=np.float64,
+                )
+                encoder = lambda_n * Eyx + (1 - lambda_n) * self.Ey_
+                out.append(encoder[lookup].reshape(-1, 1))
             if self.clf_type == "multiclass-clf":
-                x_out = np.zeros((len(X[:, j]), len(self.classes_)))
-                lambda_n = {x: 0 for x in unqX}
-                for x in unqX:
-                    lambda_n[x] = lambda_(self.counter_[j][x], self.n_ / self.k_[j])
+                encoder = np.zeros((len(unq_X), len(self.classes_)))
                 for k, c in enumerate(np.unique(self.classes_)):
-                    for x in unqX:
-                        if x not in cats:
-                            Eyx = 0
-                        else:
-                            Eyx = self.Eyx_[c][j][x]
-                        encoder[x] = lambda_n[x] * Eyx + (1 - lambda_n[x]) * self.Ey_[c]
-                    for i, x in enumerate(X[:, j]):
-                        x_out[i, k] = encoder[x]
-                out.append(x_out)
+                    Eyx = np.array(
+                        [
+                            self.Eyx_[c][j][x] if known else 0
+                            for x, known in zip(unq_X, is_known)
+                        ],
+                        dtype=np.float64,
+                    )
+                    encoder[:, k] = lambda_n * Eyx + (1 - lambda_n) * self.Ey_[c]
+                out.append(encoder[lookup])
         out = np.hstack(out)
         return out
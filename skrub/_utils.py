@@ -1,51 +1,12 @@
-import collections
 import importlib
 import re
-from collections.abc import Hashable
-from typing import Any
 
 import numpy as np
-from numpy.typing import NDArray
+import pandas as pd
+from numpy.typing import ArrayLike, NDArray
 from sklearn.utils import check_array
 
 
-class LRUDict:
-    """dict with limited capacity
-
-    Using LRU eviction avoids memorizing a full dataset"""
-
-    def __init__(self, capacity: int):
-        self.capacity = capacity
-        self.cache = collections.OrderedDict()
-
-    def __getitem__(self, key: Hashable):
-        try:
-            value = self.cache.pop(key)
-            self.cache[key] = value
-            return value
-        except KeyError:
-            return -1
-
-    def __setitem__(self, key: Hashable, value: Any):
-        try:
-            self.cache.pop(key)
-        except KeyError:
-            if len(self.cache) >= self.capacity:
-                self.cache.popitem(last=False)
-        self.cache[key] = value
-
-    def __contains__(self, key: Hashable):
-        return key in self.cache
-
-
-def combine_lru_dicts(capacity: int, *lru_dicts: LRUDict) -> LRUDict:
-    combined_lru_dict = LRUDict(capacity)
-    for lru_dict in lru_dicts:
-        for key, value in lru_dict.cache.items():
-            combined_lru_dict[key] = value
-    return combined_lru_dict
-
-
 def check_input(X) -> NDArray:
     """
     Check input with sklearn standards.
@@ -73,6 +34,40 @@ def check_input(X) -> NDArray:
     return X_
 
 
+def factorize(
+    X: ArrayLike, categories: ArrayLike | None = None
+) -> tuple[NDArray, NDArray, NDArray | None]:
+    """
+    Compute the unique values of a column, and the code of each value.
+
+    The values are hashed rather than compared to one another, and only the
+    unique values are looked up in `categories`, so that the column is
+    scanned only once.
+
+    Parameters
+    ----------
+    X : array-like of shape (n_samples, )
+        The column.
+    categories : array-like, optional
+        The known categories.
+
+    Returns
+    -------
+    unq_X : ndarray
+        The sorted unique values of `X`.
+    lookup : ndarray of int
+        The codes of the values, such that ``X = unq_X[lookup]``.
+    is_known : ndarray of bool or None
+        Whether each unique value is in `categories`, or None if
+        `categories` is None.
+    """
+    lookup, unq_X = pd.factorize(np.asarray(X), sort=True, use_na_sentinel=False)
+    is_known = None
+    if categories is not None:
+        is_known = np.asarray(pd.Index(unq_X).isin(np.asarray(categories)))
+    return np.asarray(unq_X), lookup, is_known
+
+
 def import_optional_dependency(name: str, extra: str = ""):
     """Import an optional dependency.
 
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from skrub import MinHashEncoder, bbit_jaccard_similarity
+from skrub._bbit_minhash import pack_bbit_signatures
+from skrub._string_distances import get_unique_ngrams
+
+
+@pytest.mark.parametrize("n_bits", [1, 2, 4, 8])
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint64])
+def test_pack_bbit_signatures(n_bits, dtype):
+    rng = np.random.RandomState(0)
+    hashes = rng.randint(-(2**31), 2**31 - 1, size=(20, 70))
+    signatures = pack_bbit_signatures(hashes, n_bits=n_bits, dtype=dtype)
+    assert signatures.dtype == dtype
+    n_bytes = -(-70 * n_bits // np.dtype(dtype).itemsize // 8)
+    assert signatures.shape == (20, n_bytes)
+
+    # Unpack the b-bit values
+    bits = np.unpackbits(signatures.view(np.uint8), axis=1, bitorder="little")
+    bits = bits[:, : 70 * n_bits].reshape(20, 70, n_bits)
+    values = (bits << np.arange(n_bits)).sum(axis=2)
+    assert_array_equal(values, hashes & (2**n_bits - 1))
+
+    # The number of matching b-bit values gives the similarities
+    matches = (values[:, None, :] == values[None, :, :]).sum(axis=2)
+    chance = 2.0**-n_bits
+    expected = np.clip((matches / 70 - chance) / (1 - chance), 0, 1)
+    similarities = bbit_jaccard_similarity(signatures, n_components=70, n_bits=n_bits)
+    np.testing.assert_allclose(similarities, expected)
+    assert_array_equal(np.diag(similarities), 1)
+
+
+def test_bbit_jaccard_similarity_estimate():
+    X = np.array(
+        ["paris, france", "paris", "london, uk", "london, united kingdom", "oslo"]
+    )[:, None]
+    n_components = 2048
+    encoder = MinHashEncoder(n_components=n_components, hashing="murmur").fit(X)
+    signatures = encoder.transform_signatures(X, n_bits=2, dtype=np.uint8)
+    assert signatures.shape == (5, n_components * 2 // 8)
+    similarities = bbit_jaccard_similarity(
+        signatures[:2], signatures, n_components=n_components, n_bits=2
+    )
+    assert similarities.shape == (2, 5)
+
+    grams = [get_unique_ngrams(x, (2, 4)) for x in X[:, 0]]
+    jaccard = [[len(a & b) / len(a | b) for b in grams] for a in grams[:2]]
+    np.testing.assert_allclose(similarities, jaccard, atol=0.05)
+
+
+def test_transform_signatures():
+    X = np.array([["paris", "fr"], ["london", "uk"], [None, "fr"]])
+    encoder = MinHashEncoder(n_components=64).fit(X)
+    hashes = encoder.transform(X).astype(np.int64)
+    signatures = encoder.transform_signatures(X, n_bits=4)
+    assert signatures.dtype == np.uint64
+    assert signatures.shape == (3, 8)
+    assert_array_equal(signatures[:, :4], pack_bbit_signatures(hashes[:, :64], 4))
+    assert_array_equal(signatures[:, 4:], pack_bbit_signatures(hashes[:, 64:], 4))
+
+    encoder = MinHashEncoder(n_components=64, dtype=np.int32).fit(X)
+    assert_array_equal(encoder.transform_signatures(X, n_bits=4), signatures)
+
+    encoder = MinHashEncoder(n_components=64, dtype=np.float32).fit(X)
+    with pytest.raises(ValueError, match=r"requires the min-hashes to be exact"):
+        encoder.transform_signatures(X)
+
+    with pytest.raises(ValueError, match=r"Got n_bits="):
+        MinHashEncoder().fit(X).transform_signatures(X, n_bits=3)
@@ -1,4 +1,9 @@
-from skrub._fast_hash import ngram_min_hash
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.testing import assert_array_equal
+
+from skrub._fast_hash import ngram_min_hash, ngram_min_hash_batch, pack_strings
 from skrub.tests.utils import generate_data
 
 
@@ -15,3 +20,97 @@ def test_fast_hash() -> None:
 
     min_hash4 = ngram_min_hash(a, seed=0, return_minmax=True)
     assert len(min_hash4) == 2
+
+
+@pytest.mark.parametrize("ngram_range", [(2, 4), (3, 3), (1, 6)])
+def test_fast_hash_batch(ngram_range) -> None:
+    # The batched hashes are exactly those of ngram_min_hash, including for
+    # strings shorter than the n-grams.
+    data = generate_data(20, as_list=True, random_state=0)
+    data += ["a", "ab", "abc", "abcd", "a b", "paris, FR", "London"]
+    seeds = range(7)
+
+    min_hashes, max_hashes = ngram_min_hash_batch(
+        data, ngram_range, seeds, return_minmax=True
+    )
+    expected = np.array(
+        [
+            [ngram_min_hash(s, ngram_range, seed, return_minmax=True) for seed in seeds]
+            for s in data
+        ]
+    )
+    assert min_hashes.dtype == np.int32
+    assert_array_equal(min_hashes, expected[:, :, 0])
+    assert_array_equal(max_hashes, expected[:, :, 1])
+    assert_array_equal(ngram_min_hash_batch(data, ngram_range, seeds), min_hashes)
+
+
+def test_fast_hash_batch_chunks(monkeypatch) -> None:
+    data = generate_data(20, as_list=True, random_state=0)
+    expected = ngram_min_hash_batch(data, seeds=range(5))
+    monkeypatch.setattr("skrub._fast_hash._BATCH_MAX_HASHES", 100)
+    assert_array_equal(ngram_min_hash_batch(data, seeds=range(5)), expected)
+
+    assert ngram_min_hash_batch([], seeds=range(5)).shape == (0, 5)
+    assert ngram_min_hash_batch((), seeds=range(5)).shape == (0, 5)
+    assert ngram_min_hash_batch(pack_strings([]), seeds=range(5)).shape == (0, 5)
+    # Tuples of strings are not mistaken for packed strings
+    assert_array_equal(
+        ngram_min_hash_batch(tuple(data[:2]), seeds=range(5)), expected[:2]
+    )
+    assert_array_equal(
+        ngram_min_hash_batch(pack_strings(data), seeds=range(5)), expected
+    )
+
+
+def test_fast_hash_non_ascii() -> None:
+    # All the UTF-8 bytes of the strings are hashed, not only the first
+    # len(string) ones.
+    hashes_1 = [ngram_min_hash("日本語の文", seed=seed) for seed in range(10)]
+    hashes_2 = [ngram_min_hash("日本語の本", seed=seed) for seed in range(10)]
+    assert hashes_1 != hashes_2
+    data = ["日本語の文", "日本語の本", "café", "naïve"]
+    assert_array_equal(
+        ngram_min_hash_batch(data, seeds=range(3)),
+        [[ngram_min_hash(s, seed=seed) for seed in range(3)] for s in data],
+    )
+
+
+@pytest.mark.parametrize("container", [list, np.array, pd.Series])
+def test_pack_strings(container) -> None:
+    data = ["héllo", "abc", "", "日本語", "x"]
+    buffer, offsets = pack_strings(container(data))
+    assert buffer.dtype == np.int8
+    assert_array_equal(offsets, [0, 6, 9, 9, 18, 19])
+    assert buffer.tobytes() == "".join(data).encode()
+
+
+def test_pack_strings_arrow() -> None:
+    pa = pytest.importorskip("pyarrow")
+    data = ["héllo", "abc", "", "日本語", "x"]
+    expected_buffer, expected_offsets = pack_strings(data)
+
+    array = pa.array(data)
+    buffer, offsets = pack_strings(array)
+    # The data buffer of the Arrow array is reused
+    assert np.shares_memory(buffer, np.frombuffer(array.buffers()[2], dtype="int8"))
+    assert_array_equal(buffer[offsets[0] : offsets[-1]], expected_buffer)
+    assert_array_equal(offsets, expected_offsets)
+
+    buffer, offsets = pack_strings(array.slice(1, 3))
+    assert buffer[offsets[0] : offsets[-1]].tobytes() == "abc日本語".encode()
+    assert_array_equal(np.diff(offsets), [3, 0, 9])
+
+    for strings in [
+        pa.chunked_array([data[:2], data[2:]]),
+        pa.array(data, type=pa.large_string()),
+        pd.Series(data, dtype="string[pyarrow]"),
+    ]:
+        buffer, offsets = pack_strings(strings)
+        assert_array_equal(np.diff(offsets), np.diff(expected_offsets))
+        assert_array_equal(buffer[offsets[0] : offsets[-1]], expected_buffer)
+
+    assert_array_equal(
+        ngram_min_hash_batch(array, seeds=range(3)),
+        ngram_min_hash_batch(data, seeds=range(3)),
+    )
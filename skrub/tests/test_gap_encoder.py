@@ -1,13 +1,24 @@
 import copy
+import pickle
 
 import numpy as np
 import pandas as pd
 import pytest
 from numpy.testing import assert_array_equal
+from scipy import sparse
+from sklearn.decomposition._nmf import _beta_divergence
 from sklearn.exceptions import NotFittedError
+from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.model_selection import train_test_split
 
 from skrub import GapEncoder
+from skrub._gap_encoder import (
+    ActivationStore,
+    GapEncoderColumn,
+    _multiplicative_update_h,
+    _multiplicative_update_w,
+    get_kmeans_prototypes,
+)
 from skrub.datasets import fetch_midwest_survey
 from skrub.tests.utils import generate_data
 
@@ -378,3 +389,330 @@ def test_split_and_merge_transformers() -> None:
     # check all attributes
     enc_merged.rho_ == enc.rho_
     enc_merged.column_names_ == enc.column_names_
+
+
+@pytest.mark.parametrize("rescale_W", [True, False])
+def test_multiplicative_update_h(rescale_W: bool) -> None:
+    # The batched E-step gives the same activations as updating each row
+    # separately until convergence
+    rng = np.random.RandomState(0)
+    V = sparse.random(50, 30, density=0.2, format="csr", random_state=rng)
+    V.data = rng.randint(1, 4, size=V.nnz).astype(np.float64)
+    W = rng.gamma(1.1, size=(5, 30))
+    H = rng.gamma(1.1, size=(50, 5))
+
+    expected = H.copy()
+    for i in range(V.shape[0]):
+        expected[i : i + 1] = _multiplicative_update_h(
+            V[i], W, expected[i : i + 1], epsilon=1e-3, max_iter=20, rescale_W=rescale_W
+        )
+    H_out = _multiplicative_update_h(
+        V, W, H.copy(), epsilon=1e-3, max_iter=20, rescale_W=rescale_W
+    )
+    np.testing.assert_allclose(H_out, expected, rtol=1e-12)
+
+
+def test_transform_does_not_modify_activations() -> None:
+    X = generate_data(70, random_state=0)
+    enc = GapEncoder(n_components=2, random_state=0).fit(X)
+    H_dict = copy.deepcopy(enc.fitted_models_[0].H_dict_)
+    X_new = np.concatenate([X, [["unseen string"]]])
+    y = enc.transform(X_new)
+
+    H_dict_after = enc.fitted_models_[0].H_dict_
+    assert H_dict_after.keys() == H_dict.keys()
+    for key in H_dict.keys():
+        assert_array_equal(H_dict_after[key], H_dict[key])
+    assert_array_equal(enc.transform(X_new), y)
+    assert_array_equal(enc.transform(X_new[-1:]), y[-1:])
+
+
+def test_activation_store() -> None:
+    store = ActivationStore(n_components=2)
+    store.put_many(np.array(["a", "b", "a"]), [[0, 1], [2, 3], [4, 5]])
+    assert len(store) == 2
+    assert "a" in store and "c" not in store
+    assert_array_equal(store["a"], [4, 5])
+    store.put_many(["c", "b"], [[6, 7], [8, 9]])
+    assert list(store.keys()) == ["a", "b", "c"]
+    assert_array_equal(store.contains_many(["c", "d", "a"]), [True, False, True])
+    assert_array_equal(store.get_many(["c", "a", "b"]), [[6, 7], [4, 5], [8, 9]])
+    with pytest.raises(KeyError, match=r"\['d'\] are not stored"):
+        store.get_many(["a", "d"])
+
+    store = pickle.loads(pickle.dumps(store))
+    assert list(store.keys()) == ["a", "b", "c"]
+    assert_array_equal(store.get_many(["c", "a", "b"]), [[6, 7], [4, 5], [8, 9]])
+    store.put_many(["d"], [[10, 11]])
+    assert_array_equal(store.get_many(["d", "a"]), [[10, 11], [4, 5]])
+
+
+def test_multiplicative_update_w_cost() -> None:
+    # The cost returned by the update of W is the KL divergence before the
+    # update
+    rng = np.random.RandomState(0)
+    V = sparse.random(50, 30, density=0.2, format="csr", random_state=rng)
+    V.data = rng.randint(1, 4, size=V.nnz).astype(np.float64)
+    W = rng.gamma(1.1, size=(5, 30))
+    H = rng.gamma(1.1, size=(50, 5))
+    expected = _beta_divergence(V, H, W, "kullback-leibler", square_root=False)
+    A, B = np.ones_like(W), np.ones_like(W)
+    W_out, A_out, B_out, cost = _multiplicative_update_w(
+        V.copy(), W.copy(), A.copy(), B.copy(), H, True, 0.95, return_cost=True
+    )
+    np.testing.assert_allclose(cost, expected)
+    expected_W, _, _ = _multiplicative_update_w(V.copy(), W.copy(), A, B, H, True, 0.95)
+    assert_array_equal(W_out, expected_W)
+
+
+@pytest.mark.parametrize("check_cost_every", [1, 3])
+def test_check_cost_every(check_cost_every: int, capsys) -> None:
+    X = generate_data(200, random_state=0)
+    enc = GapEncoder(
+        n_components=2,
+        batch_size=10,
+        max_iter=1,
+        max_no_improvement=None,
+        check_cost_every=check_cost_every,
+        random_state=0,
+        verbose=1,
+    )
+    enc.fit(X)
+    n_checks = capsys.readouterr().out.count("mean batch cost")
+    assert n_checks == -(-20 // check_cost_every) * X.shape[1]
+
+
+def test_check_cost_every_early_stopping(capsys) -> None:
+    # The smoothing of the cost accounts for the unchecked mini batches
+    model = GapEncoderColumn()
+    model._ewa_cost, model._ewa_cost_min, model._no_improvement = 1.0, 1.0, 0
+    model._minibatch_convergence(10, 0.0, 99, step=5, n_steps=None, n_batches=3)
+    assert model._ewa_cost == pytest.approx(0.7)
+
+    # Early stopping still ends the fit before max_iter
+    X = generate_data(200, random_state=0)
+    enc = GapEncoder(
+        n_components=2,
+        batch_size=10,
+        max_iter=50,
+        max_no_improvement=2,
+        check_cost_every=3,
+        random_state=0,
+        verbose=1,
+    )
+    enc.fit(X)
+    out = capsys.readouterr().out
+    assert "Converged" in out
+    assert out.count("mean batch cost") < 50 * 20 // 3
+
+
+@pytest.mark.parametrize("check_cost_every", [0, -1, 1.5])
+def test_check_cost_every_error(check_cost_every: int | float) -> None:
+    X = generate_data(20, random_state=0)
+    enc = GapEncoder(n_components=2, check_cost_every=check_cost_every)
+    for fit in [enc.fit, enc.partial_fit]:
+        with pytest.raises(ValueError, match="Got check_cost_every="):
+            fit(X)
+
+
+@pytest.mark.parametrize(
+    ["hashing", "add_words"], [(False, False), (False, True), (True, True)]
+)
+def test_shared_vectorization(hashing: bool, add_words: bool) -> None:
+    # Vectorizing all the columns at once gives the same models as fitting
+    # each column separately
+    X = generate_data(100, random_state=0)
+    X = np.hstack([X, X[::-1], np.full_like(X, "same string")])
+    kwargs = dict(n_components=2, hashing=hashing, add_words=add_words)
+    enc = GapEncoder(random_state=0, **kwargs).fit(X)
+    for k, model in enumerate(enc.fitted_models_):
+        expected = GapEncoder(random_state=0, **kwargs)._create_column_gap_encoder()
+        expected.fit(X[:, k])
+        assert_array_equal(model.W_, expected.W_)
+        assert model.n_vocab == expected.n_vocab
+        if not hashing:
+            assert_array_equal(model.vocabulary, expected.vocabulary)
+        assert_array_equal(model.transform(X[:, k]), expected.transform(X[:, k]))
+
+
+@pytest.mark.parametrize(
+    ["hashing", "init", "add_words"],
+    [(False, "k-means++", True), (True, "random", False), (False, "k-means", False)],
+)
+def test_dtype(hashing: bool, init: str, add_words: bool) -> None:
+    X = generate_data(200, random_state=0)
+    kwargs = dict(
+        n_components=3, hashing=hashing, init=init, add_words=add_words, random_state=0
+    )
+    enc_64 = GapEncoder(**kwargs).fit(X)
+    y_64 = enc_64.transform(X)
+    enc_32 = GapEncoder(dtype=np.float32, **kwargs).fit(X)
+    y_32 = enc_32.transform(X)
+
+    assert y_64.dtype == np.float64
+    assert y_32.dtype == np.float32
+    model = enc_32.fitted_models_[0]
+    for array in [model.W_, model.A_, model.B_, model.H_dict_.get_many(X[:5, 0])]:
+        assert array.dtype == np.float32
+    # The float32 model stays close to the float64 one
+    W_64 = enc_64.fitted_models_[0].W_
+    assert np.abs(model.W_ - W_64).max() <= 1e-3 * np.abs(W_64).max()
+    assert np.abs(y_32 - y_64).max() <= 1e-3 * np.abs(y_64).max()
+    np.testing.assert_allclose(enc_32.score(X), enc_64.score(X), rtol=1e-4)
+
+    enc_32 = GapEncoder(dtype=np.float32, **kwargs).partial_fit(X)
+    assert enc_32.transform(X).dtype == np.float32
+
+    with pytest.raises(ValueError, match=r"Got dtype="):
+        GapEncoder(dtype=np.int32).fit(X)
+    with pytest.raises(ValueError, match=r"Got dtype="):
+        GapEncoder(dtype="aaa").partial_fit(X)
+
+
+def test_fit_from_batches(capsys) -> None:
+    X = np.hstack([generate_data(300, random_state=i) for i in range(2)])
+    X = pd.DataFrame(X, columns=["a", "b"])
+    batches = [X[i : i + 50] for i in range(0, len(X), 50)]
+
+    # One epoch is the same as successive calls to partial_fit
+    kwargs = dict(n_components=2, max_no_improvement=None, random_state=0)
+    enc = GapEncoder(**kwargs).fit_from_batches(batches)
+    expected = GapEncoder(**kwargs)
+    for batch in batches:
+        expected.partial_fit(batch)
+    assert_array_equal(enc.transform(X), expected.transform(X))
+    assert enc.column_names_ == ["a", "b"]
+    assert enc.n_features_in_ == 2
+
+    # Arrow tables and callables
+    pa = pytest.importorskip("pyarrow")
+    enc_arrow = GapEncoder(**kwargs).fit_from_batches(
+        lambda: (pa.Table.from_pandas(batch) for batch in batches)
+    )
+    assert_array_equal(enc_arrow.transform(X), enc.transform(X))
+
+    # Several epochs, with early stopping
+    enc = GapEncoder(
+        n_components=2, max_no_improvement=2, random_state=0, verbose=1
+    ).fit_from_batches(batches, n_epochs=100)
+    assert "Converged" in capsys.readouterr().out
+
+    with pytest.raises(ValueError, match=r"can only be iterated once"):
+        GapEncoder().fit_from_batches(iter(batches), n_epochs=2)
+    with pytest.raises(ValueError, match=r"did not yield any batch"):
+        GapEncoder().fit_from_batches([])
+
+
+def test_kmeans_prototypes() -> None:
+    """
+    Test that the k-means prototypes are computed on the unique values,
+    weighted by their number of occurrences.
+    """
+    X = generate_data(50, random_state=0, sample_length=10).ravel()
+    prototypes = get_kmeans_prototypes(np.repeat(X, 3), 5, random_state=0)
+    assert_array_equal(
+        prototypes,
+        get_kmeans_prototypes(X, 5, sample_weight=np.full(50, 3), random_state=0),
+    )
+    assert len(np.unique(prototypes)) == len(prototypes) <= 5
+    assert np.isin(prototypes, X).all()
+    for kwargs in [{"max_samples": 20}, {"sparse": False}, {"minibatch": True}]:
+        prototypes = get_kmeans_prototypes(X, 5, random_state=0, **kwargs)
+        assert 0 < len(prototypes) <= 5
+        assert np.isin(prototypes, X).all()
+    # More prototypes than unique values
+    assert_array_equal(get_kmeans_prototypes(X[:3], 5), np.sort(X[:3]))
+
+
+@pytest.mark.parametrize("init", ["k-means++", "k-means", "minibatch-k-means"])
+def test_init_max_samples(init: str) -> None:
+    X = np.repeat(generate_data(100, random_state=0, sample_length=10), 5, axis=0)
+    enc = GapEncoder(n_components=4, init=init, init_max_samples=50, random_state=0)
+    enc.fit(X)
+    W = enc.fitted_models_[0].W_
+    assert W.shape[0] == 4
+    assert np.isfinite(W).all()
+    # The subsample keeps at least n_components samples
+    enc = GapEncoder(n_components=4, init=init, init_max_samples=2, random_state=0)
+    assert enc.fit_transform(X).shape == (500, 4)
+    for init_max_samples in [0, -1, 1.5]:
+        enc = GapEncoder(n_components=4, init=init, init_max_samples=init_max_samples)
+        with pytest.raises(ValueError, match="Got init_max_samples="):
+            enc.fit(X)
+
+
+@pytest.mark.parametrize("min_df", [5, 0.05])
+def test_vocabulary_pruning(min_df: int | float) -> None:
+    X = np.repeat(generate_data(100, random_state=0, sample_length=20), 3, axis=0)
+    enc = GapEncoder(n_components=5, min_df=min_df, random_state=0).fit(X)
+    # Same vocabulary as a CountVectorizer pruning on all the samples
+    expected = CountVectorizer(analyzer="char", ngram_range=(2, 4), min_df=min_df)
+    expected.fit(X.ravel())
+    model = enc.fitted_models_[0]
+    assert_array_equal(model.vocabulary, expected.get_feature_names_out())
+    assert model.W_.shape == (5, len(model.vocabulary))
+    assert enc.transform(X).shape == (300, 5)
+
+    # The most frequent n-grams are kept
+    enc = GapEncoder(n_components=5, max_features=50, random_state=0).fit(X)
+    counts = CountVectorizer(analyzer="char", ngram_range=(2, 4)).fit(X.ravel())
+    frequencies = np.asarray(counts.transform(X.ravel()).sum(axis=0)).ravel()
+    kept = np.isin(counts.get_feature_names_out(), enc.fitted_models_[0].vocabulary)
+    assert kept.sum() == 50
+    assert frequencies[kept].min() >= frequencies[~kept].max()
+
+    for min_df in [1.5, -3, 0, 0.0]:
+        enc = GapEncoder(min_df=min_df)
+        with pytest.raises(ValueError, match=f"Got min_df={min_df}"):
+            enc.fit(X)
+    for max_features in [0, -1, 1.5]:
+        enc = GapEncoder(max_features=max_features)
+        with pytest.raises(ValueError, match=f"Got max_features={max_features}"):
+            enc.fit(X)
+    enc = GapEncoder(min_df=1000)
+    with pytest.raises(ValueError, match="No n-grams or words remain"):
+        enc.fit(X)
+
+
+@pytest.mark.parametrize("hashing", [False, True])
+def test_warm_start(hashing: bool) -> None:
+    X = generate_data(300, random_state=0, sample_length=8)
+    X2 = X.copy()
+    X2[:50] = generate_data(50, random_state=1, sample_length=8)
+    enc = GapEncoder(n_components=5, hashing=hashing, warm_start=True, random_state=0)
+    enc.fit(X)
+    model = enc.fitted_models_[0]
+    W, H_dict = model.W_.copy(), model.H_dict_
+    enc.fit(X2)
+    # The fitted models are updated, not replaced
+    assert enc.fitted_models_[0] is model
+    assert model.H_dict_ is H_dict
+    assert set(X2[:, 0]) <= set(H_dict.keys())
+    if hashing:
+        assert model.W_.shape == W.shape
+    else:
+        # The new n-grams are appended to the vocabulary
+        n_vocab = W.shape[1]
+        assert model.W_.shape[1] > n_vocab
+        assert len(model.vocabulary) == model.W_.shape[1]
+        expected = GapEncoder(n_components=5).fit(X).fitted_models_[0].vocabulary
+        assert_array_equal(model.vocabulary[:n_vocab], expected)
+    np.testing.assert_allclose(model.W_.sum(axis=1), 1)
+    assert enc.transform(X2).shape == (300, 5)
+
+    enc.set_params(n_components=3)
+    with pytest.raises(ValueError, match="cannot be warm started"):
+        enc.fit(X2)
+
+
+def test_warm_start_max_features() -> None:
+    enc = GapEncoder(n_components=3, max_features=60, warm_start=True, random_state=0)
+    n_vocab = []
+    for seed in range(4):
+        X = generate_data(100, random_state=seed, sample_length=8)
+        enc.fit(X)
+        vocabulary = enc.fitted_models_[0].vocabulary
+        assert len(vocabulary) <= 60
+        assert len(set(vocabulary)) == len(vocabulary)
+        n_vocab.append(len(vocabulary))
+    assert n_vocab[-1] == 60
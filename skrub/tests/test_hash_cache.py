@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from skrub._hash_cache import HashCache, combine_hash_caches, parse_cache_size
+
+
+def test_hash_cache():
+    cache = HashCache(n_components=3, capacity=10)
+
+    for x in range(15):
+        cache[f"key {x}"] = np.full(3, x)
+
+    assert len(cache) == 10
+    for x in range(5, 15):
+        assert f"key {x}" in cache
+        assert_array_equal(cache[f"key {x}"], np.full(3, x))
+
+    for x in range(5):
+        assert f"key {x}" not in cache
+        assert cache.get(f"key {x}") is None
+    with pytest.raises(KeyError):
+        cache["key 0"]
+
+
+def test_hash_cache_lru():
+    cache = HashCache(n_components=2, capacity=4)
+    cache.put_many(["a", "b", "c", "d"], np.arange(8).reshape(4, 2))
+    values, found = cache.get_many(["c", "x", "a"])
+    assert_array_equal(found, [True, False, True])
+    assert_array_equal(values, [[4, 5], [0, 1]])
+
+    # "b" and "d" are the least recently used entries
+    cache.put_many(["e", "a", "f"], [[8, 9], [-1, -1], [10, 11]])
+    assert set(cache.keys()) == {"a", "c", "e", "f"}
+    assert_array_equal(cache["a"], [-1, -1])
+    assert_array_equal(cache["f"], [10, 11])
+
+    # Duplicated keys keep their last value, and only the last keys are
+    # kept if there are more keys than the capacity.
+    cache.put_many(list("gghijk"), np.arange(12).reshape(6, 2))
+    assert set(cache.keys()) == {"h", "i", "j", "k"}
+    assert_array_equal(cache.get_many(["h", "k"])[0], [[4, 5], [10, 11]])
+
+    values, found = cache.get_many([])
+    assert values.shape == (0, 2)
+    assert found.shape == (0,)
+
+
+def test_parse_cache_size():
+    assert parse_cache_size(100, n_components=30) == 100
+    assert parse_cache_size("1MB", n_components=32, dtype=np.float64) == 2**12
+    assert parse_cache_size("1.5 KiB", n_components=3, dtype=np.float32) == 128
+    assert parse_cache_size("1", n_components=3) == 1
+    for cache_size in ["a lot", 0, -1, 1.5]:
+        with pytest.raises(ValueError, match="Got cache_size="):
+            parse_cache_size(cache_size, n_components=3)
+
+
+def test_save_load(tmp_path):
+    cache = HashCache(n_components=2, capacity=4, metadata={"hashing": "fast"})
+    for x in range(6):
+        cache[f"clé {x}"] = [x, -x]
+    # Use an entry, to make it the most recently used
+    cache["clé 2"]
+    cache.save(tmp_path)
+    # Saving again replaces the previous files
+    cache.save(tmp_path)
+    assert len(list(tmp_path.glob("values-*.npy"))) == 1
+
+    loaded = HashCache.load(tmp_path, capacity=4)
+    assert isinstance(loaded._values, np.memmap)
+    assert not loaded._values.flags.writeable
+    assert loaded.metadata == {"hashing": "fast"}
+    assert set(loaded.keys()) == set(cache.keys())
+
+    # The memory map is copied when adding new entries, and the least
+    # recently used entries are evicted first.
+    loaded["clé 6"] = [6, -6]
+    assert loaded._values.flags.writeable
+    assert set(loaded.keys()) == {"clé 2", "clé 4", "clé 5", "clé 6"}
+    for x in [2, 4, 5, 6]:
+        assert_array_equal(loaded[f"clé {x}"], [x, -x])
+
+    # Only the most recently used entries are kept if the capacity is smaller
+    loaded = HashCache.load(tmp_path, capacity=2)
+    assert set(loaded.keys()) == {"clé 2", "clé 5"}
+
+
+def test_capacity(tmp_path):
+    for capacity in [0, -1, 1.5]:
+        with pytest.raises(ValueError, match="Got capacity="):
+            HashCache(n_components=2, capacity=capacity)
+
+    # An empty cache is loaded with room for new entries
+    HashCache(n_components=2).save(tmp_path)
+    loaded = HashCache.load(tmp_path)
+    assert loaded.capacity == 1
+    loaded.put_many(["a", "b"], [[0, 0], [1, 1]])
+    assert list(loaded.keys()) == ["b"]
+    with pytest.raises(ValueError, match="Got capacity=0"):
+        HashCache.load(tmp_path, capacity=0)
+
+
+def test_interleaved_saves(tmp_path, monkeypatch):
+    caches = [HashCache(n_components=2, capacity=4) for _ in range(2)]
+    for x, cache in enumerate(caches):
+        cache[str(x)] = [x, x]
+    caches[0].save(tmp_path)
+    previous_files = set(tmp_path.glob("*.npy"))
+
+    # The second cache is saved while the first one is being saved again,
+    # between the writing of its files and the swap of the metadata.
+    replace = os.replace
+
+    def save_other_then_replace(src, dst):
+        monkeypatch.setattr(os, "replace", replace)
+        caches[1].save(tmp_path)
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", save_other_then_replace)
+    caches[0]["2"] = [2, 2]
+    caches[0].save(tmp_path)
+
+    loaded = HashCache.load(tmp_path)
+    assert set(loaded.keys()) == {"0", "2"}
+    assert_array_equal(loaded["2"], [2, 2])
+    assert not previous_files & set(tmp_path.glob("*.npy"))
+
+
+def test_combine_hash_caches():
+    caches = [HashCache(n_components=2, capacity=5) for _ in range(2)]
+    for x in range(4):
+        caches[x % 2][str(x)] = [x, x]
+    combined = combine_hash_caches(5, *caches)
+    assert combined.capacity == 5
+    assert set(combined.keys()) == {"0", "1", "2", "3"}
+    for x in range(4):
+        assert_array_equal(combined[str(x)], [x, x])
+
+    # The most recently used entries of the last caches are kept
+    caches[0]["0"]
+    combined = combine_hash_caches(3, *caches)
+    assert set(combined.keys()) == {"0", "1", "3"}
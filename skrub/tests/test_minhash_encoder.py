@@ -1,5 +1,6 @@
 import copy
 import random
+import threading
 from string import ascii_lowercase
 
 import joblib
@@ -10,7 +11,7 @@ from numpy.testing import assert_array_equal
 from sklearn.exceptions import NotFittedError
 from sklearn.utils._testing import skip_if_no_parallel
 
-from skrub import MinHashEncoder
+from skrub import MinHashEncoder, _minhash_encoder
 
 from .utils import generate_data
 
@@ -161,7 +162,7 @@ def test_cache_overflow() -> None:
         return result_str
 
     encoder = MinHashEncoder(n_components=3)
-    capacity = encoder._capacity
+    capacity = encoder.cache_size
     raw_data = [get_random_string(10) for _ in range(capacity + 1)]
     raw_data = np.array(raw_data)[:, None]
     y = encoder.fit_transform(raw_data)
@@ -188,6 +189,26 @@ def test_parallelism() -> None:
     assert encoder.n_jobs == 2
 
 
+@skip_if_no_parallel
+def test_parallelism_threads(monkeypatch) -> None:
+    # The strings are hashed in threads of the main process by default
+    X = np.array(["a", "b", "c", "d", "e", "f", "g", "h"])[:, None]
+    y = MinHashEncoder(n_components=3).fit_transform(X)
+    fast_min_hash = _minhash_encoder._fast_min_hash
+    threads = set()
+
+    def record_thread(strings, **kwargs):
+        threads.add(threading.get_ident())
+        return fast_min_hash(strings, **kwargs)
+
+    monkeypatch.setattr("skrub._minhash_encoder._fast_min_hash", record_thread)
+    encoder = MinHashEncoder(n_components=3, n_jobs=2)
+    assert_array_equal(encoder.fit_transform(X), y)
+    assert threading.get_ident() not in threads
+    # All the hashes computed by the threads are in the cache
+    assert set(encoder.hash_dict_.keys()) == set(X[:, 0])
+
+
 DEFAULT_JOBLIB_BACKEND = joblib.parallel.get_active_backend()[0].__class__
 
 
@@ -323,11 +344,11 @@ def test_merge_transformers() -> None:
     # check get_feature_names_out
     # assert enc_merged.get_feature_names_out() == enc.get_feature_names_out()
     # check that the hash_dict_ attribute is the same
-    assert enc.hash_dict_.cache.keys() == enc_merged.hash_dict_.cache.keys()
-    for key in enc.hash_dict_.cache.keys():
-        assert_array_equal(enc.hash_dict_.cache[key], enc_merged.hash_dict_.cache[key])
+    assert enc.hash_dict_.keys() == enc_merged.hash_dict_.keys()
+    for key in enc.hash_dict_.keys():
+        assert_array_equal(enc.hash_dict_[key], enc_merged.hash_dict_[key])
     # check all attributes
-    assert enc_merged._capacity == enc._capacity
+    assert enc_merged.hash_dict_.capacity == enc.hash_dict_.capacity
     assert enc_merged.n_features_in_ == enc.n_features_in_
     # check feature_names_in_
     assert_array_equal(enc_merged.feature_names_in_, enc.feature_names_in_)
@@ -371,14 +392,12 @@ def test_split_transformers() -> None:
         assert enc_list[i].n_features_in_ == 1
         index += transformed_X_i.shape[1]
         # check all attributes
-        assert enc_list[i]._capacity == enc._capacity
+        assert enc_list[i].hash_dict_.capacity == enc.hash_dict_.capacity
         # check hash_dict_
         # TODO: do we want the hash_dict_ to be the same?
-        assert enc.hash_dict_.cache.keys() == enc_list[i].hash_dict_.cache.keys()
-        for key in enc.hash_dict_.cache.keys():
-            assert_array_equal(
-                enc.hash_dict_.cache[key], enc_list[i].hash_dict_.cache[key]
-            )
+        assert enc.hash_dict_.keys() == enc_list[i].hash_dict_.keys()
+        for key in enc.hash_dict_.keys():
+            assert_array_equal(enc.hash_dict_[key], enc_list[i].hash_dict_[key])
 
 
 def test_split_and_merge_transformers() -> None:
@@ -405,11 +424,113 @@ def test_split_and_merge_transformers() -> None:
     # check get_feature_names_out
     assert enc_merged.get_feature_names_out() == enc.get_feature_names_out()
     # check hash_dict_
-    assert enc.hash_dict_.cache.keys() == enc_merged.hash_dict_.cache.keys()
-    for key in enc.hash_dict_.cache.keys():
-        assert_array_equal(enc.hash_dict_.cache[key], enc_merged.hash_dict_.cache[key])
+    assert enc.hash_dict_.keys() == enc_merged.hash_dict_.keys()
+    for key in enc.hash_dict_.keys():
+        assert_array_equal(enc.hash_dict_[key], enc_merged.hash_dict_[key])
     # check all attributes
-    assert enc_merged._capacity == enc._capacity
+    assert enc_merged.hash_dict_.capacity == enc.hash_dict_.capacity
     assert enc_merged.n_features_in_ == enc.n_features_in_
     # check feature_names_in_
     assert_array_equal(enc_merged.feature_names_in_, enc.feature_names_in_)
+
+
+def test_cache_size() -> None:
+    X = np.array(["a", "b", "c", "d", "e", "f", "g", "h"])[:, None]
+    encoder = MinHashEncoder(n_components=4, cache_size=3)
+    y = encoder.fit_transform(X)
+    assert encoder.hash_dict_.capacity == 3
+    assert len(encoder.hash_dict_) == 3
+
+    encoder = MinHashEncoder(n_components=4, cache_size="1KB")
+    assert_array_equal(encoder.fit_transform(X), y)
+    assert encoder.hash_dict_.capacity == 32
+
+    with pytest.raises(ValueError, match=r"Got cache_size="):
+        MinHashEncoder(cache_size="many").fit(X)
+
+
+def test_cache_path(tmp_path, monkeypatch) -> None:
+    X = np.array(["a", "b", "c", "d", "e", "f", "g", "h"])[:, None]
+    encoder = MinHashEncoder(n_components=4, cache_path=tmp_path)
+    y = encoder.fit_transform(X)
+
+    # The hashes computed by the first encoder are reused by the second one
+    encoder = MinHashEncoder(n_components=4, cache_path=tmp_path)
+    encoder.fit(X)
+    assert set(encoder.hash_dict_.keys()) == set(X[:, 0])
+
+    def fail(strings, **kwargs):
+        raise AssertionError("Cached strings should not be hashed again.")
+
+    monkeypatch.setattr("skrub._minhash_encoder._fast_min_hash", fail)
+    assert_array_equal(encoder.transform(X), y)
+
+    # Caches computed with other hashing parameters are not reused
+    encoder = MinHashEncoder(n_components=4, hashing="murmur", cache_path=tmp_path)
+    encoder.fit(X)
+    assert len(encoder.hash_dict_) == 0
+
+
+@pytest.mark.parametrize("hashing", ["fast", "murmur"])
+@pytest.mark.parametrize("dtype", [np.float32, np.int32])
+def test_dtype(hashing, dtype) -> None:
+    X = np.array(["al ice", "b ob", "bob and alice", None])[:, None]
+    expected = MinHashEncoder(n_components=4, hashing=hashing).fit_transform(X)
+    assert expected.dtype == np.float64
+
+    encoder = MinHashEncoder(n_components=4, hashing=hashing, dtype=dtype)
+    if hashing == "murmur" and dtype == np.int32:
+        with pytest.raises(ValueError, match=r"not supported with the murmur"):
+            encoder.fit(X)
+        return
+    y = encoder.fit_transform(X)
+    assert y.dtype == dtype
+    assert encoder.hash_dict_.dtype == dtype
+    # The fast hashes are exact in int32, and rounded in float32
+    np.testing.assert_allclose(y, expected, rtol=1e-7)
+    # Cached values give the same output
+    assert_array_equal(encoder.transform(X), y)
+
+    with pytest.raises(ValueError, match=r"Got dtype="):
+        MinHashEncoder(dtype="aaa").fit(X)
+    for invalid_dtype in [np.int8, np.float16, None]:
+        with pytest.raises(ValueError, match=r"Got dtype="):
+            MinHashEncoder(dtype=invalid_dtype).fit(X)
+
+
+def test_transform_iter(tmp_path, monkeypatch) -> None:
+    X = pd.DataFrame(
+        {"a": ["paris", "london", "paris", None] * 5, "b": ["x", "y", "z", "w"] * 5}
+    )
+    encoder = MinHashEncoder(n_components=4, cache_path=tmp_path).fit(X)
+    expected = encoder.transform(X)
+
+    encoder = MinHashEncoder(n_components=4, cache_path=tmp_path / "iter").fit(X)
+    saved = []
+    monkeypatch.setattr(encoder.hash_dict_, "save", saved.append)
+    chunks = [X.iloc[i : i + 6] for i in range(0, len(X), 6)]
+    encoded_chunks = list(encoder.transform_iter(chunks))
+    assert [len(chunk) for chunk in encoded_chunks] == [6, 6, 6, 2]
+    assert_array_equal(np.concatenate(encoded_chunks), expected)
+    # The cache is saved once, after the last chunk
+    assert saved == [tmp_path / "iter"]
+
+    out = np.lib.format.open_memmap(
+        tmp_path / "out.npy", mode="w+", dtype=np.float64, shape=expected.shape
+    )
+    for encoded in encoder.transform_iter(chunks, out=out):
+        assert np.shares_memory(encoded, out)
+    assert_array_equal(out, expected)
+
+    with pytest.raises(ValueError, match=r"more than len\(out\)=10 rows"):
+        list(encoder.transform_iter(chunks, out=np.empty((10, 8))))
+
+
+def test_transform_iter_arrow() -> None:
+    pa = pytest.importorskip("pyarrow")
+    X = pd.DataFrame({"a": ["paris", "london", "berlin", "rome"]})
+    encoder = MinHashEncoder(n_components=4).fit(X)
+    batches = pa.Table.from_pandas(X).to_batches(max_chunksize=3)
+    assert_array_equal(
+        np.concatenate(list(encoder.transform_iter(batches))), encoder.transform(X)
+    )
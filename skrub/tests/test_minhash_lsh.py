@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+
+from skrub import MinHashEncoder, MinHashLSHIndex
+
+
+def _brute_force(signatures, query, k):
+    similarities = (signatures == query).mean(axis=1)
+    order = np.argsort(-similarities, kind="stable")[:k]
+    return similarities[order]
+
+
+@pytest.mark.parametrize("hashing", ["fast", "murmur"])
+def test_query(hashing):
+    rng = np.random.RandomState(0)
+    words = ["police", "officer", "fire", "rescue", "bus", "operator", "manager"]
+    X = np.unique(
+        [" ".join(rng.choice(words, size=rng.randint(1, 4))) for _ in range(200)]
+    )[:, None]
+    encoder = MinHashEncoder(n_components=32, hashing=hashing).fit(X)
+    signatures = encoder.transform(X)
+
+    # With bands of a single component, every signature sharing a min-hash
+    # with the query is a candidate
+    index = MinHashLSHIndex(n_bands=32)
+    index.add(signatures)
+    assert len(index) == len(X)
+    similarities, ids = index.query(signatures[:20], k=5)
+    for i, (sim, id_) in enumerate(zip(similarities, ids)):
+        assert id_[0] == i
+        assert_allclose(sim, _brute_force(signatures, signatures[i], 5)[: len(sim)])
+        assert_allclose(sim, (signatures[list(id_)] == signatures[i]).mean(axis=1))
+
+    index = MinHashLSHIndex(n_bands=8)
+    index.add(signatures)
+    assert index.band_size_ == 4
+    similarities, ids = index.query(signatures[:20], k=None, threshold=0.5)
+    for i, (sim, id_) in enumerate(zip(similarities, ids)):
+        assert id_[0] == i
+        assert sim[0] == 1
+        assert (sim >= 0.5).all()
+        assert (np.diff(sim) <= 0).all()
+
+
+def test_add_remove():
+    X = np.array(["paris", "london", "berlin", "madrid", "rome"])[:, None]
+    signatures = MinHashEncoder(n_components=20).fit_transform(X)
+    index = MinHashLSHIndex(n_bands=5)
+    index.add(signatures[:3])
+    index.add(signatures[3:], ids=["madrid", "rome"])
+    assert len(index) == 5
+    assert 2 in index and "rome" in index
+
+    index.remove([0, "rome"])
+    assert len(index) == 3
+    assert 0 not in index and "rome" not in index
+    similarities, ids = index.query(signatures, k=1)
+    assert [list(i) for i in ids[:4]] == [[], [1], [2], ["madrid"]]
+    assert ids[4].size == 0 or ids[4][0] != "rome"
+
+    # Removed rows are reused, and default ids continue after the last one
+    index.add(signatures[[0, 4]])
+    assert len(index) == 5
+    assert len(index._ids) == 5
+    _, ids = index.query(signatures[[0, 4]], k=1)
+    assert_array_equal(np.concatenate(ids), [3, 4])
+
+
+def test_errors():
+    signatures = MinHashEncoder(n_components=10).fit_transform([["a"], ["b"]])
+    index = MinHashLSHIndex()
+    with pytest.raises(ValueError, match=r"The index is empty"):
+        index.query(signatures)
+    with pytest.raises(ValueError, match=r"Got n_bands=11"):
+        MinHashLSHIndex(n_bands=11).add(signatures)
+
+    index.add(signatures, ids=["a", "b"])
+    with pytest.raises(ValueError, match=r"The ids must be distinct"):
+        index.add(signatures[:1], ids=["a"])
+    with pytest.raises(ValueError, match=r"Got 1 ids for 2 signatures"):
+        index.add(signatures, ids=["c"])
+    with pytest.raises(ValueError, match=r"The signatures have 5 components"):
+        index.query(signatures[:, :5])
+    with pytest.raises(ValueError, match=r"Got k=0"):
+        index.query(signatures, k=0)
+    # A failing removal leaves the index unchanged
+    tables = [
+        {key: set(rows) for key, rows in table.items()} for table in index._tables
+    ]
+    with pytest.raises(KeyError, match=r"not in the index"):
+        index.remove(["b", "c"])
+    with pytest.raises(ValueError, match=r"duplicated ids \['b'\]"):
+        index.remove(["b", "b"])
+    assert len(index) == 2 and "b" in index
+    assert index._tables == tables
+    assert not index._free_rows
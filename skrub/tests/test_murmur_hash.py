@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+from sklearn.utils import murmurhash3_32
+
+from skrub._murmur_hash import murmurhash3_32_batch, ngram_murmur_min_hash_batch
+from skrub._string_distances import get_unique_ngrams
+from skrub.tests.utils import generate_data
+
+STRINGS = ["", "a", "ab", "abc", "abcd", "abcde", "héllo wörld", "日本語テキスト"]
+
+
+def test_murmurhash3_32_batch() -> None:
+    strings = STRINGS + generate_data(20, as_list=True, random_state=0)
+    seeds = [0, 1, 5, 123456, 2**31 + 5]
+    expected = [
+        [murmurhash3_32(string, seed=seed, positive=True) for seed in seeds]
+        for string in strings
+    ]
+    hashes = murmurhash3_32_batch(strings, seeds)
+    assert hashes.dtype == np.uint32
+    assert_array_equal(hashes, expected)
+
+
+def _ngram_murmur_min_hash(string, ngram_range, seeds):
+    """Reference implementation, string by string and n-gram by n-gram."""
+    grams = get_unique_ngrams(string, ngram_range)
+    if len(grams) == 0:
+        grams = get_unique_ngrams(" Na ", ngram_range)
+    min_hashes = np.full(len(seeds), np.iinfo(np.uint32).max)
+    for gram in grams:
+        hashes = [murmurhash3_32("".join(gram), seed=d, positive=True) for d in seeds]
+        min_hashes = np.minimum(min_hashes, hashes)
+    return min_hashes
+
+
+@pytest.mark.parametrize("ngram_range", [(2, 4), (1, 1), (3, 6)])
+def test_ngram_murmur_min_hash_batch(ngram_range, monkeypatch) -> None:
+    strings = STRINGS + generate_data(20, as_list=True, random_state=0)
+    seeds = range(10)
+    expected = [_ngram_murmur_min_hash(s, ngram_range, seeds) for s in strings]
+    hashes = ngram_murmur_min_hash_batch(strings, ngram_range, seeds)
+    assert_array_equal(hashes, expected)
+
+    # Results do not depend on the chunking of the strings
+    monkeypatch.setattr("skrub._murmur_hash._BATCH_MAX_HASHES", 100)
+    assert_array_equal(ngram_murmur_min_hash_batch(strings, ngram_range, seeds), hashes)
@@ -3,10 +3,15 @@ from collections.abc import Callable
 import numpy as np
 import numpy.testing
 import pytest
+from scipy import sparse
 from sklearn.exceptions import NotFittedError
 
 from skrub import SimilarityEncoder
-from skrub._similarity_encoder import ngram_similarity_matrix
+from skrub._similarity_encoder import (
+    _sum_of_minimums,
+    _threshold_levels,
+    ngram_similarity_matrix,
+)
 from skrub._string_distances import ngram_similarity
 
 
@@ -48,6 +53,21 @@ def test_fast_ngram_similarity() -> None:
     assert np.allclose(feature_matrix, feature_matrix_fast)
 
 
+def test_sum_of_minimums() -> None:
+    rng = np.random.RandomState(0)
+    X = rng.randint(4, size=(20, 30)) * (rng.rand(20, 30) < 0.3)
+    Y = rng.randint(6, size=(10, 30)) * (rng.rand(10, 30) < 0.3)
+    expected = np.minimum(X[:, None, :], Y[None, :, :]).sum(axis=2)
+    out = _sum_of_minimums(sparse.csr_matrix(X), sparse.csr_matrix(Y))
+    numpy.testing.assert_array_equal(out, expected)
+    # With the levels of Y computed beforehand
+    Y_levels_T = _threshold_levels(sparse.csr_matrix(Y), Y.max()).T.tocsr()
+    out = _sum_of_minimums(sparse.csr_matrix(X), sparse.csr_matrix(Y), Y_levels_T)
+    numpy.testing.assert_array_equal(out, expected)
+    out = _sum_of_minimums(sparse.csr_matrix(X), sparse.csr_matrix((10, 30)))
+    numpy.testing.assert_array_equal(out, np.zeros((20, 10)))
+
+
 def test_parameters() -> None:
     X = [["foo"], ["baz"]]
     X2 = [["foo"], ["bar"]]
@@ -319,3 +339,66 @@ def test_check_fitted_super_vectorizer() -> None:
         sim_enc.transform(X)
     sim_enc.fit(X)
     sim_enc.transform(X)
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_sparse_output(fast: bool) -> None:
+    X = np.array(
+        [["aa", "bb"], ["aaa", "bbb"], ["aab", "abb"], ["baa", "bba"], ["a", "b"]]
+    )
+    dense = SimilarityEncoder().fit(X).transform(X, fast=fast)
+
+    enc = SimilarityEncoder(top_k=2).fit(X)
+    out = enc.transform(X, fast=fast)
+    assert sparse.isspmatrix_csr(out)
+    assert out.shape == dense.shape
+    out = out.toarray()
+    kept = out != 0
+    numpy.testing.assert_allclose(out[kept], dense[kept], rtol=1e-6)
+    for row, dense_row, kept_row in zip(out, dense, kept):
+        for cols in (slice(0, 5), slice(5, 10)):
+            assert kept_row[cols].sum() <= 2
+            if (~kept_row[cols]).any():
+                assert row[cols][kept_row[cols]].min() >= (
+                    dense_row[cols][~kept_row[cols]].max()
+                )
+
+    enc = SimilarityEncoder(min_similarity=0.4).fit(X)
+    out = enc.transform(X, fast=fast).toarray()
+    numpy.testing.assert_allclose(
+        out, np.where(dense >= 0.4, dense, 0), rtol=1e-6, atol=1e-6
+    )
+
+    with pytest.raises(ValueError, match="Got top_k=0"):
+        SimilarityEncoder(top_k=0).fit(X)
+
+
+def test_prototype_selection() -> None:
+    X = np.array(["aa"] * 5 + ["aab"] * 4 + ["bbb"] * 3 + ["bba", "ccc", "cca"])
+    X = X.reshape(-1, 1)
+    enc = SimilarityEncoder(categories="most_frequent", n_prototypes=3).fit(X)
+    numpy.testing.assert_array_equal(enc.categories_[0], ["aa", "aab", "bbb"])
+    assert enc.transform(X).shape == (15, 3)
+
+    enc = SimilarityEncoder(categories="k-means", n_prototypes=3, random_state=0)
+    enc.fit(X)
+    prototypes = enc.categories_[0]
+    assert len(prototypes) == 3
+    assert np.isin(prototypes, X).all()
+    numpy.testing.assert_array_equal(prototypes, np.sort(prototypes))
+    assert enc.transform(X).shape == (15, 3)
+
+    enc = SimilarityEncoder(
+        categories="minibatch-k-means", n_prototypes=3, random_state=0
+    ).fit(X)
+    prototypes = enc.categories_[0]
+    assert 0 < len(prototypes) <= 3
+    assert np.isin(prototypes, X).all()
+    assert enc.transform(X).shape == (15, len(prototypes))
+
+    with pytest.raises(ValueError, match="Got n_prototypes=None"):
+        SimilarityEncoder(categories="k-means").fit(X)
+    with pytest.raises(ValueError, match="handle_unknown='error'"):
+        SimilarityEncoder(
+            categories="most_frequent", n_prototypes=2, handle_unknown="error"
+        ).fit(X)
@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 
 from skrub import _string_distances
 
@@ -47,3 +48,37 @@ def test_ngram_similarity() -> None:
     # assert ...
     for n in range(1, 4):
         _check_symmetry(_string_distances.ngram_similarity, n)
+
+
+@pytest.mark.parametrize("ngram_range", [(2, 4), (1, 1), (3, 6)])
+def test_ngram_count_matrix(ngram_range) -> None:
+    strings = ["", "a", "Test", "hello  World", "héllo wörld", "日本語テキスト"]
+    counts, vocabulary = _string_distances.ngram_count_matrix(strings, ngram_range)
+    assert counts.shape == (len(strings), len(vocabulary))
+    for i, string in enumerate(strings):
+        ngrams = {tuple(vocabulary[j]) for j in counts[i].indices}
+        assert ngrams == _string_distances.get_unique_ngrams(string, ngram_range)
+        n_ngrams = sum(
+            len(_string_distances.get_ngrams(string, n))
+            for n in range(ngram_range[0], ngram_range[1] + 1)
+        )
+        assert counts[i].sum() == n_ngrams
+
+
+def test_vectorized_functions() -> None:
+    strings = ["a", "Test", " spaces   inside ", "日本語"]
+    assert list(_string_distances.preprocess(strings)) == [
+        _string_distances.preprocess(string) for string in strings
+    ]
+    assert list(_string_distances.get_ngram_count(strings, (2, 4))) == [
+        _string_distances.get_ngram_count(string, (2, 4)) for string in strings
+    ]
+
+    strings1, strings2 = zip(*_random_string_pairs())
+    for n in range(1, 4):
+        similarities = _string_distances.ngram_similarity(strings1, strings2, n)
+        expected = [
+            _string_distances.ngram_similarity(a, b, n)
+            for a, b in zip(strings1, strings2)
+        ]
+        assert np.allclose(similarities, expected)
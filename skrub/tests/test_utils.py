@@ -1,22 +1,9 @@
 from inspect import ismodule
 
+import numpy as np
 import pytest
 
-from skrub._utils import LRUDict, import_optional_dependency
-
-
-def test_lrudict():
-    dict_ = LRUDict(10)
-
-    for x in range(15):
-        dict_[x] = f"filled {x}"
-
-    for x in range(5, 15):
-        assert x in dict_
-        assert dict_[x] == f"filled {x}"
-
-    for x in range(5):
-        assert x not in dict_
+from skrub._utils import factorize, import_optional_dependency
 
 
 def test_import_optional_dependency():
@@ -33,3 +20,14 @@ def test_import_optional_dependency():
     # smoke test for an available dependency
     sklearn_module = import_optional_dependency("sklearn")
     assert ismodule(sklearn_module)
+
+
+def test_factorize():
+    X = np.array(["b", "a", "c", "a", "b"], dtype=object)
+    unq_X, lookup, is_known = factorize(X)
+    assert unq_X.tolist() == ["a", "b", "c"]
+    assert (unq_X[lookup] == X).all()
+    assert is_known is None
+
+    unq_X, lookup, is_known = factorize(X, categories=["a", "c", "d"])
+    assert is_known.tolist() == [True, False, True]